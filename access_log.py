@@ -0,0 +1,183 @@
+"""Асинхронный журнал: JSON строки, пачки, выборка и скрытие секретов.
+
+Поток обработчика только кладёт LogRecord в очередь (QueueHandler), а
+форматирование и запись в файл выполняет поток BatchQueueListener - пачками
+до batch_size строк одним write, не реже раза в flush_interval сек.
+
+Запись о запросе (Application.make_response) передаётся в extra={"access": {...}}
+и содержит только контекст запроса (request_id, путь, method, account, код,
+время этапов...), а не тело запроса и ответа, поэтому её стоимость не зависит
+от размера запроса. Успешные запросы попадают в журнал с вероятностью
+sample_rate, ошибки (код >= 400) и сообщения уровня WARNING и выше - всегда.
+"""
+
+import logging
+import logging.handlers
+import queue
+import random
+
+import json_codec
+import metrics
+from config import LOG_SECRET_FIELDS, access_log_params
+
+LOG_RECORDS_DROPPED = metrics.counter("log_records_dropped_total", "Записи журнала, отброшенные при полной очереди")
+
+REDACTED = "***"
+
+
+def redact(value, secret_fields=LOG_SECRET_FIELDS):
+    """Копия value, в которой значения полей secret_fields (на любой глубине) скрыты."""
+    if isinstance(value, dict):
+        return {key: REDACTED if key in secret_fields else redact(item, secret_fields) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, secret_fields) for item in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """LogRecord -> JSON строка: ts, level, msg, поля access и трейсбек исключения."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        access = getattr(record, "access", None)
+        if access is not None:
+            entry.update(redact(access))
+        if record.exc_info or record.exc_text:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        try:
+            return json_codec.dumps(entry)
+        except TypeError:
+            # несериализуемое значение в access (например, исключение) -> строка
+            return json_codec.dumps({key: str(value) for key, value in entry.items()})
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю sample_rate успешных записей access; остальное - всегда."""
+
+    def __init__(self, sample_rate=1.0, rand=random.random):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rand = rand
+
+    def filter(self, record):
+        access = getattr(record, "access", None)
+        if access is None or record.levelno >= logging.WARNING or access.get("code", 0) >= 400:
+            return True
+        return self.sample_rate >= 1 or self.rand() < self.sample_rate
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler с ограниченной очередью: при переполнении запись отбрасывается
+    (метрика log_records_dropped_total), запрос не ждёт записи журнала.
+    """
+
+    def __init__(self, log_queue, max_size):
+        super().__init__(log_queue)
+        self.max_size = max_size
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS_DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+
+    def prepare(self, record):
+        # форматирование - в потоке BatchQueueListener; трейсбек сохраняется как текст сразу
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler, копящий строки и записывающий их пачкой одним write."""
+
+    terminator = "\n"
+
+    def __init__(self, filename, batch_size=256, encoding="utf-8"):
+        super().__init__(filename, encoding=encoding)
+        self.batch_size = batch_size
+        self.lines = []
+
+    def emit(self, record):
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.lines and self.stream is not None:
+                self.stream.write(self.terminator.join(self.lines) + self.terminator)
+                self.lines = []
+            super().flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+# маркер "очередь пуста flush_interval сек" для BatchQueueListener
+FLUSH = object()
+
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """QueueListener, сбрасывающий пачки обработчиков, когда очередь простаивает."""
+
+    def __init__(self, log_queue, *handlers, flush_interval=0.5):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get(block, self.flush_interval)
+        except queue.Empty:
+            return FLUSH
+
+    def handle(self, record):
+        if record is FLUSH:
+            self.flush()
+        else:
+            super().handle(record)
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+def setup_logging(filename, level=logging.INFO, sample_rate=None, params=None):
+    """Заменяет обработчики корневого логгера на очередь с BatchQueueListener.
+
+    Вызывается в каждом процессе (в pre-fork воркере - после fork: поток
+    listener не наследуется). -> listener, его нужно остановить (stop) при выходе.
+    """
+    params = {**access_log_params, **(params or {})}
+    if sample_rate is not None:
+        params["sample_rate"] = sample_rate
+
+    # SimpleQueue: без task_done, размер ограничивает BoundedQueueHandler
+    log_queue = queue.SimpleQueue()
+    file_handler = BatchFileHandler(filename, batch_size=params["batch_size"])
+    file_handler.setFormatter(JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S%z"))
+    queue_handler = BoundedQueueHandler(log_queue, params["max_queue"])
+    queue_handler.addFilter(SamplingFilter(params["sample_rate"]))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = BatchQueueListener(log_queue, file_handler, flush_interval=params["flush_interval"])
+    listener.start()
+    return listener
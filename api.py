@@ -1,124 +1,256 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-# import abc
-import json
+import asyncio
 import logging
-import uuid
+import tempfile
 from http.server import BaseHTTPRequestHandler, HTTPServer
-
-# from io import BytesIO
 from optparse import OptionParser
 
-from config import ERRORS, StatusCodes
-from handlers import interests_handler, score_handler
+import access_log
+import metrics
+from app import ASYNC_ROUTER, Application
+from async_api import AsyncHTTPServer
+from body_reader import BodyError, BodyReader
+from compression import Compressor
+from config import (
+    COMPRESSION,
+    KEEPALIVE_TIMEOUT,
+    L1_CACHE_MAX_BYTES,
+    L1_CACHE_MAX_ENTRIES,
+    L1_CACHE_PREFIXES,
+    L1_CACHE_TTL,
+    MAX_KEEPALIVE_REQUESTS,
+    METRICS_FLUSH_INTERVAL,
+    SERVER_TIMING,
+    access_log_params,
+    compression_params,
+    store_params_ok,
+    store_write_behind_params,
+)
+from db.cache import LocalCache
+from db.store import AsyncStore, Store, export_store_stats
+from scoring import SCORE_SCRIPT
+from server import PreforkServer, ThreadPoolHTTPServer
 
 
 class MainHTTPHandler(BaseHTTPRequestHandler):
-    router = {
-        "score": score_handler,
-        "interests": interests_handler,
-    }
-    store = None
+    # вся обработка запроса - в транспортно-независимом Application
+    app = Application()
 
-    # ping server
-    def do_GET(self):
-        self.send_response(StatusCodes.OK)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        self.wfile.write(b"Hello, world!")
+    # постоянные соединения: экземпляр обработчика живёт, пока живёт соединение
+    protocol_version = "HTTP/1.1"
+    # таймаут сокета = время простоя соединения между запросами
+    timeout = KEEPALIVE_TIMEOUT
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+    requests_served = 0
 
-    def get_request_id(self, headers):
-        return headers.get("HTTP_X_REQUEST_ID", uuid.uuid4().hex)
+    def setup(self):
+        super().setup()
+        # буфер тела переиспользуется всеми запросами соединения
+        self.body_reader = BodyReader()
 
-    def do_POST(self):
-        # Объявления дефолтных значений
-        response_body, code = {}, StatusCodes.OK
-        request = None
-        error_text = "Unknown"
+    def send_app_response(self, response):
+        self.requests_served += 1
 
-        # Получение контекста
-        context = {"request_id": self.get_request_id(self.headers)}
+        # отправка заголовков (метаинформации об ответе)
+        self.send_response(response.code)
+        for name, value in response.headers:
+            self.send_header(name, value)
+        if self.close_connection or self.requests_served >= self.max_keepalive_requests:
+            # send_header сам выставит close_connection
+            self.send_header("Connection", "close")
+        self.end_headers()
 
-        # Получаем длину контента в символах и тело запроса в виде строки
-        content_length = int(self.headers["Content-Length"])
-        data_string = self.rfile.read(content_length)
+        # Отправка ответа
+        self.wfile.write(response.body)
 
-        # Десериализация (получение тела запроса в python объект)
+    def read_body(self, required):
+        """-> (тело, None) или (b"", BodyError), если тело не прочитано."""
         try:
-            request = json.loads(data_string)
-        except Exception as e:
-            code = StatusCodes.BAD_REQUEST
-            self.wfile.write(b"BAD_REQUEST")
-            logging.info("%s: %s %s" % (self.path, e, context["request_id"]))
-
-        # Получение ответа на запрос
-        if request:
-            path = self.path.strip("/")
-            logging.info("%s: %s %s" % (self.path, request, context["request_id"]))
-            if path in self.router:
-                try:
-                    response_body, code = self.router[path]({"body": request, "headers": self.headers}, context, self.store)
-                except Exception as e:
-                    logging.exception(f"Error: {e}")
-                    error_text = e
-                    code = StatusCodes.INTERNAL_ERROR
-            else:
-                code = StatusCodes.NOT_FOUND
+            return self.body_reader.read(self.rfile, self.headers, required), None
+        except BodyError as e:
+            # непрочитанный остаток тела сломал бы следующий запрос в соединении
+            self.close_connection = True
+            return b"", e
 
-        # отправка заголовков (метаинформации об ответе)
-        self.send_response(code)
-        self.send_header("Content-type", "application/json")
-        self.end_headers()
-
-        # проверка на ошибки
-        if code not in ERRORS:
-            response = {"response": response_body, "code": code}
-        else:
-            error_message = response_body or ERRORS.get(code, "Unknown Error")
-            if code == StatusCodes.INTERNAL_ERROR:
-                error_message = f"{error_message}: {error_text}"
+    def handle_expect_100(self):
+        # слишком большое тело отклоняется до того, как клиент начнёт его отправлять
+        try:
+            self.body_reader.get_length(self.headers, required=self.command == "POST")
+        except BodyError as e:
+            self.close_connection = True
+            self.send_app_response(self.app.handle(self.command, self.path, self.headers, b"", body_error=e))
+            return False
+        return super().handle_expect_100()
 
-            response = {"error": error_message, "code": code}
+    # ping server
+    def do_GET(self):
+        # тело запроса нужно вычитать, иначе оно сломает следующий запрос в соединении
+        body, body_error = self.read_body(required=False)
+        self.send_app_response(self.app.handle("GET", self.path, self.headers, body, body_error))
 
-        # логируем контекст
-        context.update(response)
-        logging.info(context)
+    def do_POST(self):
+        body, body_error = self.read_body(required=True)
+        self.send_app_response(self.app.handle("POST", self.path, self.headers, body, body_error))
 
-        # Сериализация
-        json_str_out = json.dumps(response)
-        json_bytes_out = json_str_out.encode("utf-8")
 
-        # Отправка ответа
-        self.wfile.write(json_bytes_out)
+# поток записи журнала процесса (access_log.setup_logging)
+log_listener = None
 
 
 def pars_comline_args():
     op = OptionParser()
     op.add_option("-p", "--port", action="store", type=int, default=8080)
     op.add_option("-l", "--log", action="store", default="logs.log")
+    # доля успешных запросов, попадающих в журнал (ошибки пишутся всегда)
+    op.add_option("--log-sample-rate", action="store", type=float, default=access_log_params["sample_rate"])
+    # число потоков-обработчиков; 1 - однопоточный HTTPServer
+    op.add_option("-w", "--workers", action="store", type=int, default=1)
+    # число процессов; > 1 - pre-fork режим с SO_REUSEPORT
+    op.add_option("-P", "--processes", action="store", type=int, default=1)
+    # sync - BaseHTTPRequestHandler, asyncio - AsyncHTTPServer с AsyncStore
+    op.add_option("-e", "--engine", action="store", type="choice", choices=["sync", "asyncio"], default="sync")
+    # keep-alive; в режиме --workers простаивающее соединение занимает поток до истечения таймаута
+    op.add_option("--keepalive-timeout", action="store", type=float, default=KEEPALIVE_TIMEOUT)
+    op.add_option("--max-keepalive-requests", action="store", type=int, default=MAX_KEEPALIVE_REQUESTS)
+    # отключить L1 кэш в памяти процесса
+    op.add_option("--no-l1", action="store_true", default=False)
+    # писать кэш score в Redis синхронно, в обработчике запроса
+    op.add_option("--no-write-behind", action="store_true", default=False)
+    # score на промахе кэша считается Lua скриптом в Redis (один round trip вместо GET + SET)
+    op.add_option("--lua-score", action="store_true", default=False)
+    # каталог снимков метрик воркеров для /metrics в pre-fork режиме; по умолчанию - временный
+    op.add_option("--metrics-dir", action="store", default=None)
+    # заголовок Server-Timing с временем этапов запроса
+    op.add_option("--server-timing", action="store_true", default=SERVER_TIMING)
+    # сжатие ответов gzip/deflate по Accept-Encoding: уровень zlib и минимальный размер ответа, байт
+    op.add_option("--no-compression", action="store_false", dest="compression", default=COMPRESSION)
+    op.add_option("--compression-level", action="store", type=int, default=compression_params["level"])
+    op.add_option("--compression-min-size", action="store", type=int, default=compression_params["min_size"])
     opts, args = op.parse_args()
     return opts, args
 
 
+def make_l1_cache():
+    if opts.no_l1:
+        return None
+    return LocalCache(max_entries=L1_CACHE_MAX_ENTRIES, max_bytes=L1_CACHE_MAX_BYTES, default_ttl=L1_CACHE_TTL)
+
+
+def make_store_params():
+    return {
+        "l1_cache": make_l1_cache(),
+        "l1_prefixes": L1_CACHE_PREFIXES,
+        "write_behind_params": None if opts.no_write_behind else store_write_behind_params,
+        "scripts": (SCORE_SCRIPT,) if opts.lua_score else (),
+    }
+
+
+def make_compressor():
+    if not opts.compression:
+        return None
+    return Compressor(min_size=opts.compression_min_size, level=opts.compression_level)
+
+
+def init_worker():
+    # Store разделяется всеми потоками процесса: redis.Redis потокобезопасен за счёт пула соединений.
+    # Соединения и поток write-behind не наследуются через fork, поэтому в pre-fork режиме Store создаётся в каждом воркере
+    MainHTTPHandler.app.store = Store(store_params_ok, **make_store_params())
+    metrics.REGISTRY.add_collector(export_store_stats(MainHTTPHandler.app.store))
+    # в pre-fork режиме снимок метрик воркера периодически пишется в общий каталог
+    metrics.REGISTRY.start_flusher(METRICS_FLUSH_INTERVAL)
+
+
+def setup_logging():
+    global log_listener
+    log_listener = access_log.setup_logging(opts.log, sample_rate=opts.log_sample_rate)
+
+
+def init_prefork_worker():
+    # поток записи журнала не наследуется через fork
+    setup_logging()
+    init_worker()
+
+
+def exit_worker():
+    # дописать очередь write-behind воркера (её не видит никто, кроме этого процесса)
+    if MainHTTPHandler.app.store is not None:
+        MainHTTPHandler.app.store.close()
+    metrics.REGISTRY.stop_flusher()
+    if log_listener is not None:
+        log_listener.stop()
+
+
+async def run_async_server():
+    store = AsyncStore(store_params_ok, **make_store_params())
+    await store.connect()
+    metrics.REGISTRY.add_collector(export_store_stats(store))
+    app = Application(store, router=ASYNC_ROUTER, server_timing=opts.server_timing)
+    app.compressor = make_compressor()
+    server = AsyncHTTPServer("localhost", opts.port, app)
+    server.keepalive_timeout = opts.keepalive_timeout
+    server.max_keepalive_requests = opts.max_keepalive_requests
+    logging.info("Starting asyncio server at %s" % opts.port)
+    try:
+        await server.serve_forever()
+    finally:
+        await store.close()
+
+
 def run_server():
-    server = HTTPServer(("localhost", opts.port), MainHTTPHandler)
-    logging.info("Starting server at %s" % opts.port)
+    MainHTTPHandler.app.server_timing = opts.server_timing
+    MainHTTPHandler.app.compressor = make_compressor()
+    MainHTTPHandler.timeout = opts.keepalive_timeout
+    MainHTTPHandler.max_keepalive_requests = opts.max_keepalive_requests
+
+    if opts.engine == "asyncio":
+        try:
+            asyncio.run(run_async_server())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if opts.processes > 1:
+        # /metrics складывает снимки всех воркеров
+        metrics.REGISTRY.set_directory(opts.metrics_dir or tempfile.mkdtemp(prefix="scoring-metrics-"))
+        server = PreforkServer(
+            ("localhost", opts.port),
+            MainHTTPHandler,
+            processes=opts.processes,
+            workers=opts.workers,
+            init_worker=init_prefork_worker,
+            exit_worker=exit_worker,
+        )
+        logging.info("Starting server at %s (processes: %s, workers: %s)" % (opts.port, opts.processes, opts.workers))
+        server.serve_forever()
+        return
+
+    init_worker()
+    if opts.workers > 1:
+        server = ThreadPoolHTTPServer(("localhost", opts.port), MainHTTPHandler, workers=opts.workers)
+    else:
+        server = HTTPServer(("localhost", opts.port), MainHTTPHandler)
+    logging.info("Starting server at %s (workers: %s)" % (opts.port, opts.workers))
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         pass
     server.server_close()
+    # дописать очередь write-behind
+    MainHTTPHandler.app.store.close()
 
 
 if __name__ == "__main__":
     # парсим аргументы из командной строки
     opts, args = pars_comline_args()
 
-    # настройка логирования
-    logging.basicConfig(
-        filename=opts.log, level=logging.INFO, format="[%(asctime)s] %(levelname).1s %(message)s", datefmt="%Y.%m.%d %H:%M:%S"
-    )
+    # настройка логирования: JSON строки, запись в фоновом потоке
+    setup_logging()
 
     # Запускаем сервер
-    run_server()
+    try:
+        run_server()
+    finally:
+        # дописать журнал
+        log_listener.stop()
@@ -0,0 +1,388 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import uuid
+from http import HTTPStatus
+from http.client import HTTPMessage
+
+import json_codec
+import metrics
+import timing
+from body_reader import BodyError, BodyReader, check_body_size
+from compression import Compressor
+from config import COMPRESSION, ERRORS, SERVER_TIMING, StatusCodes, store_params_ok
+from db.store import AsyncStore, Store
+from handlers import (
+    batch_handler,
+    batch_handler_async,
+    interests_handler,
+    interests_handler_async,
+    score_handler,
+    score_handler_async,
+)
+
+ROUTER = {
+    "score": score_handler,
+    "interests": interests_handler,
+    "batch": batch_handler,
+}
+
+ASYNC_ROUTER = {
+    "score": score_handler_async,
+    "interests": interests_handler_async,
+    "batch": batch_handler_async,
+}
+
+# число запросов по route и коду ответа - http_request_duration_seconds_count
+HTTP_REQUESTS = metrics.histogram("http_request_duration_seconds", "Время обработки запроса, сек", ("route", "code"))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "Запросы в обработке", ("route",))
+
+
+class Response:
+    def __init__(self, code, body=b"", content_type="application/json"):
+        self.code = code
+        self.body = body
+        self.content_type = content_type
+        # дополнительные заголовки (name, value)
+        self.extra_headers = []
+
+    @property
+    def status_line(self):
+        return f"{self.code} {HTTPStatus(self.code).phrase}"
+
+    @property
+    def headers(self):
+        return [
+            ("Content-Type", self.content_type),
+            ("Content-Length", str(len(self.body))),
+            *self.extra_headers,
+        ]
+
+
+class Application:
+    """Ядро API, не зависящее от транспорта.
+
+    Принимает уже прочитанный запрос (метод, путь, заголовки, тело в байтах) и
+    возвращает Response. Поверх него работают MainHTTPHandler, AsyncHTTPServer,
+    а также WSGI (`wsgi`) и ASGI (`asgi`) точки входа.
+
+    Время этапов запроса (timing) пишется в контекст запроса ("timings", мс), а
+    с server_timing - ещё и в заголовок ответа Server-Timing.
+
+    С compression большие ответы сжимаются по Accept-Encoding (compressor).
+
+    Обработчики router должны соответствовать store: async - для AsyncStore,
+    синхронные - для Store (иначе ValueError). Без store (None, NullStore)
+    handle_async вызывает и синхронные обработчики - в пуле потоков.
+    """
+
+    def __init__(self, store=None, router=None, server_timing=SERVER_TIMING, compression=COMPRESSION):
+        router = ROUTER if router is None else router
+        if isinstance(store, (Store, AsyncStore)):
+            is_async = isinstance(store, AsyncStore)
+            mismatched = sorted(path for path, handler in router.items() if inspect.iscoroutinefunction(handler) != is_async)
+            if mismatched:
+                raise ValueError(f"handlers {mismatched} do not match {type(store).__name__}")
+        self.store = store
+        self.router = router
+        self.server_timing = server_timing
+        self.compressor = Compressor() if compression else None
+
+    @staticmethod
+    def get_request_id(headers):
+        return headers.get("HTTP_X_REQUEST_ID") or headers.get("X-Request-Id") or uuid.uuid4().hex
+
+    # --- общий код sync/async ---
+
+    def decode_request(self, path, body, context):
+        # Десериализация (получение тела запроса в python объект)
+        try:
+            with timing.stage("parse"):
+                return json_codec.loads(body), StatusCodes.OK
+        except Exception as e:
+            context["detail"] = str(e)
+            return None, StatusCodes.BAD_REQUEST
+
+    def get_handler(self, path, request, context):
+        # в журнал - только поля конверта запроса, без аргументов и токена
+        if isinstance(request, dict):
+            for field in ("method", "account", "login"):
+                if isinstance(request.get(field), str):
+                    context[field] = request[field]
+        return self.router.get(path.strip("/"))
+
+    def empty_request_code(self, path, request, context):
+        # пустое тело ({}, [], null): обрабатывать нечего, как и при невалидных аргументах
+        return StatusCodes.NOT_FOUND if self.get_handler(path, request, context) is None else StatusCodes.INVALID_REQUEST
+
+    def make_response(self, code, response_body, error_text, context):
+        # проверка на ошибки
+        if code not in ERRORS:
+            response = {"response": response_body, "code": code}
+        else:
+            error_message = response_body or ERRORS.get(code, "Unknown Error")
+            if code == StatusCodes.INTERNAL_ERROR:
+                error_message = f"{error_message}: {error_text}"
+
+            response = {"error": error_message, "code": code}
+
+        # Сериализация
+        with timing.stage("serialize"):
+            body = json_codec.dumps_bytes(response)
+
+        # логируем контекст без тела ответа (access_log)
+        context["code"] = code
+        if code in ERRORS:
+            context["error"] = response["error"]
+        timer = timing.current()
+        if timer is not None:
+            context["timings"] = timer.as_dict()
+        logging.info("%s %s", context["path"], code, extra={"access": context})
+
+        return Response(code, body)
+
+    @staticmethod
+    def ping():
+        return Response(StatusCodes.OK, b"Hello, world!", content_type="text/html")
+
+    @staticmethod
+    def not_implemented():
+        return Response(HTTPStatus.NOT_IMPLEMENTED, b"", content_type="text/html")
+
+    @staticmethod
+    def metrics_page():
+        return Response(StatusCodes.OK, metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+    def route_name(self, method, path):
+        # метка route - только известные пути, чтобы число временных рядов было ограничено
+        if method == "GET":
+            return "metrics" if path == "/metrics" else "ping"
+        if method == "POST" and path.strip("/") in self.router:
+            return path.strip("/")
+        return "unknown"
+
+    def observe(self, route, response, timer):
+        HTTP_REQUESTS.observe(timer.elapsed(), route, str(response.code))
+        if self.server_timing:
+            response.extra_headers.append(("Server-Timing", timer.server_timing()))
+
+    def compress(self, response, headers):
+        if self.compressor is None:
+            return response
+        return self.compressor.compress(response, headers.get("Accept-Encoding"))
+
+    def reject(self, path, headers, body_error):
+        """Ответ на запрос, тело которого не прочитано (body_reader.BodyError)."""
+        context = {"request_id": self.get_request_id(headers), "path": path, "detail": body_error.detail}
+        return self.make_response(body_error.code, {}, body_error.detail, context)
+
+    # --- синхронный путь ---
+
+    def handle(self, method, path, headers, body, body_error=None):
+        route = self.route_name(method, path)
+        timer, token = timing.start()
+        HTTP_IN_FLIGHT.inc(route)
+        try:
+            response = self.compress(self.dispatch(method, path, headers, body, body_error), headers)
+        finally:
+            HTTP_IN_FLIGHT.dec(route)
+            timing.finish(token)
+        self.observe(route, response, timer)
+        return response
+
+    def dispatch(self, method, path, headers, body, body_error=None):
+        if body_error is not None:
+            return self.reject(path, headers, body_error)
+        if method == "GET":
+            return self.metrics_page() if path == "/metrics" else self.ping()
+        if method == "POST":
+            return self.handle_post(path, headers, body)
+        return self.not_implemented()
+
+    def handle_post(self, path, headers, body):
+        response_body, code = {}, StatusCodes.OK
+        error_text = "Unknown"
+        context = {"request_id": self.get_request_id(headers), "path": path}
+
+        request, code = self.decode_request(path, body, context)
+        if request:
+            handler = self.get_handler(path, request, context)
+            if handler is not None:
+                try:
+                    response_body, code = handler({"body": request, "headers": headers}, context, self.store)
+                except Exception as e:
+                    logging.exception(f"Error: {e}")
+                    error_text = e
+                    code = StatusCodes.INTERNAL_ERROR
+            else:
+                code = StatusCodes.NOT_FOUND
+        elif code == StatusCodes.OK:
+            code = self.empty_request_code(path, request, context)
+
+        return self.make_response(code, response_body, error_text, context)
+
+    # --- асинхронный путь ---
+
+    async def handle_async(self, method, path, headers, body, body_error=None):
+        route = self.route_name(method, path)
+        timer, token = timing.start()
+        HTTP_IN_FLIGHT.inc(route)
+        try:
+            response = self.compress(await self.dispatch_async(method, path, headers, body, body_error), headers)
+        finally:
+            HTTP_IN_FLIGHT.dec(route)
+            timing.finish(token)
+        self.observe(route, response, timer)
+        return response
+
+    async def dispatch_async(self, method, path, headers, body, body_error=None):
+        if body_error is not None:
+            return self.reject(path, headers, body_error)
+        if method == "GET":
+            return self.metrics_page() if path == "/metrics" else self.ping()
+        if method == "POST":
+            return await self.handle_post_async(path, headers, body)
+        return self.not_implemented()
+
+    async def call_handler_async(self, handler, request, ctx):
+        if inspect.iscoroutinefunction(handler):
+            return await handler(request, ctx, self.store)
+        # синхронный обработчик не должен блокировать event loop; контекст (таймер запроса) передаётся в поток
+        loop = asyncio.get_running_loop()
+        run = functools.partial(contextvars.copy_context().run, handler, request, ctx, self.store)
+        return await loop.run_in_executor(None, run)
+
+    async def handle_post_async(self, path, headers, body):
+        response_body, code = {}, StatusCodes.OK
+        error_text = "Unknown"
+        context = {"request_id": self.get_request_id(headers), "path": path}
+
+        request, code = self.decode_request(path, body, context)
+        if request:
+            handler = self.get_handler(path, request, context)
+            if handler is not None:
+                try:
+                    response_body, code = await self.call_handler_async(
+                        handler, {"body": request, "headers": headers}, context
+                    )
+                except Exception as e:
+                    logging.exception(f"Error: {e}")
+                    error_text = e
+                    code = StatusCodes.INTERNAL_ERROR
+            else:
+                code = StatusCodes.NOT_FOUND
+        elif code == StatusCodes.OK:
+            code = self.empty_request_code(path, request, context)
+
+        return self.make_response(code, response_body, error_text, context)
+
+    # --- WSGI ---
+
+    @staticmethod
+    def wsgi_headers(environ):
+        headers = HTTPMessage()
+        for key, value in environ.items():
+            if key.startswith("HTTP_"):
+                headers[key[5:].replace("_", "-").title()] = value
+        for key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            if environ.get(key):
+                headers[key.replace("_", "-").title()] = environ[key]
+        return headers
+
+    @staticmethod
+    def wsgi_body(environ, headers):
+        """-> (тело, BodyError или None); Content-Length проверяется так же, как в MainHTTPHandler."""
+        body_reader = BodyReader()
+        try:
+            size = body_reader.get_length(headers, required=False)
+        except BodyError as e:
+            return b"", e
+        if size is None:
+            # chunked тело сервер уже собрал; без wsgi.input_terminated его конец не известен
+            if not environ.get("wsgi.input_terminated"):
+                return b"", None
+            body = environ["wsgi.input"].read(body_reader.max_size + 1)
+            try:
+                body_reader.check_size(len(body))
+            except BodyError as e:
+                return b"", e
+            return body, None
+        return (environ["wsgi.input"].read(size) if size else b""), None
+
+    def wsgi(self, environ, start_response):
+        headers = self.wsgi_headers(environ)
+        body, body_error = self.wsgi_body(environ, headers)
+
+        method, path = environ["REQUEST_METHOD"], environ.get("PATH_INFO", "/")
+        response = self.handle(method, path, headers, body, body_error)
+        start_response(response.status_line, response.headers)
+        return [response.body]
+
+    # --- ASGI ---
+
+    async def asgi_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                connect = getattr(self.store, "connect", None)
+                if connect is not None and inspect.iscoroutinefunction(connect):
+                    await connect()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                close = getattr(self.store, "close", None)
+                if close is not None and inspect.iscoroutinefunction(close):
+                    await close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def asgi(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.asgi_lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        headers = HTTPMessage()
+        for name, value in scope.get("headers", []):
+            headers[name.decode("latin-1")] = value.decode("latin-1")
+
+        chunks = []
+        size = 0
+        body_error = None
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+            try:
+                check_body_size(size)
+            except BodyError as e:
+                # остаток тела не читаем
+                body_error = e
+                chunks = []
+                break
+
+        response = await self.handle_async(scope["method"], scope["path"], headers, b"".join(chunks), body_error)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.code,
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in response.headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.body})
+
+
+# Фабрики для внешних серверов:
+#   gunicorn 'app:make_wsgi_app()'
+#   uvicorn --factory app:make_asgi_app
+def make_wsgi_app(store_params=store_params_ok):
+    return Application(Store(store_params)).wsgi
+
+
+def make_asgi_app(store_params=store_params_ok):
+    return Application(AsyncStore(store_params), router=ASYNC_ROUTER).asgi
@@ -0,0 +1,106 @@
+import asyncio
+import io
+from http import HTTPStatus
+from http.client import parse_headers
+
+from app import Response
+from body_reader import BodyError, BodyReader
+from config import KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS, StatusCodes
+
+
+class AsyncHTTPServer:
+    """asyncio-движок: каждое соединение обслуживается корутиной, а не потоком.
+
+    Запрос обрабатывает Application (обычно с ASYNC_ROUTER и AsyncStore), сервер
+    отвечает только за HTTP/1.1 поверх asyncio streams, включая постоянные
+    соединения. Синхронные обработчики в router Application выполняет в пуле
+    потоков loop, чтобы не блокировать event loop.
+    """
+
+    max_header_size = 64 * 1024
+    keepalive_timeout = KEEPALIVE_TIMEOUT
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+
+    def __init__(self, host, port, app):
+        self.host = host
+        self.port = port
+        self.app = app
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=self.max_header_size)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            requests_served = 0
+            keep_alive = True
+            body_reader = BodyReader()
+            while keep_alive:
+                requests_served += 1
+                keep_alive = await self.handle_one_request(
+                    reader, writer, last=requests_served >= self.max_keepalive_requests, body_reader=body_reader
+                )
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def handle_one_request(self, reader, writer, last=False, body_reader=None):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+        request_line, _, header_block = head.partition(b"\r\n")
+        try:
+            method, path, version = request_line.decode("latin-1").split()
+        except ValueError:
+            await self.send(writer, Response(StatusCodes.BAD_REQUEST, content_type="text/html"), keep_alive=False)
+            return False
+        headers = parse_headers(io.BytesIO(header_block))
+
+        connection = headers.get("Connection", "").lower()
+        if version == "HTTP/1.1":
+            keep_alive = connection != "close"
+        else:
+            keep_alive = connection == "keep-alive"
+
+        body_reader = body_reader or BodyReader()
+        required = method == "POST"
+        try:
+            if headers.get("Expect", "").lower() == "100-continue":
+                # слишком большое тело отклоняется до того, как клиент начнёт его отправлять
+                body_reader.get_length(headers, required)
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            body, body_error = await body_reader.read_async(reader, headers, required), None
+        except BodyError as e:
+            # непрочитанный остаток тела сломал бы следующий запрос в соединении
+            body, body_error = b"", e
+            keep_alive = False
+
+        response = await self.app.handle_async(method, path, headers, body, body_error)
+        if last or response.code == HTTPStatus.NOT_IMPLEMENTED:
+            keep_alive = False
+        await self.send(writer, response, keep_alive)
+        return keep_alive
+
+    async def send(self, writer, response, keep_alive):
+        lines = [f"HTTP/1.1 {response.status_line}"]
+        lines.extend(f"{name}: {value}" for name, value in response.headers)
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        head = "\r\n".join(lines) + "\r\n\r\n"
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
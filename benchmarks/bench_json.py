@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Сравнение JSON библиотек (json_codec.BACKENDS) на типичных данных API.
+
+    python -m benchmarks.bench_json -n 20000
+"""
+
+import time
+from optparse import OptionParser
+
+from json_codec import BACKENDS, StdlibBackend
+
+SCORE_REQUEST = StdlibBackend.dumps_bytes(
+    {
+        "account": "horns&hoofs",
+        "login": "h&f",
+        "method": "online_score",
+        "token": "55cc9ce545bcd144300fe9efc28e65d4" * 4,
+        "arguments": {
+            "phone": "79175002040",
+            "email": "stupnikov@otus.ru",
+            "first_name": "Стансилав",
+            "last_name": "Ступников",
+            "birthday": "01.01.1990",
+            "gender": 1,
+        },
+    }
+)
+INTERESTS_BLOB = StdlibBackend.dumps_bytes(["cars", "pets", "travel", "hi-tech", "sport"])
+INTERESTS_RESPONSE = {"response": {cid: ["books", "hi-tech"] for cid in range(100)}, "code": 200}
+BATCH_RESPONSE = {"response": [{"response": {"score": 4.5}, "code": 200}] * 500, "code": 200}
+
+
+def bench(fn, value, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        fn(value)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main():
+    op = OptionParser()
+    op.add_option("-n", "--iterations", action="store", type=int, default=20000)
+    opts, args = op.parse_args()
+
+    cases = [
+        ("decode score request", "loads", SCORE_REQUEST, opts.iterations),
+        ("decode interests blob", "loads", INTERESTS_BLOB, opts.iterations),
+        ("encode interests x100", "dumps_bytes", INTERESTS_RESPONSE, opts.iterations // 10),
+        ("encode batch x500", "dumps_bytes", BATCH_RESPONSE, opts.iterations // 100),
+    ]
+    names = list(BACKENDS)
+    print(f"{'us/op':<24}" + "".join(f"{name:>10}" for name in names))
+    for title, method, value, n in cases:
+        timings = [bench(getattr(BACKENDS[name], method), value, n) for name in names]
+        print(f"{title:<24}" + "".join(f"{timing:10.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
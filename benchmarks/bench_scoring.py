@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Сравнение get_score в цикле с векторизованным get_scores_columnar.
+
+    python -m benchmarks.bench_scoring -n 100000
+    python -m benchmarks.bench_scoring -n 100000 --cache   # с FakeRedis кэшем
+"""
+
+import random
+import time
+from optparse import OptionParser
+
+from config import store_params_ok
+from db.store import NullStore, StoreFake
+from scoring import get_score
+from vector_scoring import get_scores_columnar
+
+
+def make_columns(n, seed=0):
+    rnd = random.Random(seed)
+
+    def maybe(value):
+        return value if rnd.random() < 0.7 else None
+
+    rows = [
+        (
+            maybe(f"7{rnd.randrange(10**10):010d}"),
+            maybe(f"user{i}@otus.ru"),
+            maybe("01.01.2000"),
+            maybe(rnd.choice([0, 1, 2])),
+            maybe("a"),
+            maybe("b"),
+        )
+        for i in range(n)
+    ]
+    return rows, [list(column) for column in zip(*rows)]
+
+
+def timeit(name, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<24} {elapsed:8.3f} s")
+    return elapsed
+
+
+def main():
+    op = OptionParser()
+    op.add_option("-n", "--records", action="store", type=int, default=100000)
+    op.add_option("--cache", action="store_true", default=False)
+    opts, args = op.parse_args()
+
+    rows, columns = make_columns(opts.records)
+    store = StoreFake(store_params_ok) if opts.cache else NullStore()
+
+    loop = timeit("get_score loop", lambda: [get_score(store, *row) for row in rows])
+    vector = timeit("get_scores_columnar", lambda: get_scores_columnar(store, *columns))
+    if not opts.cache:
+        timeit("get_scores_columnar/none", lambda: get_scores_columnar(None, *columns))
+    print(f"speedup: {loop / vector:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
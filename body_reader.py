@@ -0,0 +1,165 @@
+"""Чтение тела HTTP запроса с ограничением размера.
+
+Content-Length больше max_size отклоняется (413) до чтения тела, POST без
+Content-Length и без Transfer-Encoding: chunked - 411. Chunked тело читается
+по частям, и размер проверяется до чтения каждой части.
+
+read() читает тело в буфер BodyReader, который переиспользуется между
+запросами одного соединения, и возвращает memoryview этого буфера - он
+действителен до следующего чтения. После BodyError остаток тела не прочитан,
+соединение нужно закрыть.
+"""
+
+import re
+
+from config import MAX_BODY_SIZE, StatusCodes
+
+# максимальная длина строки размера chunk (с расширениями) и строки trailer
+MAX_LINE_SIZE = 1024
+# буфер больше этого размера не сохраняется для следующих запросов соединения
+RETAIN_SIZE = 64 * 1024
+# chunk-size = 1*HEXDIG [ BWS ";" chunk-ext ] (RFC 9112): int(..., 16) пропускает "0x5", "+5", "0_5" и пробелы
+CHUNK_SIZE_LINE = re.compile(rb"([0-9A-Fa-f]+)(?:[ \t]*;[^\r\n]*)?\r?\n")
+
+
+class BodyError(Exception):
+    """Тело запроса не прочитано: code - HTTP код ответа."""
+
+    def __init__(self, code, detail):
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+
+
+def check_body_size(size, max_size=MAX_BODY_SIZE):
+    if size > max_size:
+        raise BodyError(StatusCodes.PAYLOAD_TOO_LARGE, f"body is larger than {max_size} bytes")
+
+
+class BodyReader:
+    def __init__(self, max_size=MAX_BODY_SIZE, retain_size=RETAIN_SIZE):
+        self.max_size = max_size
+        self.retain_size = retain_size
+        self.buffer = bytearray()
+
+    # --- общий код sync/async ---
+
+    def check_size(self, size):
+        check_body_size(size, self.max_size)
+
+    def get_length(self, headers, required=True):
+        """-> None для chunked тела, иначе Content-Length (0 без тела, если оно не обязательно)."""
+        transfer_encoding = headers.get("Transfer-Encoding")
+        if transfer_encoding is not None:
+            if transfer_encoding.strip().lower() != "chunked":
+                raise BodyError(StatusCodes.NOT_IMPLEMENTED, f"unsupported transfer encoding {transfer_encoding}")
+            return None
+
+        content_length = headers.get("Content-Length")
+        if content_length is None:
+            if required:
+                raise BodyError(StatusCodes.LENGTH_REQUIRED, "Content-Length is required")
+            return 0
+        # только ASCII цифры: isdigit() пропускает "²" из latin-1 заголовка, а int() - "+1" и "1_0"
+        value = content_length.strip()
+        if not (value.isascii() and value.isdecimal()):
+            raise BodyError(StatusCodes.BAD_REQUEST, f"invalid Content-Length {content_length!r}")
+        size = int(value)
+        self.check_size(size)
+        return size
+
+    def reserve(self, size, keep=0):
+        """Буфер не меньше size байт; первые keep байт (уже прочитанные части chunked тела) сохраняются."""
+        if keep:
+            if len(self.buffer) < size:
+                buffer = bytearray(max(size, min(2 * len(self.buffer), self.max_size)))
+                buffer[:keep] = self.buffer[:keep]
+                self.buffer = buffer
+            return
+        # большой буфер прошлого запроса не держим, пока соединение обслуживает маленькие
+        if len(self.buffer) < size or (len(self.buffer) > self.retain_size >= size):
+            self.buffer = bytearray(size)
+
+    def parse_chunk_size(self, line, size):
+        if len(line) > MAX_LINE_SIZE or not line.endswith(b"\n"):
+            raise BodyError(StatusCodes.BAD_REQUEST, "invalid chunk size line")
+        match = CHUNK_SIZE_LINE.fullmatch(line)
+        if match is None:
+            raise BodyError(StatusCodes.BAD_REQUEST, "invalid chunk size")
+        chunk_size = int(match.group(1), 16)
+        self.check_size(size + chunk_size)
+        return chunk_size
+
+    @staticmethod
+    def check_chunk_end(crlf):
+        if crlf not in (b"\r\n", b"\n"):
+            raise BodyError(StatusCodes.BAD_REQUEST, "chunk is not terminated by CRLF")
+
+    # --- файловый поток (BaseHTTPRequestHandler.rfile) ---
+
+    def read(self, rfile, headers, required=True):
+        size = self.get_length(headers, required)
+        if size is None:
+            return self.read_chunked(rfile)
+        self.reserve(size)
+        self.read_into(rfile, 0, size)
+        return memoryview(self.buffer)[:size]
+
+    def read_into(self, rfile, start, end):
+        view = memoryview(self.buffer)
+        while start < end:
+            n = rfile.readinto(view[start:end])
+            if not n:
+                raise BodyError(StatusCodes.BAD_REQUEST, "incomplete body")
+            start += n
+
+    def read_chunked(self, rfile):
+        size = 0
+        while True:
+            chunk_size = self.parse_chunk_size(rfile.readline(MAX_LINE_SIZE + 1), size)
+            if chunk_size == 0:
+                break
+            self.reserve(size + chunk_size, keep=size)
+            self.read_into(rfile, size, size + chunk_size)
+            size += chunk_size
+            self.check_chunk_end(rfile.readline(3))
+        # trailer до пустой строки
+        while True:
+            line = rfile.readline(MAX_LINE_SIZE + 1)
+            if len(line) > MAX_LINE_SIZE or not line.endswith(b"\n"):
+                raise BodyError(StatusCodes.BAD_REQUEST, "invalid trailer")
+            if line in (b"\r\n", b"\n"):
+                break
+        return memoryview(self.buffer)[:size]
+
+    # --- asyncio.StreamReader (буфер у StreamReader свой) ---
+
+    async def read_async(self, reader, headers, required=True):
+        size = self.get_length(headers, required)
+        if size is None:
+            return await self.read_chunked_async(reader)
+        return await reader.readexactly(size)
+
+    async def readline_async(self, reader):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # строка длиннее лимита StreamReader
+            line = b""
+        if len(line) > MAX_LINE_SIZE or not line.endswith(b"\n"):
+            raise BodyError(StatusCodes.BAD_REQUEST, "invalid chunked body")
+        return line
+
+    async def read_chunked_async(self, reader):
+        chunks = []
+        size = 0
+        while True:
+            chunk_size = self.parse_chunk_size(await self.readline_async(reader), size)
+            if chunk_size == 0:
+                break
+            chunks.append(await reader.readexactly(chunk_size))
+            size += chunk_size
+            self.check_chunk_end(await self.readline_async(reader))
+        while await self.readline_async(reader) not in (b"\r\n", b"\n"):
+            pass
+        return b"".join(chunks)
@@ -0,0 +1,101 @@
+"""Сжатие ответов (Content-Encoding) по заголовку Accept-Encoding клиента.
+
+Сжимаются только ответы не меньше min_size байт: короткие ответы score от
+сжатия не выигрывают, а CPU тратят. Кодировка выбирается по q из
+Accept-Encoding, при равных q - в порядке encodings сервера. Если сжатый ответ
+не меньше исходного, отправляется исходный.
+
+Метрики по кодировке: CPU время сжатия (time.thread_time), размер ответов до
+сжатия и сэкономленные байты; время сжатия ответа - этап compress (timing).
+"""
+
+import gzip
+import time
+import zlib
+
+import metrics
+import timing
+from config import compression_params
+
+COMPRESSION_CPU = metrics.counter(
+    "http_response_compression_cpu_seconds_total", "CPU время сжатия ответов, сек", ("encoding",)
+)
+COMPRESSION_INPUT = metrics.counter(
+    "http_response_compression_input_bytes_total", "Размер сжимаемых ответов до сжатия, байт", ("encoding",)
+)
+COMPRESSION_SAVED = metrics.counter(
+    "http_response_compression_saved_bytes_total", "Сэкономлено сжатием ответов, байт", ("encoding",)
+)
+
+# deflate в HTTP - поток в формате zlib (RFC 9110), а не "сырой" deflate
+ENCODERS = {
+    "gzip": lambda body, level: gzip.compress(body, compresslevel=level, mtime=0),
+    "deflate": lambda body, level: zlib.compress(body, level),
+}
+ALIASES = {"x-gzip": "gzip"}
+
+
+def parse_accept_encoding(value):
+    """-> {кодировка: q}"""
+    accepted = {}
+    for item in value.split(","):
+        name, *params = item.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, q_value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(q_value)
+                except ValueError:
+                    q = 0.0
+        accepted[ALIASES.get(name, name)] = q
+    return accepted
+
+
+class Compressor:
+    def __init__(self, min_size=compression_params["min_size"], level=compression_params["level"], encodings=None):
+        encodings = tuple(compression_params["encodings"] if encodings is None else encodings)
+        unknown = set(encodings) - set(ENCODERS)
+        if unknown:
+            raise ValueError(f"unknown encodings {sorted(unknown)}")
+        self.min_size = min_size
+        self.level = level
+        self.encodings = encodings
+
+    def negotiate(self, accept_encoding):
+        """-> кодировка для ответа или None (без сжатия)"""
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, response, accept_encoding):
+        """Сжимает тело response на месте, если клиент это принимает. -> response"""
+        if len(response.body) < self.min_size:
+            return response
+        # представление ответа такого размера зависит от Accept-Encoding (для кэширующих прокси)
+        response.extra_headers.append(("Vary", "Accept-Encoding"))
+        encoding = self.negotiate(accept_encoding)
+        if encoding is None:
+            return response
+
+        started = time.thread_time()
+        with timing.stage("compress"):
+            body = ENCODERS[encoding](response.body, self.level)
+        COMPRESSION_CPU.inc(encoding, amount=time.thread_time() - started)
+        COMPRESSION_INPUT.inc(encoding, amount=len(response.body))
+        if len(body) >= len(response.body):
+            return response
+
+        COMPRESSION_SAVED.inc(encoding, amount=len(response.body) - len(body))
+        response.body = body
+        response.extra_headers.append(("Content-Encoding", encoding))
+        return response
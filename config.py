@@ -1,6 +1,23 @@
 SALT = "Otus"
 ADMIN_LOGIN = "admin"
 ADMIN_SALT = "42"
+# число (account, login), для которых кэшируется ожидаемый токен
+AUTH_CACHE_SIZE = 4096
+
+# HTTP/1.1 keep-alive: время простоя соединения (сек) и число запросов на соединение
+KEEPALIVE_TIMEOUT = 15
+MAX_KEEPALIVE_REQUESTS = 1000
+
+# максимальное число элементов в /batch запросе
+BATCH_MAX_SIZE = 1000
+# максимальный размер тела запроса, байт (больше - 413 без чтения тела)
+MAX_BODY_SIZE = 1024 * 1024
+
+# L1 кэш в памяти процесса перед Redis: префиксы ключей, TTL (сек) для прочитанных из Redis значений, лимиты
+L1_CACHE_PREFIXES = ("uid:",)
+L1_CACHE_TTL = 5
+L1_CACHE_MAX_ENTRIES = 10000
+L1_CACHE_MAX_BYTES = 16 * 1024 * 1024
 
 
 class StatusCodes:
@@ -8,8 +25,11 @@ class StatusCodes:
     BAD_REQUEST = 400
     FORBIDDEN = 403
     NOT_FOUND = 404
+    LENGTH_REQUIRED = 411
+    PAYLOAD_TOO_LARGE = 413
     INVALID_REQUEST = 422
     INTERNAL_ERROR = 500
+    NOT_IMPLEMENTED = 501
 
 
 class ClientStatus:
@@ -22,8 +42,11 @@ ERRORS = {
     StatusCodes.BAD_REQUEST: "Bad Request",
     StatusCodes.FORBIDDEN: "Forbidden",
     StatusCodes.NOT_FOUND: "Not Found",
+    StatusCodes.LENGTH_REQUIRED: "Length Required",
+    StatusCodes.PAYLOAD_TOO_LARGE: "Payload Too Large",
     StatusCodes.INVALID_REQUEST: "Invalid Request",
     StatusCodes.INTERNAL_ERROR: "Internal Server Error",
+    StatusCodes.NOT_IMPLEMENTED: "Not Implemented",
 }
 
 UNKNOWN = 0
@@ -62,3 +85,75 @@ store_params_fail = {
     "db": 0,
     "decode_responses": True,
 }
+
+# Пул соединений Store: таймауты и бюджет повторов ограничены, чтобы при
+# недоступном Redis вызов Store завершался за миллисекунды, а не минуты
+store_pool_params = {
+    "pool_size": 64,  # соединений на процесс
+    "pool_timeout": 0.05,  # ожидание свободного соединения, сек
+    "connect_timeout": 0.1,
+    "read_timeout": 0.5,
+    "retries": 2,  # повторов на вызов
+    "backoff_base": 0.005,
+    "backoff_cap": 0.05,
+    "deadline": 1.0,  # общий дедлайн вызова (с повторами), сек
+    "prewarm": 4,  # соединений, открываемых при старте
+}
+
+# Circuit breaker вызовов Store (отдельные для кэша и постоянного хранилища)
+store_breaker_params = {
+    "failure_threshold": 5,  # ошибок подряд до размыкания
+    "reset_timeout": 5.0,  # сек в open до пробного вызова
+    "half_open_max_calls": 1,
+}
+
+# Отложенная (write-behind) запись кэша score в Redis фоновым флашером
+store_write_behind_params = {
+    "max_size": 10000,  # записей в очереди; сверх - отбрасываются
+    "batch_size": 500,  # записей в одном pipeline
+    "flush_interval": 0.005,  # сек ожидания новых записей флашером
+}
+
+# Политики кэша по префиксу ключа (db.revalidate.CachePolicy): ttl - мягкий TTL, сек;
+# grace - сколько после него отдавать устаревшее значение, пока идёт фоновый пересчёт;
+# beta - агрессивность раннего пересчёта XFetch, 0 - выключен. "" - политика по умолчанию
+cache_policies = {
+    "": {"ttl": 30, "grace": 0, "beta": 0},
+    "uid:": {"ttl": 30, "grace": 30, "beta": 1.0},
+}
+
+# Ключи кэша score (db.keys.KeyBuilder): версию нужно увеличить при изменении
+# формулы score - старые записи перестанут читаться и истекут по TTL
+SCORE_KEY_VERSION = 1
+SCORE_KEY_HASHER = "blake2b"
+
+# JSON библиотека (json_codec): auto - orjson, если установлен, затем ujson, затем json
+JSON_BACKEND = "auto"
+
+# /metrics: границы бакетов гистограмм задержек (сек) и период записи снимка
+# метрик воркера в pre-fork режиме (сек) - на столько могут отставать чужие воркеры
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_FLUSH_INTERVAL = 1.0
+
+# заголовок Server-Timing с временем этапов запроса (timing) в ответах
+SERVER_TIMING = False
+
+# сжатие ответов по Accept-Encoding (compression.Compressor): ответы меньше min_size байт
+# не сжимаются, level - уровень zlib (1 - быстрее, 9 - меньше), encodings - в порядке предпочтения
+COMPRESSION = True
+compression_params = {
+    "min_size": 1024,
+    "level": 6,
+    "encodings": ("gzip", "deflate"),
+}
+
+# Журнал (access_log): sample_rate - доля успешных запросов в журнале (ошибки пишутся всегда),
+# пачка строк на одну запись в файл, период записи неполной пачки (сек), лимит очереди записей
+access_log_params = {
+    "sample_rate": 1.0,
+    "batch_size": 256,
+    "flush_interval": 0.5,
+    "max_queue": 10000,
+}
+# поля, значения которых не попадают в журнал
+LOG_SECRET_FIELDS = frozenset({"token", "password"})
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+from redis.exceptions import ConnectionError
+
+
+class CircuitOpenError(ConnectionError):
+    """Вызов отклонён без обращения к Redis: breaker разомкнут."""
+
+
+class CircuitBreaker:
+    """Circuit breaker для вызовов Store.
+
+    closed    - вызовы проходят; failure_threshold ошибок подряд размыкают breaker.
+    open      - вызовы сразу отклоняются CircuitOpenError, пока не пройдёт reset_timeout.
+    half_open - пропускается не больше half_open_max_calls пробных вызовов: успех
+                замыкает breaker, ошибка снова размыкает его на reset_timeout.
+
+    Ошибками считаются только исключения из errors, остальные (например,
+    ResponseError) означают, что Redis ответил. Потокобезопасен.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    # числовое значение состояния для мониторинга
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name,
+        errors=(ConnectionError,),
+        failure_threshold=5,
+        reset_timeout=5.0,
+        half_open_max_calls=1,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.errors = errors
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_calls = 0
+        self.lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def set_state(self, state):
+        if state != self.state:
+            logging.warning("circuit breaker %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+
+    def before_call(self):
+        with self.lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"circuit breaker {self.name} is open")
+                self.set_state(self.HALF_OPEN)
+                self.trial_calls = 0
+            if self.state == self.HALF_OPEN:
+                if self.trial_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"circuit breaker {self.name} is half-open")
+                self.trial_calls += 1
+
+    def record_success(self):
+        with self.lock:
+            # успех вызова, начатого до размыкания, не закрывает OPEN: закрывает только пробный вызов HALF_OPEN
+            if self.state == self.OPEN:
+                return
+            self.failures = 0
+            self.trial_calls = 0
+            self.set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.trial_calls = 0
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.set_state(self.OPEN)
+
+    def release(self):
+        # вызов прерван не ошибкой Redis (например, отменён) - освобождаем пробный слот
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.trial_calls:
+                self.trial_calls -= 1
+
+    def call(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except self.errors:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except self.errors:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "state_code": self.STATE_CODES[self.state],
+                "failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,91 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """In-process кэш (L1) перед Redis: TTL на запись, LRU-вытеснение, лимит памяти.
+
+    Потокобезопасен. Размер записи оценивается через sys.getsizeof ключа и
+    значения, поэтому max_bytes - приблизительный бюджет, а не точный лимит.
+    Счётчики hits/misses/evictions/expirations доступны через stats().
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, default_ttl=5, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.clock = clock
+
+        # key -> (value, expires_at, size)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def entry_size(key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= self.clock():
+                del self.entries[key]
+                self.size -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        size = self.entry_size(key, value)
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self.entries[key] = (value, self.clock() + ttl, size)
+            self.size += size
+
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
@@ -0,0 +1,58 @@
+import json_codec
+
+
+class FloatCodec:
+    """float <-> строка; repr сохраняет значение без потерь."""
+
+    @staticmethod
+    def encode(value):
+        return repr(float(value))
+
+    @staticmethod
+    def decode(raw):
+        return float(raw)
+
+
+class JSONCodec:
+    @staticmethod
+    def encode(value):
+        return json_codec.dumps(value)
+
+    @staticmethod
+    def decode(raw):
+        return json_codec.loads(raw)
+
+
+class EntryCodec:
+    """Запись кэша со значением и метаданными для stale-while-revalidate.
+
+    Формат: "e1|<expires_at>|<delta>|<значение value_codec>", где delta - время
+    вычисления значения (сек), expires_at - unix-время истечения мягкого TTL.
+    Значение идёт последним, поэтому "|" в нём не мешает разбору. Строка без
+    префикса - голое значение без метаданных: оно считается свежим до истечения
+    TTL в Redis.
+    """
+
+    PREFIX = "e1|"
+
+    def __init__(self, value_codec):
+        self.value_codec = value_codec
+
+    def encode(self, value, delta, expires_at):
+        return self.header(delta, expires_at) + self.value_codec.encode(value)
+
+    def header(self, delta, expires_at):
+        """Всё до значения: так запись собирает Lua скрипт, вычисляющий значение в Redis."""
+        # delta - значащие цифры, а не знаки после запятой: микросекунды не округляются до 0
+        return f"{self.PREFIX}{expires_at:.3f}|{delta:.6g}|"
+
+    def decode(self, raw):
+        """-> (value, delta, expires_at) или None для промаха; expires_at=None - без метаданных."""
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        if raw.startswith(self.PREFIX):
+            expires_at, delta, value = raw[len(self.PREFIX) :].split("|", 2)
+            return self.value_codec.decode(value), float(delta), float(expires_at)
+        return self.value_codec.decode(raw), 0.0, None
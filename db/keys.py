@@ -0,0 +1,61 @@
+import hashlib
+
+try:
+    import xxhash
+except ImportError:  # необязательная зависимость
+    xxhash = None
+
+
+def blake2b_hex(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def md5_hex(data):
+    return hashlib.md5(data).hexdigest()
+
+
+# имя -> функция bytes -> hex; выбирается в config.SCORE_KEY_HASHER
+HASHERS = {
+    "blake2b": blake2b_hex,
+    "md5": md5_hex,
+}
+if xxhash is not None:
+    HASHERS["xxh3"] = lambda data: xxhash.xxh3_128_hexdigest(data)
+
+
+def normalize_part(part):
+    # None и "" - поле не передано; числа и строки с одинаковым значением дают один ключ
+    if part is None:
+        return ""
+    return str(part).strip()
+
+
+class KeyBuilder:
+    """Ключи кэша вида "<prefix>v<version>:<hash>".
+
+    Части ключа нормализуются и кодируются с длиной ("<len>:<value>"), поэтому
+    границы частей однозначны ("1" + "23" != "12" + "3"). Смена version делает
+    все старые ключи недоступными (они истекут по TTL или удаляются по pattern).
+    """
+
+    def __init__(self, prefix, version, hasher="blake2b"):
+        self.prefix = prefix
+        self.version = version
+        self.hash = HASHERS[hasher]
+        self.namespace = f"{prefix}v{version}:"
+
+    @staticmethod
+    def encode_parts(parts):
+        encoded = []
+        for part in parts:
+            part = normalize_part(part)
+            encoded.append(f"{len(part)}:{part}")
+        return "".join(encoded).encode("utf-8")
+
+    def build(self, *parts):
+        return self.namespace + self.hash(self.encode_parts(parts))
+
+    @property
+    def pattern(self):
+        """Шаблон SCAN для всех ключей текущей версии."""
+        return self.namespace + "*"
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import cache_policies
+
+
+class CachePolicy:
+    """Политика записи кэша: ttl - мягкий TTL (после него значение устаревшее),
+    grace - сколько ещё отдавать устаревшее значение, пока идёт фоновый пересчёт,
+    beta - агрессивность раннего пересчёта XFetch (0 - выключен).
+
+    В Redis запись живёт hard_ttl = ttl + grace.
+    """
+
+    def __init__(self, ttl, grace=0, beta=1.0):
+        self.ttl = ttl
+        self.grace = grace
+        self.beta = beta
+
+    @property
+    def hard_ttl(self):
+        return self.ttl + self.grace
+
+
+DEFAULT_POLICY = CachePolicy(**cache_policies[""])
+
+
+def get_policy(key, policies=None):
+    """Политика по самому длинному совпавшему префиксу ключа."""
+    policies = cache_policies if policies is None else policies
+    prefix = max((prefix for prefix in policies if key.startswith(prefix)), key=len, default=None)
+    return DEFAULT_POLICY if prefix is None else CachePolicy(**policies[prefix])
+
+
+# Записи кэша (value, delta, expires_at) кодирует db.codecs.EntryCodec
+
+
+def is_stale(expires_at, now=None):
+    return expires_at is not None and (time.time() if now is None else now) >= expires_at
+
+
+def xfetch(delta, expires_at, beta, now=None, rand=random.random):
+    """Вероятностный ранний пересчёт (XFetch): чем дороже вычисление (delta) и ближе
+    истечение, тем вероятнее пересчёт до него. Одновременно истекающие ключи так
+    обновляются в разное время.
+    """
+    if expires_at is None or beta <= 0:
+        return False
+    now = time.time() if now is None else now
+    return now - delta * beta * math.log(1.0 - rand()) >= expires_at
+
+
+def needs_refresh(entry, policy, now=None):
+    _, delta, expires_at = entry
+    return is_stale(expires_at, now) or xfetch(delta, expires_at, policy.beta, now)
+
+
+class RevalidatorStats:
+    def __init__(self):
+        self.pending = set()
+        self.refreshed = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def stats(self):
+        return {"refreshed": self.refreshed, "skipped": self.skipped, "errors": self.errors, "pending": len(self.pending)}
+
+
+class Revalidator(RevalidatorStats):
+    """Фоновый пересчёт устаревших записей кэша в небольшом пуле потоков.
+
+    На ключ одновременно идёт не больше одного пересчёта: повторные submit()
+    для того же ключа пропускаются (skipped).
+    """
+
+    def __init__(self, workers=2):
+        super().__init__()
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        with self.lock:
+            if key in self.pending:
+                self.skipped += 1
+                return False
+            self.pending.add(key)
+            if self.executor is None:
+                # пул создаётся при первом пересчёте, уже в процессе-воркере
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="revalidate")
+            self.executor.submit(self.run, key, fn, args)
+        return True
+
+    def run(self, key, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            self.errors += 1
+            logging.warning("revalidation of %s failed: %s", key, e)
+        else:
+            self.refreshed += 1
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def close(self):
+        """Дожидается начатых пересчётов."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class AsyncRevalidator(RevalidatorStats):
+    """Вариант Revalidator для asyncio: пересчёт - задача в текущем event loop."""
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = set()
+
+    def submit(self, key, fn, *args):
+        if key in self.pending:
+            self.skipped += 1
+            return False
+        self.pending.add(key)
+        # пустой контекст: пересчёт не относится к запросу, который его запустил (timing)
+        task = asyncio.get_running_loop().create_task(self.run(key, fn, args), context=contextvars.Context())
+        # ссылка на задачу, иначе её может собрать GC
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def run(self, key, fn, args):
+        try:
+            await fn(*args)
+        except Exception as e:
+            self.errors += 1
+            logging.warning("revalidation of %s failed: %s", key, e)
+        else:
+            self.refreshed += 1
+        finally:
+            self.pending.discard(key)
+
+    async def close(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -0,0 +1,129 @@
+import asyncio
+import copy
+import threading
+
+
+class FlightStats:
+    def __init__(self):
+        self.calls = {}
+        # leaders - вычислений выполнено, coalesced - вызовов дождались чужого результата
+        self.leaders = 0
+        self.coalesced = 0
+
+    def stats(self):
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self.calls)}
+
+
+def raise_shared(error):
+    """Поднимает исключение первого вызова в ожидающем: новым экземпляром того же типа
+    с цепочкой from error. Один экземпляр, поднятый в нескольких вызовах, делил бы
+    между ними __traceback__ и __context__.
+    """
+    try:
+        shared = copy.copy(error)
+    except Exception:
+        # тип, который не копируется (нестандартный __init__) - как есть
+        shared = None
+    if shared is None:
+        raise error
+    raise shared from error
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(FlightStats):
+    """Объединение одинаковых одновременных вызовов (для потоков).
+
+    do(key, fn, ...) выполняет fn только в первом потоке для key, остальные
+    потоки с тем же key ждут и получают его результат (или его исключение).
+    Результат не кэшируется: после завершения следующий вызов выполнит fn снова.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise_shared(call.error)
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+class LeaderCancelled(Exception):
+    """Первый вызов AsyncSingleFlight отменён, его результата не будет."""
+
+
+class AsyncSingleFlight(FlightStats):
+    """Вариант SingleFlight для asyncio: fn - корутинная функция, ожидающие
+    вызовы ждут future первого. Экземпляр используется внутри одного event loop.
+
+    Отмена первого вызова (например, клиент закрыл соединение) не отменяет
+    ожидающих: один из них выполняет fn заново, остальные ждут уже его.
+    В coalesced вызов считается один раз - когда получил чужой результат или исключение.
+    """
+
+    async def do(self, key, fn, *args, **kwargs):
+        while (future := self.calls.get(key)) is not None:
+            try:
+                # отмена ожидающего не должна отменять общий future
+                result = await asyncio.shield(future)
+            except LeaderCancelled:
+                continue
+            except BaseException as e:
+                # CancelledError самого ожидающего - не исключение первого вызова
+                if not future.done() or future.cancelled() or future.exception() is not e:
+                    raise
+                self.coalesced += 1
+                raise_shared(e)
+            self.coalesced += 1
+            return result
+
+        future = self.calls[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # CancelledError - BaseException: ожидающим он прошёл бы мимо except Exception
+            self.set_exception(future, LeaderCancelled(key))
+            raise
+        except BaseException as e:
+            self.set_exception(future, e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self.calls[key]
+        return result
+
+    @staticmethod
+    def set_exception(future, error):
+        future.set_exception(error)
+        # исключение уже получено первым вызовом - без предупреждения asyncio, если ожидающих нет
+        future.exception()
@@ -1,81 +1,726 @@
+import asyncio
+import time
+
 import redis
+import redis.asyncio
 from fakeredis import FakeRedis
+from fakeredis.aioredis import FakeRedis as FakeAsyncRedis
+from redis.asyncio.retry import Retry as AsyncRetry
 from redis.backoff import ExponentialBackoff
-from redis.exceptions import ConnectionError  # BusyLoadingError,; TimeoutError
+from redis.exceptions import ConnectionError, NoScriptError, ResponseError, TimeoutError
 from redis.retry import Retry
 
-# from redis.client import Redis
+import metrics
+import timing
+from config import store_breaker_params, store_pool_params
+
+from .breaker import CircuitBreaker
+from .revalidate import AsyncRevalidator, Revalidator
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .write_behind import AsyncWriteBehindQueue, WriteBehindQueue
+
+# Ошибки Redis, после которых Store считает хранилище недоступным
+STORE_ERRORS = (ConnectionError, TimeoutError)
+# Lua скрипты не поддерживаются: выключены на сервере или FakeRedis без lupa
+SCRIPTING_ERRORS = (ResponseError, ImportError)
+
+# op - команда Redis или метод Store (pipeline_mget, pipeline_set), breaker - cache/persistent
+STORE_CALLS = metrics.histogram("store_call_duration_seconds", "Время вызова Redis из Store, сек", ("op", "breaker"))
+STORE_CALL_ERRORS = metrics.counter(
+    "store_call_errors_total", "Ошибки вызовов Redis, включая отклонённые circuit breaker", ("op", "breaker")
+)
+# снимаются при сборе метрик (export_store_stats)
+STORE_STATS = metrics.gauge("store_stats", "Счётчики компонентов Store", ("component", "stat"))
+STORE_BREAKER_STATE = metrics.gauge(
+    "store_breaker_state", "Состояние circuit breaker: 0 - closed, 1 - half_open, 2 - open", ("breaker",), aggregate="max"
+)
+
+
+class DeadlineRetry(Retry):
+    """Retry с бюджетом повторов и общим дедлайном на вызов.
+
+    Повтор не начинается, если вместе с паузой он выйдет за дедлайн, поэтому
+    вызов длится не дольше deadline + одного таймаута сокета.
+    """
+
+    def __init__(self, backoff, retries, deadline):
+        super().__init__(backoff, retries)
+        self.deadline = deadline
+
+    def call_with_retry(self, do, fail):
+        self._backoff.reset()
+        deadline = time.monotonic() + self.deadline
+        failures = 0
+        while True:
+            try:
+                return do()
+            except self._supported_errors as error:
+                failures += 1
+                fail(error)
+                backoff = self._backoff.compute(failures)
+                if failures > self._retries or time.monotonic() + backoff >= deadline:
+                    raise error
+                if backoff > 0:
+                    time.sleep(backoff)
+
+
+class AsyncDeadlineRetry(AsyncRetry):
+    """Асинхронный вариант DeadlineRetry."""
+
+    def __init__(self, backoff, retries, deadline):
+        super().__init__(backoff, retries)
+        self.deadline = deadline
+
+    async def call_with_retry(self, do, fail):
+        self._backoff.reset()
+        deadline = time.monotonic() + self.deadline
+        failures = 0
+        while True:
+            try:
+                return await do()
+            except self._supported_errors as error:
+                failures += 1
+                await fail(error)
+                backoff = self._backoff.compute(failures)
+                if failures > self._retries or time.monotonic() + backoff >= deadline:
+                    raise error
+                if backoff > 0:
+                    await asyncio.sleep(backoff)
+
+
+def make_pool_params(pool_params=None):
+    return {**store_pool_params, **(pool_params or {})}
+
+
+def make_breaker_params(breaker_params=None):
+    return {**store_breaker_params, **(breaker_params or {})}
+
+
+class LocalCacheMixin:
+    """L1-кэш (db.cache.LocalCache) в памяти процесса перед Redis.
+
+    Включается для ключей с префиксами из l1_prefixes (например, "uid:"):
+    чтения таких ключей сначала идут в L1, записи обновляют L1 с тем же TTL.
+    Значение, прочитанное из Redis, кладётся в L1 на l1.default_ttl секунд.
+    """
+
+    l1 = None
+    l1_prefixes = ()
+
+    def init_l1(self, l1_cache, l1_prefixes):
+        self.l1 = l1_cache
+        self.l1_prefixes = tuple(l1_prefixes)
+
+    def l1_enabled(self, key):
+        return self.l1 is not None and isinstance(key, str) and key.startswith(self.l1_prefixes)
+
+    def l1_get(self, key):
+        return self.l1.get(key) if self.l1_enabled(key) else None
+
+    def l1_set(self, key, value, ttl=None):
+        if value is not None and self.l1_enabled(key):
+            self.l1.set(key, value, ttl)
+
+    def l1_delete(self, key):
+        if self.l1_enabled(key):
+            self.l1.delete(key)
+
+    def l1_get_many(self, keys):
+        """-> (значения из L1 или None, индексы ключей, которые нужно прочитать из Redis)"""
+        values = [self.l1_get(key) for key in keys]
+        return values, [i for i, value in enumerate(values) if value is None]
+
+    def l1_fill_many(self, keys, values, missing, fetched):
+        for i, value in zip(missing, fetched):
+            values[i] = value
+            self.l1_set(keys[i], value)
+        return values
+
+
+class Store(LocalCacheMixin):
+    """Обёртка над redis.Redis.
+
+    Потокобезопасность: один экземпляр Store можно разделять между потоками
+    ThreadPoolHTTPServer. Собственного изменяемого состояния у Store нет, а
+    redis.Redis берёт отдельное соединение из ConnectionPool на каждую команду.
+    Нельзя разделять Store между процессами - после fork нужен новый экземпляр.
+
+    Пул, таймауты, повторы и дедлайн вызова задаются pool_params (по умолчанию
+    config.store_pool_params). Пул блокирующий: при исчерпании соединений поток
+    ждёт не дольше pool_timeout и получает ConnectionError.
+
+    Вызовы Redis идут через два circuit breaker (db.breaker): cache_breaker для
+    *_cache методов и breaker для остальных. Разомкнутый cache_breaker сразу
+    даёт промах кэша, разомкнутый breaker - ConnectionError.
 
+    С write_behind_params записи кэша (set_cache/set_cache_many) не ждут Redis:
+    они уходят в db.write_behind.WriteBehindQueue и пишутся фоновым потоком
+    пачками. L1 при этом обновляется сразу.
 
-class Store:
-    n_retries = 100
-    retry = Retry(ExponentialBackoff(), n_retries)
+    scripts - Lua скрипты, загружаемые (SCRIPT LOAD) при старте для
+    get_or_eval_cache. Если скрипты не поддерживаются, get_or_eval_cache
+    возвращает None и вызывающий код идёт обычным путём.
 
-    def __init__(self, store_params):
-        self.r = redis.Redis(
-            # В рамках данной реализации переподключение очевидно не работает...
-            **store_params,
+    flight (db.singleflight) объединяет одновременные чтения/расчёты одного
+    ключа кэша, его счётчики - flight.stats(). revalidator (db.revalidate)
+    пересчитывает устаревшие записи кэша в фоне.
+
+    Время и ошибки вызовов Redis пишутся в метрики store_call_* (metrics),
+    счётчики компонентов - stats() (export_store_stats).
+    """
+
+    mget_chunk_size = 500
+
+    def __init__(
+        self,
+        store_params,
+        l1_cache=None,
+        l1_prefixes=(),
+        pool_params=None,
+        breaker_params=None,
+        write_behind_params=None,
+        scripts=(),
+    ):
+        self.init_l1(l1_cache, l1_prefixes)
+        self.init_breakers(breaker_params)
+        self.pool_params = make_pool_params(pool_params)
+        self.retry = self.make_retry()
+        self.r = self.make_client(store_params)
+        self.prewarm(self.pool_params["prewarm"])
+        self.flight = SingleFlight()
+        self.revalidator = Revalidator()
+        # script -> sha; False - скрипты не поддерживаются, None - ещё не загружен
+        self.scripts = dict.fromkeys(scripts)
+        for script in scripts:
+            try:
+                self.load_script(script)
+            except STORE_ERRORS:
+                pass
+        self.write_behind = None
+        if write_behind_params is not None:
+            self.write_behind = WriteBehindQueue(self.flush_cache, **write_behind_params)
+
+    def close(self):
+        self.revalidator.close()
+        if self.write_behind is not None:
+            self.write_behind.close()
+
+    def init_breakers(self, breaker_params):
+        params = make_breaker_params(breaker_params)
+        self.cache_breaker = CircuitBreaker("cache", errors=STORE_ERRORS, **params)
+        self.breaker = CircuitBreaker("persistent", errors=STORE_ERRORS, **params)
+
+    def breaker_stats(self):
+        return {breaker.name: breaker.stats() for breaker in (self.cache_breaker, self.breaker)}
+
+    def stats(self):
+        """-> {компонент: счётчики} для /metrics"""
+        stats = {f"breaker_{name}": breaker for name, breaker in self.breaker_stats().items()}
+        for component in ("flight", "revalidator", "write_behind", "l1"):
+            obj = getattr(self, component)
+            if obj is not None:
+                stats[component] = obj.stats()
+        return stats
+
+    def call(self, breaker, fn, *args, **kwargs):
+        """Вызов Redis через breaker с замером времени."""
+        op = getattr(fn, "__name__", "call")
+        started = time.perf_counter()
+        try:
+            return breaker.call(fn, *args, **kwargs)
+        except STORE_ERRORS:
+            STORE_CALL_ERRORS.inc(op, breaker.name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            STORE_CALLS.observe(elapsed, op, breaker.name)
+            timing.add("store", elapsed)
+
+    def make_retry(self):
+        params = self.pool_params
+        backoff = ExponentialBackoff(cap=params["backoff_cap"], base=params["backoff_base"])
+        return DeadlineRetry(backoff, params["retries"], params["deadline"])
+
+    def client_params(self, store_params):
+        params = self.pool_params
+        return dict(
+            store_params,
+            max_connections=params["pool_size"],
+            socket_connect_timeout=params["connect_timeout"],
+            socket_timeout=params["read_timeout"],
             retry=self.retry,
-            socket_timeout=5,
             retry_on_timeout=True,
-            # retry_on_error=[BusyLoadingError, ConnectionError, TimeoutError]
         )
+
+    def make_client(self, store_params):
+        pool = redis.BlockingConnectionPool(
+            timeout=self.pool_params["pool_timeout"],
+            **self.client_params(store_params),
+        )
+        return redis.Redis(connection_pool=pool)
+
+    def prewarm(self, n):
+        """Открывает n соединений пула заранее -> число открытых."""
+        pool = self.r.connection_pool
+        connections = []
         try:
-            self.r.ping()
-        except ConnectionError as e:
+            for _ in range(min(n, self.pool_params["pool_size"])):
+                connections.append(pool.get_connection("PING"))
+        except STORE_ERRORS as e:
             print(e)
         else:
-            print("Connection is established")
-        pass
+            if connections:
+                print("Connection is established")
+        finally:
+            for connection in connections:
+                pool.release(connection)
+        return len(connections)
 
     def set(self, key, value):
         try:
-            self.r.set(key, value)
-        except ConnectionError:
+            self.call(self.breaker, self.r.set, key, value)
+        except STORE_ERRORS:
             raise ConnectionError
+        self.l1_delete(key)
 
     def set_cache(self, key, value, expire_time):
+        if self.write_behind is not None:
+            self.l1_set(key, value, expire_time)
+            self.write_behind.put(key, value, expire_time)
+            return None
         try:
             # ms mode (px) work like ex!
-            self.r.set(key, value, ex=expire_time)
-        except ConnectionError:
+            self.call(self.cache_breaker, self.r.set, key, value, ex=expire_time)
+        except STORE_ERRORS:
             return None
+        finally:
+            # L1 обновляется, даже если Redis недоступен
+            self.l1_set(key, value, expire_time)
 
     def get(self, key):
+        value = self.l1_get(key)
+        if value is not None:
+            return value
+        try:
+            value = self.call(self.breaker, self.r.get, key)
+        except STORE_ERRORS:
+            raise ConnectionError
+        self.l1_set(key, value)
+        return value
+
+    def get_cache(self, key, local=True):
+        """local=False - мимо L1, только из Redis (фоновый пересчёт проверяет, не обновил ли запись другой процесс)."""
+        value = self.l1_get(key) if local else None
+        if value is not None:
+            return value
+        try:
+            value = self.call(self.cache_breaker, self.r.get, key)
+        except STORE_ERRORS:
+            return None
+        self.l1_set(key, value)
+        return value
+
+    def load_script(self, script):
+        """-> sha скрипта (SCRIPT LOAD один раз) или False, если скрипты не поддерживаются."""
+        sha = self.scripts.get(script)
+        if sha is None:
+            try:
+                sha = self.call(self.cache_breaker, self.r.script_load, script)
+            except SCRIPTING_ERRORS:
+                sha = False
+            self.scripts[script] = sha
+        return sha
+
+    def get_or_eval_cache(self, key, script, args):
+        """Значение ключа кэша из L1, иначе результат Lua скрипта (EVALSHA), который
+        сам читает и пишет ключ в Redis за один round trip.
+
+        -> None, если скрипты не поддерживаются или Redis недоступен.
+        """
+        value = self.l1_get(key)
+        if value is not None:
+            return value
+        try:
+            sha = self.load_script(script)
+            if not sha:
+                return None
+            value = self.call(self.cache_breaker, self.r.evalsha, sha, 1, key, *args)
+        except NoScriptError:
+            # SCRIPT FLUSH на сервере - загрузить заново при следующем вызове
+            self.scripts[script] = None
+            return None
+        except SCRIPTING_ERRORS:
+            # FakeRedis принимает SCRIPT LOAD, но без lupa не выполняет скрипт
+            self.scripts[script] = False
+            return None
+        except STORE_ERRORS:
+            return None
+        self.l1_set(key, value)
+        return value
+
+    def pipeline_mget(self, keys):
+        """Ключи разбиваются на MGET по mget_chunk_size, чтобы не блокировать Redis
+        одной огромной командой, а все MGET отправляются одним pipeline.
+        """
+        pipe = self.r.pipeline(transaction=False)
+        for i in range(0, len(keys), self.mget_chunk_size):
+            pipe.mget(keys[i : i + self.mget_chunk_size])
+        return [value for chunk in pipe.execute() for value in chunk]
+
+    def pipeline_set(self, items):
+        """Записывает тройки (key, value, expire_time) одним pipeline."""
+        pipe = self.r.pipeline(transaction=False)
+        for key, value, expire_time in items:
+            pipe.set(key, value, ex=expire_time)
+        pipe.execute()
+
+    def flush_cache(self, items):
+        self.call(self.cache_breaker, self.pipeline_set, items)
+
+    def read_many(self, keys, breaker):
+        keys = list(keys)
+        values, missing = self.l1_get_many(keys)
+        if not missing:
+            return values
+        fetched = self.call(breaker, self.pipeline_mget, [keys[i] for i in missing])
+        return self.l1_fill_many(keys, values, missing, fetched)
+
+    def get_many(self, keys):
+        """Значения по списку ключей (None для отсутствующих) за один round trip."""
         try:
-            return self.r.get(key)
-        except ConnectionError:
+            return self.read_many(keys, self.breaker)
+        except STORE_ERRORS:
             raise ConnectionError
 
-    def get_cache(self, key):
+    def get_cache_many(self, keys):
+        keys = list(keys)
         try:
-            return self.r.get(key)
-        except ConnectionError:
+            return self.read_many(keys, self.cache_breaker)
+        except STORE_ERRORS:
+            return [None] * len(keys)
+
+    def set_cache_many(self, items, expire_time):
+        """Записывает пары (key, value) с одним TTL одним pipeline."""
+        items = [(key, value, expire_time) for key, value in items]
+        for key, value, _ in items:
+            self.l1_set(key, value, expire_time)
+        if not items:
+            return
+        if self.write_behind is not None:
+            for item in items:
+                self.write_behind.put(*item)
+            return
+        try:
+            self.flush_cache(items)
+        except STORE_ERRORS:
             return None
 
     def delete(self, key):
-        self.r.delete(key)
+        self.l1_delete(key)
+        self.call(self.breaker, self.r.delete, key)
+
+    def delete_matching(self, pattern, count=500):
+        """Удаляет ключи по шаблону (SCAN + UNLINK пачками), например старую версию
+        ключей кэша -> число удалённых ключей.
+        """
+        deleted = 0
+        batch = []
+        for key in self.r.scan_iter(match=pattern, count=count):
+            batch.append(key)
+            if len(batch) >= count:
+                deleted += self.r.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += self.r.unlink(*batch)
+        if self.l1 is not None:
+            self.l1.clear()
+        return deleted
 
 
 class StoreFake(Store):
-    def __init__(self, store_params):
-        super().__init__(store_params)
+    def make_client(self, store_params):
+        # В рамках данной реализации переподключение очевидно не работает...
+        return FakeRedis(**self.client_params(store_params))
 
-        self.r = FakeRedis(
-            # В рамках данной реализации переподключение очевидно не работает...
-            **store_params,
-            retry=self.retry,
-            socket_timeout=5,
-            retry_on_timeout=True,
-            # retry_on_error=[BusyLoadingError, ConnectionError, TimeoutError]
+
+class AsyncStore(LocalCacheMixin):
+    """Асинхронный вариант Store поверх redis.asyncio для asyncio-движка.
+
+    Семантика методов и pool_params совпадают со Store. Соединения привязаны к
+    event loop, в котором были созданы, поэтому экземпляр используется только
+    внутри одного loop. Проверка и прогрев соединений выполняются в connect(),
+    а не в __init__.
+    """
+
+    mget_chunk_size = Store.mget_chunk_size
+
+    def __init__(
+        self,
+        store_params,
+        l1_cache=None,
+        l1_prefixes=(),
+        pool_params=None,
+        breaker_params=None,
+        write_behind_params=None,
+        scripts=(),
+    ):
+        self.init_l1(l1_cache, l1_prefixes)
+        self.init_breakers(breaker_params)
+        self.pool_params = make_pool_params(pool_params)
+        self.retry = self.make_retry()
+        self.r = self.make_client(store_params)
+        self.flight = AsyncSingleFlight()
+        self.revalidator = AsyncRevalidator()
+        # скрипты загружаются в connect()
+        self.scripts = dict.fromkeys(scripts)
+        self.write_behind = None
+        if write_behind_params is not None:
+            self.write_behind = AsyncWriteBehindQueue(self.flush_cache, **write_behind_params)
+
+    def make_retry(self):
+        params = self.pool_params
+        backoff = ExponentialBackoff(cap=params["backoff_cap"], base=params["backoff_base"])
+        return AsyncDeadlineRetry(backoff, params["retries"], params["deadline"])
+
+    init_breakers = Store.init_breakers
+    breaker_stats = Store.breaker_stats
+    stats = Store.stats
+    client_params = Store.client_params
+
+    def make_client(self, store_params):
+        pool = redis.asyncio.BlockingConnectionPool(
+            timeout=self.pool_params["pool_timeout"],
+            **self.client_params(store_params),
         )
+        return redis.asyncio.Redis(connection_pool=pool)
+
+    async def prewarm(self, n):
+        pool = self.r.connection_pool
+        connections = []
         try:
-            self.r.ping()
-        except ConnectionError as e:
+            for _ in range(min(n, self.pool_params["pool_size"])):
+                connections.append(await pool.get_connection("PING"))
+        except STORE_ERRORS as e:
             print(e)
         else:
-            print("Connection is established")
-        pass
+            if connections:
+                print("Connection is established")
+        finally:
+            for connection in connections:
+                await pool.release(connection)
+        return len(connections)
+
+    async def connect(self):
+        connected = await self.prewarm(max(self.pool_params["prewarm"], 1))
+        for script in self.scripts:
+            try:
+                await self.load_script(script)
+            except STORE_ERRORS:
+                pass
+        return connected
+
+    async def close(self):
+        await self.revalidator.close()
+        if self.write_behind is not None:
+            await self.write_behind.close()
+        await self.r.aclose()
+        # клиент, созданный с готовым пулом, не закрывает его сам
+        await self.r.connection_pool.disconnect()
+
+    async def call(self, breaker, fn, *args, **kwargs):
+        op = getattr(fn, "__name__", "call")
+        started = time.perf_counter()
+        try:
+            return await breaker.call_async(fn, *args, **kwargs)
+        except STORE_ERRORS:
+            STORE_CALL_ERRORS.inc(op, breaker.name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            STORE_CALLS.observe(elapsed, op, breaker.name)
+            timing.add("store", elapsed)
+
+    async def set(self, key, value):
+        try:
+            await self.call(self.breaker, self.r.set, key, value)
+        except STORE_ERRORS:
+            raise ConnectionError
+        self.l1_delete(key)
+
+    async def set_cache(self, key, value, expire_time):
+        if self.write_behind is not None:
+            self.l1_set(key, value, expire_time)
+            self.write_behind.put(key, value, expire_time)
+            return None
+        try:
+            await self.call(self.cache_breaker, self.r.set, key, value, ex=expire_time)
+        except STORE_ERRORS:
+            return None
+        finally:
+            self.l1_set(key, value, expire_time)
+
+    async def get(self, key):
+        value = self.l1_get(key)
+        if value is not None:
+            return value
+        try:
+            value = await self.call(self.breaker, self.r.get, key)
+        except STORE_ERRORS:
+            raise ConnectionError
+        self.l1_set(key, value)
+        return value
+
+    async def get_cache(self, key, local=True):
+        value = self.l1_get(key) if local else None
+        if value is not None:
+            return value
+        try:
+            value = await self.call(self.cache_breaker, self.r.get, key)
+        except STORE_ERRORS:
+            return None
+        self.l1_set(key, value)
+        return value
+
+    async def load_script(self, script):
+        sha = self.scripts.get(script)
+        if sha is None:
+            try:
+                sha = await self.call(self.cache_breaker, self.r.script_load, script)
+            except SCRIPTING_ERRORS:
+                sha = False
+            self.scripts[script] = sha
+        return sha
+
+    async def get_or_eval_cache(self, key, script, args):
+        value = self.l1_get(key)
+        if value is not None:
+            return value
+        try:
+            sha = await self.load_script(script)
+            if not sha:
+                return None
+            value = await self.call(self.cache_breaker, self.r.evalsha, sha, 1, key, *args)
+        except NoScriptError:
+            self.scripts[script] = None
+            return None
+        except SCRIPTING_ERRORS:
+            self.scripts[script] = False
+            return None
+        except STORE_ERRORS:
+            return None
+        self.l1_set(key, value)
+        return value
+
+    async def pipeline_mget(self, keys):
+        pipe = self.r.pipeline(transaction=False)
+        for i in range(0, len(keys), self.mget_chunk_size):
+            pipe.mget(keys[i : i + self.mget_chunk_size])
+        return [value for chunk in await pipe.execute() for value in chunk]
+
+    async def pipeline_set(self, items):
+        pipe = self.r.pipeline(transaction=False)
+        for key, value, expire_time in items:
+            pipe.set(key, value, ex=expire_time)
+        await pipe.execute()
+
+    async def flush_cache(self, items):
+        await self.call(self.cache_breaker, self.pipeline_set, items)
+
+    async def read_many(self, keys, breaker):
+        keys = list(keys)
+        values, missing = self.l1_get_many(keys)
+        if not missing:
+            return values
+        fetched = await self.call(breaker, self.pipeline_mget, [keys[i] for i in missing])
+        return self.l1_fill_many(keys, values, missing, fetched)
+
+    async def get_many(self, keys):
+        try:
+            return await self.read_many(keys, self.breaker)
+        except STORE_ERRORS:
+            raise ConnectionError
+
+    async def get_cache_many(self, keys):
+        keys = list(keys)
+        try:
+            return await self.read_many(keys, self.cache_breaker)
+        except STORE_ERRORS:
+            return [None] * len(keys)
+
+    async def set_cache_many(self, items, expire_time):
+        items = [(key, value, expire_time) for key, value in items]
+        for key, value, _ in items:
+            self.l1_set(key, value, expire_time)
+        if not items:
+            return
+        if self.write_behind is not None:
+            for item in items:
+                self.write_behind.put(*item)
+            return
+        try:
+            await self.flush_cache(items)
+        except STORE_ERRORS:
+            return None
+
+    async def delete(self, key):
+        self.l1_delete(key)
+        await self.call(self.breaker, self.r.delete, key)
+
+    async def delete_matching(self, pattern, count=500):
+        deleted = 0
+        batch = []
+        async for key in self.r.scan_iter(match=pattern, count=count):
+            batch.append(key)
+            if len(batch) >= count:
+                deleted += await self.r.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await self.r.unlink(*batch)
+        if self.l1 is not None:
+            self.l1.clear()
+        return deleted
+
+
+class AsyncStoreFake(AsyncStore):
+    def make_client(self, store_params):
+        return FakeAsyncRedis(**self.client_params(store_params))
+
+
+def export_store_stats(store):
+    """-> collector для metrics.REGISTRY.add_collector: счётчики store.stats() в gauge."""
+
+    def collect():
+        for component, stats in store.stats().items():
+            if component.startswith("breaker_"):
+                STORE_BREAKER_STATE.set(stats["state_code"], component[len("breaker_") :])
+            for stat, value in stats.items():
+                if stat not in ("state", "state_code"):
+                    STORE_STATS.set(value, component, stat)
+
+    return collect
+
+
+class NullStore:
+    """Store без хранилища: кэш всегда пуст, записи отбрасываются.
+
+    Для офлайн пересчёта score (score_cli.py), где кэш в Redis не нужен.
+    """
+
+    scripts = {}
+    flight = None
+    revalidator = None
+
+    def get_cache(self, key, local=True):
+        return None
+
+    def set_cache(self, key, value, expire_time):
+        return None
+
+    def get_cache_many(self, keys):
+        return [None] * len(keys)
+
+    def set_cache_many(self, items, expire_time):
+        return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+
+class WriteBehindStats:
+    def __init__(self):
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    def stats(self, pending):
+        return {
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "pending": pending,
+        }
+
+
+# маркер остановки флашера WriteBehindQueue: записи до него дописываются
+CLOSE = object()
+
+
+def coalesce(items):
+    # повторные записи одного ключа в пачке - остаётся последняя
+    return list({key: (key, value, expire_time) for key, value, expire_time in items}.values())
+
+
+class WriteBehindQueue(WriteBehindStats):
+    """Отложенная запись кэша: put() кладёт (key, value, expire_time) в
+    ограниченную очередь и сразу возвращается, а поток-флашер собирает записи
+    в пачки до batch_size и передаёт их в flush(items) (один pipeline на пачку).
+
+    При заполненной очереди запись отбрасывается (dropped), запрос не ждёт.
+    Ошибки flush считаются в errors - это кэш, записи не повторяются.
+
+    Пустая очередь флашер не будит: он ждёт первую запись без таймаута и только
+    затем добирает пачку не дольше flush_interval сек.
+    """
+
+    def __init__(self, flush, max_size=10000, batch_size=500, flush_interval=0.005):
+        super().__init__()
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_size)
+        self.closed = threading.Event()
+        # queued/dropped меняются из потоков-обработчиков; под ним же put() проверяет closed и кладёт запись,
+        # а close() выставляет closed - так запись не встанет в очередь за маркером CLOSE
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def put(self, key, value, expire_time):
+        with self.lock:
+            try:
+                if self.closed.is_set():
+                    raise queue.Full
+                self.queue.put_nowait((key, value, expire_time))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self.queued += 1
+            return True
+
+    def take_batch(self):
+        """-> (пачка, остановить ли флашер)"""
+        item = self.queue.get()
+        if item is CLOSE:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is CLOSE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def write(self, items):
+        try:
+            self.flush(coalesce(items))
+        except Exception as e:
+            self.errors += 1
+            logging.warning("write-behind flush failed: %s", e)
+        else:
+            self.written += len(items)
+            self.batches += 1
+
+    def run(self):
+        stop = False
+        while not stop:
+            items, stop = self.take_batch()
+            if items:
+                self.write(items)
+
+    def close(self, timeout=None):
+        """Дописывает очередь и останавливает флашер."""
+        with self.lock:
+            if self.closed.is_set():
+                return
+            self.closed.set()
+        try:
+            # в полную очередь маркер встанет, когда флашер освободит место
+            self.queue.put(CLOSE, timeout=timeout)
+        except queue.Full:
+            logging.warning("write-behind queue was not flushed in %s sec", timeout)
+            return
+        self.thread.join(timeout)
+
+    def stats(self):
+        return super().stats(self.queue.qsize())
+
+
+class AsyncWriteBehindQueue(WriteBehindStats):
+    """Вариант WriteBehindQueue для asyncio: флашер - задача в event loop,
+    flush - корутина. Задача запускается при первом put() (или в start()),
+    остаток очереди дописывается в close().
+    """
+
+    def __init__(self, flush, max_size=10000, batch_size=500, flush_interval=0.005):
+        super().__init__()
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(max_size)
+        self.task = None
+        self.writing = False
+
+    def start(self):
+        if self.task is None:
+            # флашер живёт дольше запроса, который его запустил - без его контекста (timing)
+            self.task = asyncio.get_running_loop().create_task(self.run(), context=contextvars.Context())
+
+    def put(self, key, value, expire_time):
+        # вызывается из корутины, так что event loop уже запущен
+        self.start()
+        try:
+            self.queue.put_nowait((key, value, expire_time))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    def take_nowait(self, items):
+        while len(items) < self.batch_size:
+            try:
+                items.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
+
+    async def write(self, items):
+        try:
+            await self.flush(coalesce(items))
+        except Exception as e:
+            self.errors += 1
+            logging.warning("write-behind flush failed: %s", e)
+        else:
+            self.written += len(items)
+            self.batches += 1
+
+    async def run(self):
+        while True:
+            items = self.take_nowait([await self.queue.get()])
+            self.writing = True
+            try:
+                await self.write(items)
+            finally:
+                self.writing = False
+
+    async def close(self):
+        # флашер отменяется только между пачками, остаток дописывается здесь
+        while self.writing:
+            await asyncio.sleep(self.flush_interval)
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        while not self.queue.empty():
+            await self.write(self.take_nowait([]))
+
+    def stats(self):
+        return super().stats(self.queue.qsize())
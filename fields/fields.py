@@ -1,5 +1,6 @@
 import datetime
-import json
+
+import json_codec
 
 from .custom_errors import NoneError, NullError, ValidationError
 
@@ -13,26 +14,33 @@ class BaseField:
     def __init__(self, name: str, required: bool, nullable: bool):
         self.required = required
         self.nullable = nullable
+        self.key = name
         self.name = "_" + name
         self.default = None
 
+    def __get__(self, instance, cls):
+        return getattr(instance, self.name, self.default)
+
+    def __set__(self, instance, value):
+        setattr(instance, self.name, self.clean(value))
+
+    def clean(self, value):
+        """Проверяет значение и возвращает его в нормализованном виде (или бросает ошибку валидации)."""
+        raise NotImplementedError
+
 
 class ArgumentsField(BaseField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, value):
+    def clean(self, value):
         # Validation
         if self.required:
             if value is None:
                 raise NoneError(f"{self.name} - value is None, required=True")
         else:
             if value is None:
-                setattr(instance, self.name, None)
-                return
+                return None
 
         # type check
         if not isinstance(value, dict):
@@ -44,36 +52,30 @@ class ArgumentsField(BaseField):
 
         # check valid property
         try:
-            _ = json.dumps(value)  # get json_string
+            json_codec.dumps_bytes(value)
         except TypeError:
             raise TypeError(f"{self.name} - is not a valid json")
-        else:
-            setattr(instance, self.name, value)
-        # json_dict = json.loads(json_string)
+        return value
 
 
 class IntegerField(BaseField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, value):
+    def clean(self, value):
         # Validation
         if self.required:
             if value is None:
                 raise NoneError(f"{self.name} - value is None, required=True")
         else:
             if value is None:
-                setattr(instance, self.name, None)
-                return
+                return None
 
         # type check
         if not isinstance(value, int):
             raise TypeError(f"{self.name} - value must be an int")
 
-        setattr(instance, self.name, value)
+        return value
 
 
 class GenderField(IntegerField):
@@ -82,43 +84,31 @@ class GenderField(IntegerField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, input_value: str):
-        # check string properties
-        super().__set__(instance, input_value)
-
-        # get attr which was set in parent class
-        input_value = getattr(instance, self.name)
+    def clean(self, input_value):
+        # check int properties
+        input_value = super().clean(input_value)
 
         # input_value is None -> escape
         if input_value is None:
-            return
+            return None
 
         if input_value in self.acceptable_range:
-            setattr(instance, self.name, input_value)
-        else:
-            setattr(instance, self.name, None)
-            raise ValidationError(f"{self.name} - not in acceptable_range")
+            return input_value
+        raise ValidationError(f"{self.name} - not in acceptable_range")
 
 
 class CharField(BaseField):
     def __init__(self, name, required, nullable):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, value):
+    def clean(self, value):
         # Validation
         if self.required:
             if value is None:
                 raise NoneError(f"{self.name} - string is None, required=True")
         else:
             if value is None:
-                setattr(instance, self.name, None)
-                return
+                return None
 
         # empty error if nullable=False
         if not self.nullable and (value == ""):
@@ -128,7 +118,7 @@ class CharField(BaseField):
         if not isinstance(value, str):
             raise TypeError(f"{self.name} - string must be a str")
 
-        setattr(instance, self.name, value)
+        return value
 
 
 class PhoneField(CharField):
@@ -138,83 +128,56 @@ class PhoneField(CharField):
     def __get__(self, instance, cls):
         return getattr(instance, self.name, self.name)
 
-    def __set__(self, instance, input_value: str):
+    def clean(self, input_value):
         # check string properties
-        super().__set__(instance, input_value)
+        input_value = super().clean(input_value)
 
-        # get attr which was set in parent class
-        input_value = getattr(instance, self.name)
-
-        # input_value is None -> escape
-        if input_value is None:
-            return
+        # input_value is None or "" -> escape
+        if not input_value:
+            return input_value
 
-        # if empty str -> set this, else -> try to convert and set
-        if input_value == "":
-            setattr(instance, self.name, str(input_value))
-        else:
-            if input_value.startswith("7") and len(input_value) == 11:
-                setattr(instance, self.name, input_value)
-            else:
-                raise ValidationError(f"{self.name} - does not start with 7 or len != 11")
+        if input_value.startswith("7") and len(input_value) == 11:
+            return input_value
+        raise ValidationError(f"{self.name} - does not start with 7 or len != 11")
 
 
 class EmailField(CharField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, input_value: str):
+    def clean(self, input_value):
         # check string properties
-        super().__set__(instance, input_value)
-
-        # get attr which was set in parent class
-        input_value = getattr(instance, self.name)
+        input_value = super().clean(input_value)
 
-        # input_value is None -> escape
-        if input_value is None:
-            return
+        # input_value is None or "" -> escape
+        if not input_value:
+            return input_value
 
-        # if empty str -> set this, else -> try to convert and set
-        if input_value == "":
-            setattr(instance, self.name, str(input_value))
-        else:
-            if "@" in input_value:
-                setattr(instance, self.name, input_value)
-            else:
-                raise ValueError(f"{self.name} - no @")
+        if "@" in input_value:
+            return input_value
+        raise ValueError(f"{self.name} - no @")
 
 
 class DateField(CharField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, input_value: str):
+    def clean(self, input_value):
         # check string properties
-        super().__set__(instance, input_value)
+        input_value = super().clean(input_value)
 
-        # get attr which was set in parent class
-        input_value = getattr(instance, self.name)
+        # input_value is None or "" -> escape
+        if not input_value:
+            return input_value
 
-        # input_value is None -> escape
-        if input_value is None:
-            return
+        try:
+            dt_date = datetime.datetime.strptime(input_value, "%d.%m.%Y").date()
+        except ValueError:
+            raise ValueError(f"{self.name} - invalid format")
+        return str(self.clean_date(dt_date))
 
-        # if empty str -> set this, else -> try to convert and set
-        if input_value == "":
-            setattr(instance, self.name, str(input_value))
-        else:
-            try:
-                dt_date = datetime.datetime.strptime(input_value, "%d.%m.%Y").date()
-            except ValueError:
-                raise ValueError(f"{self.name} - invalid format")
-            else:
-                setattr(instance, self.name, str(dt_date))
+    def clean_date(self, dt_date):
+        return dt_date
 
 
 class BirthDayField(DateField):
@@ -223,37 +186,20 @@ class BirthDayField(DateField):
     def __init__(self, name: str, required: bool, nullable: bool):
         super().__init__(name, required, nullable)
 
-    def __get__(self, instance, cls):
-        return getattr(instance, self.name, self.default)
-
-    def __set__(self, instance, input_value: str):
-        # check string properties
-        super().__set__(instance, input_value)
-
-        # get attr which was set in parent class
-        input_value = getattr(instance, self.name)
-
-        # input_value is None or "" -> escape
-        if input_value is None:
-            return
-        if input_value == "":
-            return
-
-        birth_date = datetime.datetime.strptime(input_value, "%Y-%m-%d").date()
+    def clean_date(self, birth_date):
         current_date = datetime.datetime.now().date()
         delta_time = current_date - birth_date
         delta_years = timedelta_to_years(delta_time)
 
         if delta_years > self.age_limit:
-            setattr(instance, self.name, "")
             raise ValueError(f"{self.name} - age more then {self.age_limit}")
-        else:
-            setattr(instance, self.name, input_value)
+        return birth_date
 
 
 class ClientIDsField:
     def __init__(self, name: str, required: bool):
         self.required = required
+        self.key = name
         self.name = "_" + name
         self.default = None
 
@@ -261,6 +207,9 @@ class ClientIDsField:
         return getattr(instance, self.name, self.default)
 
     def __set__(self, instance, value):
+        setattr(instance, self.name, self.clean(value))
+
+    def clean(self, value):
         # Validation
         # check for emptiness
         if self.required and not value:
@@ -275,4 +224,4 @@ class ClientIDsField:
             if not isinstance(int_value, int):
                 raise TypeError(f"{self.name} - value in array must be an int")
 
-        setattr(instance, self.name, value)
+        return value
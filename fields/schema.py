@@ -0,0 +1,61 @@
+from .custom_errors import NoneError, NullError, ValidationError
+
+# Ошибки, которые поля бросают при невалидном значении
+FIELD_ERRORS = (NoneError, NullError, ValidationError, TypeError, ValueError)
+
+
+def compile_validator(fields):
+    """Собирает поля в плоскую функцию validate(data) -> (values, errors).
+
+    Словарь проверяется за один проход: каждое поле вызывается ровно один раз,
+    без цепочки __set__/getattr/setattr, а ошибки всех полей собираются вместе
+    (в порядке объявления полей).
+    """
+    plan = tuple((field.key, field.clean) for field in fields)
+
+    def validate(data):
+        get = data.get
+        values = {}
+        errors = {}
+        for key, clean in plan:
+            try:
+                values[key] = clean(get(key))
+            except FIELD_ERRORS as e:
+                errors[key] = e
+        return values, errors
+
+    return validate
+
+
+class Schema:
+    """Базовый класс декларативных запросов.
+
+    Поля объявляются как обычно (`phone = PhoneField("phone", ...)`), а при
+    создании подкласса они один раз компилируются в `validate`. Присваивание
+    полей экземпляру по одному продолжает работать через дескрипторы.
+    """
+
+    fields = ()
+    validate = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = {}
+        for klass in reversed(cls.__mro__):
+            for attr, value in vars(klass).items():
+                if hasattr(value, "clean") and hasattr(value, "key"):
+                    fields[attr] = value
+        cls.fields = tuple(fields.values())
+        cls.validate = staticmethod(compile_validator(cls.fields))
+
+    @classmethod
+    def load(cls, data):
+        """-> (экземпляр с заполненными полями, ошибки по именам полей)"""
+        values, errors = cls.validate(data)
+        instance = cls()
+        instance.__dict__.update((field.name, values[field.key]) for field in cls.fields if field.key in values)
+        return instance, errors
+
+    @staticmethod
+    def first_error(errors):
+        return next(iter(errors.values()))
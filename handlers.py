@@ -1,8 +1,18 @@
 from redis.exceptions import ConnectionError
 
-from config import ClientStatus, StatusCodes
-from fields.custom_errors import NoneError, NullError, ValidationError
-from scoring import get_interests, get_score
+from config import BATCH_MAX_SIZE, ERRORS, ClientStatus, StatusCodes
+from fields.schema import FIELD_ERRORS
+from scoring import (
+    get_interests,
+    get_interests_async,
+    get_interests_many,
+    get_interests_many_async,
+    get_score,
+    get_score_async,
+    get_scores,
+    get_scores_async,
+)
+from timing import timed
 from validators import (
     ClientsInterestsRequest,
     OnlineScoreRequest,
@@ -10,6 +20,46 @@ from validators import (
     get_request_validator,
 )
 
+# Ошибки валидации аргументов, превращаемые в INVALID_REQUEST
+ARGUMENTS_ERRORS = FIELD_ERRORS
+
+# методы, допустимые в элементах batch запроса
+BATCH_METHODS = {
+    "online_score": "score",
+    "score": "score",
+    "clients_interests": "interests",
+    "interests": "interests",
+}
+
+
+@timed("validate")
+def get_score_arguments(arguments):
+    score_arguments, errors = OnlineScoreRequest.validate(arguments)
+    if errors:
+        raise OnlineScoreRequest.first_error(errors)
+    return score_arguments
+
+
+@timed("validate")
+def get_interests_arguments(arguments):
+    args_validator, errors = ClientsInterestsRequest.load(arguments)
+    if errors:
+        raise ClientsInterestsRequest.first_error(errors)
+    return args_validator
+
+
+def fill_score_context(ctx, request_validator):
+    has_fields = []
+    fields_vals_dict = vars(request_validator)
+    for field, val in fields_vals_dict.items():
+        if val != "":
+            has_fields.append(field)
+    ctx["has"] = has_fields
+
+
+def fill_interests_context(ctx, request_validator):
+    ctx["nclients"] = len(request_validator.arguments["client_ids"])
+
 
 # Метод обработки score запроса
 def score_handler(request, ctx, store):
@@ -27,29 +77,12 @@ def score_handler(request, ctx, store):
         code = StatusCodes.OK
 
     elif status == ClientStatus.user:
-        request_validator = get_request_validator(request_body)
-        arguments = request_validator.arguments
-
-        args_validator = OnlineScoreRequest()
         try:
-            args_validator.first_name = arguments.get("first_name")
-            args_validator.last_name = arguments.get("last_name")
-            args_validator.email = arguments.get("email")
-            args_validator.phone = arguments.get("phone")
-            args_validator.birthday = arguments.get("birthday")
-            args_validator.gender = arguments.get("gender")
-        except (NoneError, NullError, ValidationError, TypeError, ValueError):
+            score_arguments = get_score_arguments(request_validator.arguments)
+        except ARGUMENTS_ERRORS:
             return response, StatusCodes.INVALID_REQUEST
 
-        score = get_score(
-            store,
-            phone=args_validator.phone,
-            email=args_validator.email,
-            birthday=args_validator.birthday,
-            gender=args_validator.gender,
-            first_name=args_validator.first_name,
-            last_name=args_validator.last_name,
-        )
+        score = get_score(store, **score_arguments)
 
         response = {"score": score}
         code = StatusCodes.OK
@@ -59,12 +92,7 @@ def score_handler(request, ctx, store):
         return response, code
 
     # Заполняем контекст
-    has_fields = []
-    fields_vals_dict = vars(request_validator)
-    for field, val in fields_vals_dict.items():
-        if val != "":
-            has_fields.append(field)
-    ctx["has"] = has_fields
+    fill_score_context(ctx, request_validator)
 
     return response, code
 
@@ -81,23 +109,15 @@ def interests_handler(request, ctx, store):
     status = check_auth(request_validator)
 
     if status == ClientStatus.admin or status == ClientStatus.user:
-        arguments = request_validator.arguments
-
-        args_validator = ClientsInterestsRequest()
         try:
-            args_validator.client_ids = arguments.get("client_ids")
-            args_validator.date = arguments.get("date")
-        except (NoneError, NullError, ValidationError, TypeError, ValueError):
+            args_validator = get_interests_arguments(request_validator.arguments)
+        except ARGUMENTS_ERRORS:
             return response, StatusCodes.INVALID_REQUEST
 
-        interests_dict = {}
-        for cid in args_validator.client_ids:
-            try:
-                interests = get_interests(store, cid=cid)
-            except ConnectionError:
-                return {}, StatusCodes.INTERNAL_ERROR
-            else:
-                interests_dict[cid] = interests
+        try:
+            interests_dict = get_interests(store, cid=args_validator.client_ids)
+        except ConnectionError:
+            return {}, StatusCodes.INTERNAL_ERROR
 
         response = interests_dict
         code = StatusCodes.OK
@@ -107,6 +127,182 @@ def interests_handler(request, ctx, store):
         return response, code
 
     # Заполняем контекст
-    ctx["nclients"] = len(request_validator.arguments["client_ids"])
+    fill_interests_context(ctx, request_validator)
 
     return response, code
+
+
+# Асинхронный метод обработки score запроса (store - AsyncStore)
+async def score_handler_async(request, ctx, store):
+    if not request:
+        return {}, StatusCodes.INVALID_REQUEST
+
+    request_validator = get_request_validator(request["body"])
+    status = check_auth(request_validator)
+
+    if status == ClientStatus.admin:
+        response = {"score": 42}
+    elif status == ClientStatus.user:
+        try:
+            score_arguments = get_score_arguments(request_validator.arguments)
+        except ARGUMENTS_ERRORS:
+            return {}, StatusCodes.INVALID_REQUEST
+
+        score = await get_score_async(store, **score_arguments)
+        response = {"score": score}
+    else:
+        return {}, StatusCodes.FORBIDDEN
+
+    fill_score_context(ctx, request_validator)
+
+    return response, StatusCodes.OK
+
+
+# Асинхронный метод обработки interests запроса (store - AsyncStore)
+async def interests_handler_async(request, ctx, store):
+    if not request:
+        return {}, StatusCodes.INVALID_REQUEST
+
+    request_validator = get_request_validator(request["body"])
+    status = check_auth(request_validator)
+
+    if status != ClientStatus.admin and status != ClientStatus.user:
+        return {}, StatusCodes.FORBIDDEN
+
+    try:
+        args_validator = get_interests_arguments(request_validator.arguments)
+    except ARGUMENTS_ERRORS:
+        return {}, StatusCodes.INVALID_REQUEST
+
+    try:
+        interests_dict = await get_interests_async(store, cid=args_validator.client_ids)
+    except ConnectionError:
+        return {}, StatusCodes.INTERNAL_ERROR
+
+    fill_interests_context(ctx, request_validator)
+
+    return interests_dict, StatusCodes.OK
+
+
+def batch_item_ok(response):
+    return {"response": response, "code": StatusCodes.OK}
+
+
+def batch_item_error(code):
+    return {"error": ERRORS.get(code, "Unknown Error"), "code": code}
+
+
+class BatchPlan:
+    """Разбор batch запроса.
+
+    Результаты, не требующие Store (ошибки, admin score), заполняются сразу, а
+    чтения из Store собираются по типам, чтобы выполнить их одним обращением
+    на тип. Каждая уникальная тройка (account, login, token) проверяется один раз.
+    """
+
+    def __init__(self, items):
+        self.score_jobs = []  # (index, аргументы get_score)
+        self.interests_jobs = []  # (index, client_ids)
+        auth_cache = {}
+        self.results = [self.plan_item(index, item, auth_cache) for index, item in enumerate(items)]
+
+    def plan_item(self, index, item, auth_cache):
+        if not isinstance(item, dict):
+            return batch_item_error(StatusCodes.INVALID_REQUEST)
+        try:
+            request_validator = get_request_validator(item)
+        except ARGUMENTS_ERRORS:
+            return batch_item_error(StatusCodes.INVALID_REQUEST)
+
+        method = BATCH_METHODS.get(request_validator.method)
+        if method is None:
+            return batch_item_error(StatusCodes.NOT_FOUND)
+
+        status = self.check_auth(request_validator, auth_cache)
+        if status != ClientStatus.admin and status != ClientStatus.user:
+            return batch_item_error(StatusCodes.FORBIDDEN)
+
+        plan = self.plan_score if method == "score" else self.plan_interests
+        try:
+            return plan(index, request_validator, status)
+        except ARGUMENTS_ERRORS:
+            return batch_item_error(StatusCodes.INVALID_REQUEST)
+
+    @staticmethod
+    def check_auth(request_validator, auth_cache):
+        auth_key = (request_validator.account, request_validator.login, request_validator.token)
+        if auth_key not in auth_cache:
+            try:
+                auth_cache[auth_key] = check_auth(request_validator)
+            except TypeError:
+                # account=None у пользователя
+                auth_cache[auth_key] = ClientStatus.forbidden
+        return auth_cache[auth_key]
+
+    def plan_score(self, index, request_validator, status):
+        if status == ClientStatus.admin:
+            return batch_item_ok({"score": 42})
+        self.score_jobs.append((index, get_score_arguments(request_validator.arguments)))
+        return None
+
+    def plan_interests(self, index, request_validator, status):
+        args_validator = get_interests_arguments(request_validator.arguments)
+        self.interests_jobs.append((index, args_validator.client_ids))
+        return None
+
+    def score_arguments(self):
+        return [arguments for _, arguments in self.score_jobs]
+
+    def client_ids(self):
+        return list(dict.fromkeys(cid for _, client_ids in self.interests_jobs for cid in client_ids))
+
+    def finish(self, scores, interests_by_id):
+        for (index, _), score in zip(self.score_jobs, scores):
+            self.results[index] = batch_item_ok({"score": score})
+        for index, client_ids in self.interests_jobs:
+            # None - Store недоступен или запись одного из id не разбирается
+            if interests_by_id is None or any(interests_by_id[cid] is None for cid in client_ids):
+                self.results[index] = batch_item_error(StatusCodes.INTERNAL_ERROR)
+            else:
+                self.results[index] = batch_item_ok({cid: interests_by_id[cid] for cid in client_ids})
+        return self.results
+
+
+def get_batch_items(request):
+    items = request.get("body") if request else None
+    if not isinstance(items, list) or not items or len(items) > BATCH_MAX_SIZE:
+        return None
+    return items
+
+
+# Метод обработки batch запроса: список score/interests запросов в одном HTTP запросе
+def batch_handler(request, ctx, store):
+    items = get_batch_items(request)
+    if items is None:
+        return {}, StatusCodes.INVALID_REQUEST
+
+    plan = BatchPlan(items)
+    scores = get_scores(store, plan.score_arguments())
+    try:
+        interests_by_id = get_interests_many(store, plan.client_ids())
+    except ConnectionError:
+        interests_by_id = None
+
+    ctx["nitems"] = len(items)
+    return plan.finish(scores, interests_by_id), StatusCodes.OK
+
+
+async def batch_handler_async(request, ctx, store):
+    items = get_batch_items(request)
+    if items is None:
+        return {}, StatusCodes.INVALID_REQUEST
+
+    plan = BatchPlan(items)
+    scores = await get_scores_async(store, plan.score_arguments())
+    try:
+        interests_by_id = await get_interests_many_async(store, plan.client_ids())
+    except ConnectionError:
+        interests_by_id = None
+
+    ctx["nitems"] = len(items)
+    return plan.finish(scores, interests_by_id), StatusCodes.OK
@@ -0,0 +1,109 @@
+"""Единый JSON кодек: тела запросов и ответов, данные из Store, проверка аргументов.
+
+Библиотека выбирается один раз при импорте (config.JSON_BACKEND): orjson или ujson,
+если установлены, иначе стандартный json. Вывод у всех вариантов одинаковый:
+компактный, UTF-8 без \\u-экранирования, нестроковые ключи словарей -> строки.
+loads принимает str, bytes и memoryview (тело запроса из body_reader).
+Ошибки разбора - ValueError, несериализуемое значение - TypeError.
+
+Отличия orjson от json (test_json_codec.TestOrjsonDifferences):
+- int вне 64 бит orjson не сериализует - такие значения пишет json (вывод тот же);
+- loads читает int вне 64 бит как float (json - как int);
+- NaN и Infinity orjson пишет как null и не читает (json пишет и читает NaN/Infinity).
+"""
+
+import json
+
+from config import JSON_BACKEND
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # необязательная зависимость
+    ujson = None
+
+
+class StdlibBackend:
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def dumps_bytes(cls, value):
+        return cls.dumps(value).encode("utf-8")
+
+
+class OrjsonBackend:
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps_bytes(value):
+        try:
+            # int ключи (id клиентов в interests) сериализуются как в json - строками
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # в том числе int вне 64 бит: json их пишет, а несериализуемое значение - снова TypeError
+            return StdlibBackend.dumps_bytes(value)
+
+    @classmethod
+    def dumps(cls, value):
+        return cls.dumps_bytes(value).decode("utf-8")
+
+
+class UjsonBackend:
+    name = "ujson"
+
+    @staticmethod
+    def loads(data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(value):
+        return ujson.dumps(value, ensure_ascii=False, escape_forward_slashes=False)
+
+    @classmethod
+    def dumps_bytes(cls, value):
+        return cls.dumps(value).encode("utf-8")
+
+
+BACKENDS = {"json": StdlibBackend}
+if ujson is not None:
+    BACKENDS["ujson"] = UjsonBackend
+if orjson is not None:
+    BACKENDS["orjson"] = OrjsonBackend
+
+# порядок выбора для "auto"
+PREFERENCE = ("orjson", "ujson", "json")
+
+
+def get_backend(name="auto"):
+    if name == "auto":
+        return next(BACKENDS[name] for name in PREFERENCE if name in BACKENDS)
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"JSON backend {name} is not installed") from None
+
+
+backend = get_backend(JSON_BACKEND)
+loads = backend.loads
+dumps = backend.dumps
+dumps_bytes = backend.dumps_bytes
@@ -0,0 +1,324 @@
+"""Метрики в текстовом формате Prometheus (/metrics).
+
+Счётчики шардированы по потокам: inc/observe пишут в словарь текущего потока
+без блокировок, а при сборе шарды всех потоков складываются. Блокировка
+берётся только при первом обращении потока к метрике.
+
+В pre-fork режиме (Registry.set_directory) каждый процесс периодически пишет
+свой снимок в <directory>/<pid>-<время старта, нс>.json, а /metrics складывает
+снимки всех процессов: counter и histogram - по всем файлам (в том числе умерших
+воркеров, чтобы значения не уменьшались), gauge - только по живым процессам.
+Время старта в имени нужно, чтобы воркер с pid умершего не перезаписал его снимок.
+"""
+
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+
+import json_codec
+from config import METRICS_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = {}
+            with self.lock:
+                self.shards.append(values)
+            return values
+
+    @staticmethod
+    def merge(total, value):
+        return value if total is None else total + value
+
+    def collect(self):
+        """-> {значения меток: значение} по всем потокам"""
+        samples = {}
+        with self.lock:
+            shards = list(self.shards)
+        for shard in shards:
+            # copy() словаря атомарна под GIL, даже если поток-владелец пишет в него
+            for labels, value in shard.copy().items():
+                samples[labels] = self.merge(samples.get(labels), value)
+        return samples
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        values = self.shard()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """inc/dec - шардированы по потокам, set - общее значение (для значений,
+    снимаемых при сборе, например Store.breaker_stats()).
+
+    aggregate - как складываются процессы pre-fork: sum или max.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labels=(), aggregate="sum"):
+        super().__init__(name, documentation, labels)
+        if aggregate not in ("sum", "max"):
+            raise ValueError(f"unknown aggregate {aggregate}")
+        self.aggregate = aggregate
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        values = self.shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def collect(self):
+        samples = super().collect()
+        for labels, value in self.values.copy().items():
+            samples[labels] = self.merge(samples.get(labels), value)
+        return samples
+
+
+class Histogram(Metric):
+    """Значение метки - [число в каждом бакете..., в +Inf, сумма]."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=METRICS_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        values = self.shard()
+        counts = values.get(labels)
+        if counts is None:
+            counts = values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(int(value))
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        # каталог снимков процессов (pre-fork), None - один процесс
+        self.directory = None
+        # имя файла снимка и pid процесса, для которого оно выбрано (после fork - новое)
+        self.snapshot_pid = None
+        self.snapshot_name = None
+        self.flusher = None
+        self.stopped = threading.Event()
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), aggregate="sum"):
+        return self.register(Gauge(name, documentation, labels, aggregate))
+
+    def histogram(self, name, documentation, labels=(), buckets=METRICS_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        """collector() вызывается перед каждым сбором и обновляет gauge через set()."""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        """-> {имя метрики: {значения меток: значение}} текущего процесса"""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logging.warning("metrics collector failed: %s", e)
+        return {name: metric.collect() for name, metric in self.metrics.items()}
+
+    # --- pre-fork ---
+
+    def set_directory(self, directory):
+        """Включает сложение процессов через каталог снимков. Вызывается в мастере
+        до fork: снимки прошлого запуска удаляются.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.unlink(os.path.join(directory, name))
+        self.directory = directory
+
+    def snapshot_path(self):
+        pid = os.getpid()
+        if self.snapshot_pid != pid:
+            self.snapshot_pid, self.snapshot_name = pid, f"{pid}-{time.time_ns()}.json"
+        return os.path.join(self.directory, self.snapshot_name)
+
+    def write_snapshot(self):
+        path = self.snapshot_path()
+        # ключи JSON - строки, поэтому метки хранятся списком пар [метки, значение]
+        data = {name: list(samples.items()) for name, samples in self.snapshot().items()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json_codec.dumps_bytes(data))
+        # читатель видит либо старый, либо новый снимок целиком
+        os.replace(tmp_path, path)
+
+    def read_snapshots(self):
+        """-> [(pid, жив ли процесс, снимок)]"""
+        files = []
+        # из снимков одного pid живому процессу может принадлежать только последний
+        latest = {}
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            pid, _, started = stem.partition("-")
+            if ext == ".json" and pid.isdigit() and started.isdigit():
+                files.append((int(pid), int(started), name))
+                latest[int(pid)] = max(int(started), latest.get(int(pid), 0))
+
+        snapshots = []
+        for pid, started, name in files:
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    data = json_codec.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            if pid == os.getpid():
+                alive = name == self.snapshot_name
+            else:
+                alive = started == latest[pid] and pid_alive(pid)
+            snapshot = {name: {tuple(labels): value for labels, value in samples} for name, samples in data.items()}
+            snapshots.append((pid, alive, snapshot))
+        return snapshots
+
+    def merge_snapshots(self, snapshots):
+        merged = {name: {} for name in self.metrics}
+        for _, alive, snapshot in snapshots:
+            for name, samples in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                total = merged[name]
+                for labels, value in samples.items():
+                    if metric.type == "gauge" and metric.aggregate == "max" and labels in total:
+                        total[labels] = max(total[labels], value)
+                    else:
+                        total[labels] = metric.merge(total.get(labels), value)
+        return merged
+
+    def start_flusher(self, interval):
+        """Фоновая запись снимка процесса раз в interval сек. Вызывается в воркере после fork."""
+        if self.directory is None or self.flusher is not None:
+            return
+
+        def run():
+            while not self.stopped.wait(interval):
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    logging.warning("metrics snapshot failed: %s", e)
+
+        self.flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self.flusher.start()
+
+    def stop_flusher(self):
+        """Останавливает запись и сохраняет последний снимок процесса."""
+        self.stopped.set()
+        if self.directory is not None:
+            self.write_snapshot()
+
+    # --- экспорт ---
+
+    def collect(self):
+        if self.directory is None:
+            return self.snapshot()
+        self.write_snapshot()
+        return self.merge_snapshots(self.read_snapshots())
+
+    def render(self):
+        """-> /metrics в текстовом формате Prometheus (bytes)"""
+        lines = []
+        for name, samples in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {escape(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(samples.items()):
+                if metric.type == "histogram":
+                    lines.extend(self.render_histogram(metric, labels, value))
+                else:
+                    lines.append(f"{name}{format_labels(metric.labels, labels)} {format_value(value)}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    @staticmethod
+    def render_histogram(metric, labels, counts):
+        cumulative = 0
+        bounds = [*map(format_value, map(float, metric.buckets)), "+Inf"]
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            yield f"{metric.name}_bucket{format_labels(metric.labels, labels, [('le', bound)])} {cumulative}"
+        yield f"{metric.name}_sum{format_labels(metric.labels, labels)} {format_value(float(counts[-1]))}"
+        yield f"{metric.name}_count{format_labels(metric.labels, labels)} {cumulative}"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Офлайн пересчёт score для большого числа записей без HTTP.
+
+Записи (аргументы online_score) читаются из JSONL/CSV файла или stdin, проходят
+ту же валидацию OnlineScoreRequest и get_score, что и в API, и обрабатываются
+пулом процессов. Результат - JSONL: {"n": <номер записи>, "score": ...} или
+{"n": ..., "error": ...}; поле "id" записи, если есть, переносится в результат.
+
+    python score_cli.py -i customers.jsonl -o scores.jsonl -j 8
+    cat customers.csv | python score_cli.py -f csv --unordered
+"""
+
+import collections
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from optparse import OptionParser
+
+import json_codec
+from config import store_params_ok
+from db.store import NullStore, Store
+from scoring import get_score
+from validators import OnlineScoreRequest
+
+# Store процесса-воркера, создаётся в init_worker
+_store = None
+
+
+def init_worker(store_params):
+    global _store
+    # Store пишет статус соединения в stdout, а stdout может быть выходным файлом
+    with contextlib.redirect_stdout(sys.stderr):
+        _store = Store(store_params) if store_params else NullStore()
+
+
+def score_record(n, record):
+    if isinstance(record, str):
+        try:
+            record = json_codec.loads(record)
+        except ValueError as e:
+            return {"n": n, "error": f"invalid json: {e}"}
+    if not isinstance(record, dict):
+        return {"n": n, "error": "record must be an object"}
+
+    result = {"n": n}
+    if "id" in record:
+        result["id"] = record["id"]
+
+    arguments, errors = OnlineScoreRequest.validate(record)
+    if errors:
+        result["error"] = str(OnlineScoreRequest.first_error(errors))
+    else:
+        result["score"] = get_score(_store, **arguments)
+    return result
+
+
+def score_chunk(chunk):
+    return [score_record(n, record) for n, record in chunk]
+
+
+def read_jsonl(stream):
+    # строки разбираются в воркерах
+    for n, line in enumerate(stream):
+        line = line.strip()
+        if line:
+            yield n, line
+
+
+def read_csv(stream):
+    for n, row in enumerate(csv.DictReader(stream)):
+        # пустая ячейка = поле не передано
+        record = {key: value for key, value in row.items() if value not in ("", None)}
+        if record.get("gender", "").lstrip("-").isdigit():
+            record["gender"] = int(record["gender"])
+        yield n, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Progress:
+    def __init__(self, report_every=None, stream=sys.stderr):
+        self.report_every = report_every
+        self.stream = stream
+        self.started = self.last_report = time.monotonic()
+        self.records = 0
+        self.errors = 0
+
+    def update(self, results):
+        self.records += len(results)
+        self.errors += sum(1 for result in results if "error" in result)
+        if self.report_every and time.monotonic() - self.last_report >= self.report_every:
+            self.last_report = time.monotonic()
+            self.report()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "records": self.records,
+            "errors": self.errors,
+            "elapsed": round(elapsed, 3),
+            "records_per_sec": round(self.records / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def report(self):
+        print(json.dumps(self.stats()), file=self.stream)
+
+
+def flush_next(in_flight, ordered, flush):
+    """Дожидается чанка - первого по порядку (ordered) или любого готового -> чанки, оставшиеся в работе."""
+    if ordered:
+        flush(in_flight.popleft())
+        return in_flight
+    done, pending = wait(in_flight, return_when=FIRST_COMPLETED)
+    for future in done:
+        flush(future)
+    return pending
+
+
+def run_pipeline(records, write, jobs, chunk_size=1000, window=None, ordered=True, store_params=None, progress=None):
+    """Прогоняет записи через пул процессов, держа в работе не больше `window` чанков.
+
+    ordered=True - результаты пишутся в порядке входа, иначе по мере готовности.
+    """
+    window = window or 2 * jobs
+    progress = progress or Progress()
+
+    def flush(future):
+        results = future.result()
+        for result in results:
+            write(result)
+        progress.update(results)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(store_params,)) as executor:
+        in_flight = collections.deque() if ordered else set()
+        for chunk in chunked(records, chunk_size):
+            if len(in_flight) >= window:
+                in_flight = flush_next(in_flight, ordered, flush)
+            future = executor.submit(score_chunk, chunk)
+            if ordered:
+                in_flight.append(future)
+            else:
+                in_flight.add(future)
+
+        while in_flight:
+            in_flight = flush_next(in_flight, ordered, flush)
+
+    return progress.stats()
+
+
+def pars_comline_args():
+    op = OptionParser(usage="usage: %prog [options]")
+    op.add_option("-i", "--input", action="store", default="-", help="JSONL/CSV файл, '-' - stdin")
+    op.add_option("-o", "--output", action="store", default="-", help="JSONL файл результатов, '-' - stdout")
+    op.add_option("-f", "--format", action="store", type="choice", choices=["jsonl", "csv"], default=None)
+    op.add_option("-j", "--jobs", action="store", type=int, default=os.cpu_count())
+    op.add_option("--chunk-size", action="store", type=int, default=1000)
+    # число чанков в обработке одновременно; ограничивает память при большом входе
+    op.add_option("--window", action="store", type=int, default=None)
+    op.add_option("--unordered", action="store_true", default=False)
+    # читать и писать кэш score в Redis, как это делает API
+    op.add_option("--cache", action="store_true", default=False)
+    op.add_option("--report-every", action="store", type=float, default=10)
+    opts, args = op.parse_args()
+    return opts, args
+
+
+def main():
+    opts, args = pars_comline_args()
+    fmt = opts.format or ("csv" if opts.input.endswith(".csv") else "jsonl")
+
+    with contextlib.ExitStack() as stack:
+        if opts.input == "-":
+            in_stream = sys.stdin
+        else:
+            in_stream = stack.enter_context(open(opts.input, encoding="utf-8", newline=""))
+        if opts.output == "-":
+            out_stream = sys.stdout
+        else:
+            out_stream = stack.enter_context(open(opts.output, "w", encoding="utf-8"))
+
+        records = read_csv(in_stream) if fmt == "csv" else read_jsonl(in_stream)
+        progress = Progress(report_every=opts.report_every)
+        run_pipeline(
+            records,
+            lambda result: out_stream.write(json_codec.dumps(result) + "\n"),
+            jobs=opts.jobs,
+            chunk_size=opts.chunk_size,
+            window=opts.window,
+            ordered=not opts.unordered,
+            store_params=store_params_ok if opts.cache else None,
+            progress=progress,
+        )
+        progress.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,265 @@
-import hashlib
-import json
+import time
 
+import metrics
+import timing
+from config import SCORE_KEY_HASHER, SCORE_KEY_VERSION
+from db.codecs import EntryCodec, FloatCodec, JSONCodec
+from db.keys import KeyBuilder
+from db.revalidate import get_policy, is_stale, needs_refresh
 
-def get_score(store, phone, email, birthday=None, gender=None, first_name=None, last_name=None):
-    key_parts = [
-        phone or "",
-        email or "",
-        gender or "",
-        first_name or "",
-        last_name or "",
-        birthday or "",
-    ]
-    key_parts_str = [str(key) for key in key_parts]
-
-    # gen key for request by params
-    info_for_hash_bytes = "".join(key_parts_str).encode("utf-8")
-    key = "uid:" + hashlib.md5(info_for_hash_bytes).hexdigest()
-
-    score = store.get_cache(key) or 0
-    if score:
-        return score
+SCORE_KEY_PREFIX = "uid:"
+SCORE_KEYS = KeyBuilder(SCORE_KEY_PREFIX, SCORE_KEY_VERSION, SCORE_KEY_HASHER)
+SCORE_CODEC = EntryCodec(FloatCodec)
+INTERESTS_CODEC = JSONCodec
+# TTL, grace и XFetch для кэша score - config.cache_policies
+SCORE_POLICY = get_policy(SCORE_KEY_PREFIX)
+# result: hit, stale (отдано устаревшее значение) или miss
+SCORE_CACHE = metrics.counter("score_cache_requests_total", "Обращения к кэшу score", ("result",))
+
+# веса признаков score
+PHONE_WEIGHT = 1.5
+EMAIL_WEIGHT = 1.5
+BIRTHDAY_GENDER_WEIGHT = 1.5
+NAME_WEIGHT = 0.5
+
+# Проверка кэша, расчёт score и запись с TTL одним вызовом в Redis (Store.get_or_eval_cache).
+# KEYS[1] - ключ score, ARGV[1] - жёсткий TTL (SCORE_POLICY.hard_ttl), ARGV[2..5] - наличие признаков ("1"/"0"),
+# ARGV[6..9] - их веса, ARGV[10] - заголовок записи SCORE_CODEC (expires_at и delta): запись та же, что пишет Python,
+# со stale-while-revalidate и XFetch. Lua число в ответе Redis стало бы целым, поэтому score возвращается строкой.
+SCORE_SCRIPT = """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    return cached
+end
+local score = 0
+for i = 2, 5 do
+    if ARGV[i] == '1' then
+        score = score + tonumber(ARGV[i + 4])
+    end
+end
+local value = ARGV[10] .. tostring(score)
+redis.call('SET', KEYS[1], value, 'EX', ARGV[1])
+return value
+"""
+SCORE_WEIGHTS = (PHONE_WEIGHT, EMAIL_WEIGHT, BIRTHDAY_GENDER_WEIGHT, NAME_WEIGHT)
+# delta записи SCORE_SCRIPT - время вызова скрипта, которое до вызова не известно: берётся время предыдущего
+script_delta = 0.0
+
+
+def get_score_key(phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    # регистр email не влияет на score
+    if isinstance(email, str):
+        email = email.lower()
+    return SCORE_KEYS.build(phone, email, gender, first_name, last_name, birthday)
+
+
+def encode_score(score, delta, now=None):
+    now = time.time() if now is None else now
+    return SCORE_CODEC.encode(score, delta, now + SCORE_POLICY.ttl)
+
+
+def compute_score(phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    score = 0
     if phone:
-        score += 1.5
+        score += PHONE_WEIGHT
     if email:
-        score += 1.5
+        score += EMAIL_WEIGHT
     if birthday and gender:
-        score += 1.5
+        score += BIRTHDAY_GENDER_WEIGHT
     if first_name and last_name:
-        score += 0.5
-    # cache for 30 sec
-    store.set_cache(key, score, 30)
+        score += NAME_WEIGHT
+    return score
+
+
+def get_score_script_args(phone, email, birthday=None, gender=None, first_name=None, last_name=None, now=None):
+    now = time.time() if now is None else now
+    flags = (phone, email, birthday and gender, first_name and last_name)
+    header = SCORE_CODEC.header(script_delta, now + SCORE_POLICY.ttl)
+    return (SCORE_POLICY.hard_ttl, *("1" if flag else "0" for flag in flags), *SCORE_WEIGHTS, header)
+
+
+def update_script_delta(started):
+    global script_delta
+    script_delta = time.perf_counter() - started
+
+
+def get_score(store, phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    key = get_score_key(phone, email, birthday, gender, first_name, last_name)
+    if store.flight is None:
+        return load_score(store, key, phone, email, birthday, gender, first_name, last_name)
+    # одновременные запросы с одним ключом ждут одного чтения/расчёта
+    return store.flight.do(key, load_score, store, key, phone, email, birthday, gender, first_name, last_name)
+
+
+def timed_compute_score(started, *args, **kwargs):
+    """-> (score, delta) для записи кэша.
+
+    delta для XFetch - стоимость пересчёта с момента started (perf_counter), то есть
+    вместе с чтением кэша из Redis: сам расчёт занимает микросекунды, и с ним одним
+    ранний пересчёт почти не срабатывал бы.
+    """
+    compute_started = time.perf_counter()
+    score = compute_score(*args, **kwargs)
+    finished = time.perf_counter()
+    timing.add("compute", finished - compute_started)
+    return score, finished - started
+
+
+def refresh_score(store, key, *args, started=None):
+    score, delta = timed_compute_score(time.perf_counter() if started is None else started, *args)
+    store.set_cache(key, encode_score(score, delta), SCORE_POLICY.hard_ttl)
     return score
 
 
+def revalidate_score(store, key, expires_at, *args):
+    """Фоновый пересчёт. Запись перечитывается из Redis: её мог уже обновить другой
+    процесс, а время чтения входит в delta так же, как при промахе.
+    """
+    started = time.perf_counter()
+    entry = SCORE_CODEC.decode(store.get_cache(key, local=False))
+    if entry is not None and entry[2] != expires_at:
+        return entry[0]
+    return refresh_score(store, key, *args, started=started)
+
+
+def use_cached_score(store, key, entry, revalidate, args):
+    SCORE_CACHE.inc("stale" if is_stale(entry[2]) else "hit")
+    # устаревшее (или рано выбранное XFetch) значение отдаётся сразу, пересчёт - в фоне
+    if store.revalidator is not None and needs_refresh(entry, SCORE_POLICY):
+        store.revalidator.submit(key, revalidate, store, key, entry[2], *args)
+    return entry[0]
+
+
+def load_score(store, key, phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    args = (phone, email, birthday, gender, first_name, last_name)
+    started = time.perf_counter()
+    cached = None
+    if SCORE_SCRIPT in store.scripts:
+        cached = store.get_or_eval_cache(key, SCORE_SCRIPT, get_score_script_args(*args))
+        update_script_delta(started)
+    if cached is None:
+        cached = store.get_cache(key)
+
+    entry = SCORE_CODEC.decode(cached)
+    if entry is not None:
+        return use_cached_score(store, key, entry, revalidate_score, args)
+    SCORE_CACHE.inc("miss")
+    return refresh_score(store, key, *args, started=started)
+
+
+def split_cached_scores(arguments_list, keys, cached, read_time=0.0):
+    """Досчитывает промахи и устаревшие записи кэша -> (scores, новые записи для кэша)
+
+    read_time - время чтения кэша пачки, входит в delta каждой пересчитанной записи.
+    """
+    scores = []
+    to_cache = {}
+    now = time.time()
+    results = {"hit": 0, "stale": 0, "miss": 0}
+    for arguments, key, raw in zip(arguments_list, keys, cached):
+        entry = SCORE_CODEC.decode(raw)
+        if entry is None or is_stale(entry[2], now):
+            results["miss" if entry is None else "stale"] += 1
+            score, delta = timed_compute_score(time.perf_counter() - read_time, **arguments)
+            to_cache[key] = encode_score(score, delta, now)
+        else:
+            results["hit"] += 1
+            score = entry[0]
+        scores.append(score)
+    for result, amount in results.items():
+        if amount:
+            SCORE_CACHE.inc(result, amount=amount)
+    return scores, to_cache.items()
+
+
+def get_scores(store, arguments_list):
+    """score для списка аргументов get_score: одно чтение кэша и одна запись на всех."""
+    keys = [get_score_key(**arguments) for arguments in arguments_list]
+    started = time.perf_counter()
+    cached = store.get_cache_many(keys)
+    scores, to_cache = split_cached_scores(arguments_list, keys, cached, time.perf_counter() - started)
+    store.set_cache_many(to_cache, SCORE_POLICY.hard_ttl)
+    return scores
+
+
+def decode_interests(r):
+    return INTERESTS_CODEC.decode(r) if r else []
+
+
 def get_interests(store, cid):
-    r = store.get(cid)
-    return json.loads(r) if r else []
+    # список id -> {id: interests} одним запросом к Store
+    if isinstance(cid, (list, tuple)):
+        return dict(zip(cid, map(decode_interests, store.get_many(cid))))
+    return decode_interests(store.get(cid))
+
+
+def decode_interests_many(cid, values):
+    """-> {id: interests}, None для id с неразбираемой записью: в batch это ошибка только запросов с этим id."""
+    interests_by_id = {}
+    for client_id, value in zip(cid, values):
+        try:
+            interests_by_id[client_id] = decode_interests(value)
+        except ValueError:
+            interests_by_id[client_id] = None
+    return interests_by_id
+
+
+def get_interests_many(store, cid):
+    return decode_interests_many(cid, store.get_many(cid))
+
+
+async def get_score_async(store, phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    key = get_score_key(phone, email, birthday, gender, first_name, last_name)
+    if store.flight is None:
+        return await load_score_async(store, key, phone, email, birthday, gender, first_name, last_name)
+    return await store.flight.do(key, load_score_async, store, key, phone, email, birthday, gender, first_name, last_name)
+
+
+async def refresh_score_async(store, key, *args, started=None):
+    score, delta = timed_compute_score(time.perf_counter() if started is None else started, *args)
+    await store.set_cache(key, encode_score(score, delta), SCORE_POLICY.hard_ttl)
+    return score
+
+
+async def revalidate_score_async(store, key, expires_at, *args):
+    started = time.perf_counter()
+    entry = SCORE_CODEC.decode(await store.get_cache(key, local=False))
+    if entry is not None and entry[2] != expires_at:
+        return entry[0]
+    return await refresh_score_async(store, key, *args, started=started)
+
+
+async def load_score_async(store, key, phone, email, birthday=None, gender=None, first_name=None, last_name=None):
+    args = (phone, email, birthday, gender, first_name, last_name)
+    started = time.perf_counter()
+    cached = None
+    if SCORE_SCRIPT in store.scripts:
+        cached = await store.get_or_eval_cache(key, SCORE_SCRIPT, get_score_script_args(*args))
+        update_script_delta(started)
+    if cached is None:
+        cached = await store.get_cache(key)
+
+    entry = SCORE_CODEC.decode(cached)
+    if entry is not None:
+        return use_cached_score(store, key, entry, revalidate_score_async, args)
+    SCORE_CACHE.inc("miss")
+    return await refresh_score_async(store, key, *args, started=started)
+
+
+async def get_scores_async(store, arguments_list):
+    keys = [get_score_key(**arguments) for arguments in arguments_list]
+    started = time.perf_counter()
+    cached = await store.get_cache_many(keys)
+    scores, to_cache = split_cached_scores(arguments_list, keys, cached, time.perf_counter() - started)
+    await store.set_cache_many(to_cache, SCORE_POLICY.hard_ttl)
+    return scores
+
+
+async def get_interests_async(store, cid):
+    if isinstance(cid, (list, tuple)):
+        return dict(zip(cid, map(decode_interests, await store.get_many(cid))))
+    return decode_interests(await store.get(cid))
+
+
+async def get_interests_many_async(store, cid):
+    return decode_interests_many(cid, await store.get_many(cid))
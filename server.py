@@ -0,0 +1,196 @@
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer, обрабатывающий соединения в ограниченном пуле потоков.
+
+    Одновременно обслуживается не больше `workers` соединений: пока все потоки
+    заняты, цикл accept ждёт свободный слот, а новые клиенты копятся в
+    backlog сокета (request_queue_size), а не в памяти процесса.
+    """
+
+    request_queue_size = 128
+    thread_name_prefix = "http-worker"
+
+    def __init__(self, server_address, handler_class, workers, bind_and_activate=True):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.thread_name_prefix)
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    def process_request(self, request, client_address):
+        # блокируемся, пока не освободится поток
+        self.slots.acquire()
+        try:
+            self.pool.submit(self.process_request_thread, request, client_address)
+        except RuntimeError:
+            # пул уже остановлен (server_close)
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class PreforkServer:
+    """Pre-fork сервер: мастер запускает `processes` воркеров на одном порту.
+
+    Каждый воркер сам открывает сокет с SO_REUSEPORT, и ядро распределяет
+    соединения между процессами. Мастер не обслуживает запросы: он перезапускает
+    упавших воркеров и по SIGTERM/SIGINT останавливает их, дожидаясь
+    завершения запросов в обработке (не дольше `graceful_timeout`).
+
+    `init_worker` вызывается в воркере сразу после fork - там нужно создать
+    ресурсы, которые нельзя наследовать от мастера (например, Store).
+    `exit_worker` - перед выходом воркера, в том числе упавшего (например,
+    сохранить метрики и дописать журнал).
+    """
+
+    poll_interval = 0.2
+    restart_delay = 0.5
+    graceful_timeout = 10
+
+    def __init__(self, server_address, handler_class, processes, workers=1, init_worker=None, exit_worker=None):
+        if processes < 1:
+            raise ValueError("processes must be >= 1")
+        self.server_address = server_address
+        self.handler_class = handler_class
+        self.processes = processes
+        self.workers = workers
+        self.init_worker = init_worker
+        self.exit_worker = exit_worker
+        self.children = {}
+        self.stopping = False
+
+    # --- воркер ---
+
+    def make_server(self):
+        if self.workers > 1:
+            server = ThreadPoolHTTPServer(self.server_address, self.handler_class, self.workers, bind_and_activate=False)
+        else:
+            server = HTTPServer(self.server_address, self.handler_class, bind_and_activate=False)
+        server.allow_reuse_port = True
+        try:
+            server.server_bind()
+            server.server_activate()
+        except Exception:
+            server.server_close()
+            raise
+        return server
+
+    def run_worker(self):
+        # Ctrl-C приходит всей группе процессов - остановкой управляет мастер
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        if self.init_worker is not None:
+            self.init_worker()
+        server = self.make_server()
+
+        def stop(signum, frame):
+            # shutdown() нельзя вызывать из потока serve_forever
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        logging.info("Worker %s started" % os.getpid())
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        logging.info("Worker %s stopped" % os.getpid())
+
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_worker()
+            except BaseException:
+                logging.exception("Worker %s crashed" % os.getpid())
+                code = 1
+            finally:
+                try:
+                    if self.exit_worker is not None:
+                        self.exit_worker()
+                finally:
+                    # не возвращаемся в код мастера
+                    os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    # --- мастер ---
+
+    def handle_stop_signal(self, signum, frame):
+        self.stopping = True
+
+    def reap_children(self):
+        exited = []
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.children.pop(pid, None) is not None:
+                exited.append((pid, status))
+        return exited
+
+    def serve_forever(self):
+        previous = {sig: signal.signal(sig, self.handle_stop_signal) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for _ in range(self.processes):
+                self.spawn_worker()
+
+            while not self.stopping:
+                time.sleep(self.poll_interval)
+                for pid, status in self.reap_children():
+                    if self.stopping:
+                        break
+                    logging.error("Worker %s exited with status %s, restarting" % (pid, os.waitstatus_to_exitcode(status)))
+                    # защита от бесконечного цикла перезапусков
+                    time.sleep(self.restart_delay)
+                    self.spawn_worker()
+        finally:
+            self.stop_workers()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def stop_workers(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap_children()
+            time.sleep(self.poll_interval / 4)
+
+        for pid in list(self.children):
+            logging.error("Worker %s did not stop in time, killing" % pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.children.pop(pid, None)
@@ -5,11 +5,20 @@ import time
 import unittest
 from test import cases
 from test.support_functions import start_test_redis, stop_test_redis
+from unittest import mock
 
 from config import store_params_fail  # store_params_fail,
-from config import ADMIN_LOGIN, ADMIN_SALT, StatusCodes, accounts, store_params_ok
+from config import (
+    ADMIN_LOGIN,
+    ADMIN_SALT,
+    BATCH_MAX_SIZE,
+    StatusCodes,
+    accounts,
+    store_params_ok,
+)
 from db.store import Store, StoreFake
-from handlers import interests_handler, score_handler
+from handlers import batch_handler, interests_handler, score_handler
+from validators import check_auth
 
 
 class TestApi(unittest.TestCase):
@@ -236,6 +245,110 @@ class TestApi(unittest.TestCase):
         self.assertEqual(score, 42)
 
 
+def user_item(method, arguments, token=accounts["user"]["token"]):
+    return {
+        "account": accounts["user"]["account"],
+        "login": accounts["user"]["login"],
+        "token": token,
+        "method": method,
+        "arguments": arguments,
+    }
+
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = StoreFake(store_params=store_params_ok)
+        cls.store.set("1", json.dumps(["travel", "sport"]))
+        cls.store.set("2", json.dumps(["books", "cinema"]))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.r.delete("1", "2")
+
+    def setUp(self):
+        self.context = {}
+
+    def batch(self, items):
+        return batch_handler(request={"body": items, "headers": {}}, ctx=self.context, store=self.store)
+
+    def test_mixed_items(self):
+        items = [
+            user_item("online_score", {"phone": "79175002040", "email": "stupnikov@otus.ru"}),
+            user_item("clients_interests", {"client_ids": [1, 2]}),
+            user_item("online_score", {"phone": "89175002040"}),
+            user_item("online_score", {}, token="bad"),
+            user_item("unknown", {}),
+            {"login": "user"},
+            "not an object",
+            user_item("clients_interests", {"client_ids": [2, 3]}),
+        ]
+        response, code = self.batch(items)
+
+        self.assertEqual(StatusCodes.OK, code)
+        self.assertEqual(
+            [
+                StatusCodes.OK,
+                StatusCodes.OK,
+                StatusCodes.INVALID_REQUEST,
+                StatusCodes.FORBIDDEN,
+                StatusCodes.NOT_FOUND,
+                StatusCodes.INVALID_REQUEST,
+                StatusCodes.INVALID_REQUEST,
+                StatusCodes.OK,
+            ],
+            [item["code"] for item in response],
+        )
+        self.assertEqual(3.0, float(response[0]["response"]["score"]))
+        self.assertEqual({1: ["travel", "sport"], 2: ["books", "cinema"]}, response[1]["response"])
+        self.assertEqual({2: ["books", "cinema"], 3: []}, response[7]["response"])
+        self.assertEqual("Forbidden", response[3]["error"])
+        self.assertEqual(len(items), self.context["nitems"])
+
+    def test_admin_score(self):
+        info_for_hash_bytes = (datetime.datetime.now().strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
+        admin_token = hashlib.sha512(info_for_hash_bytes).hexdigest()
+        item = {"account": "admin", "login": ADMIN_LOGIN, "token": admin_token, "method": "online_score", "arguments": {}}
+
+        response, _ = self.batch([item])
+        self.assertEqual([{"response": {"score": 42}, "code": StatusCodes.OK}], response)
+
+    def test_grouped_store_calls(self):
+        items = [user_item("online_score", {"phone": "79175002040", "email": f"{i}@otus.ru"}) for i in range(5)]
+        items += [user_item("clients_interests", {"client_ids": [i]}) for i in range(5)]
+
+        with mock.patch("handlers.check_auth", wraps=check_auth) as auth, mock.patch.object(
+            self.store, "get_cache_many", wraps=self.store.get_cache_many
+        ) as get_cache_many, mock.patch.object(self.store, "get_many", wraps=self.store.get_many) as get_many:
+            response, _ = self.batch(items)
+
+        self.assertTrue(all(item["code"] == StatusCodes.OK for item in response))
+        # одна проверка токена на аккаунт, одно чтение кэша на все score, одно на все interests
+        self.assertEqual(1, auth.call_count)
+        self.assertEqual(1, get_cache_many.call_count)
+        self.assertEqual(1, get_many.call_count)
+
+    def test_malformed_interests(self):
+        # неразбираемая запись - ошибка только у запросов с этим id
+        self.store.set("4", "not json")
+        self.addCleanup(self.store.r.delete, "4")
+        items = [
+            user_item("clients_interests", {"client_ids": [1, 4]}),
+            user_item("clients_interests", {"client_ids": [2]}),
+            user_item("online_score", {"phone": "79175002040", "email": "stupnikov@otus.ru"}),
+        ]
+        response, code = self.batch(items)
+
+        self.assertEqual(StatusCodes.OK, code)
+        self.assertEqual([StatusCodes.INTERNAL_ERROR, StatusCodes.OK, StatusCodes.OK], [item["code"] for item in response])
+        self.assertEqual({2: ["books", "cinema"]}, response[1]["response"])
+
+    @cases([[], {"a": 1}, [{}] * (BATCH_MAX_SIZE + 1)])
+    def test_invalid_batch(self, items):
+        _, code = self.batch(items)
+        self.assertEqual(StatusCodes.INVALID_REQUEST, code)
+
+
 class TestApiStoreFail(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -295,6 +408,18 @@ class TestApiStoreFail(unittest.TestCase):
 
         self.assertEqual(StatusCodes.INTERNAL_ERROR, code)
 
+    def test_batch_request(self):
+        items = [
+            user_item("online_score", {"phone": "79175002040", "email": "stupnikov@otus.ru"}),
+            user_item("clients_interests", {"client_ids": [1, 2]}),
+        ]
+        response, code = batch_handler(request={"body": items, "headers": {}}, ctx=self.context, store=self.store)
+
+        self.assertEqual(StatusCodes.OK, code)
+        # score считается без кэша, interests без Store недоступны
+        self.assertEqual({"response": {"score": 3.0}, "code": StatusCodes.OK}, response[0])
+        self.assertEqual(StatusCodes.INTERNAL_ERROR, response[1]["code"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,485 @@
+import asyncio
+import gzip
+import http.client
+import io
+import json
+import socket
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+from test import cases
+from wsgiref.util import setup_testing_defaults
+
+from api import MainHTTPHandler
+from app import ASYNC_ROUTER, Application
+from config import MAX_BODY_SIZE, StatusCodes, accounts, store_params_ok
+from db.store import AsyncStoreFake, StoreFake
+
+
+def user_request(arguments, token=accounts["user"]["token"]):
+    return json.dumps(
+        {
+            "account": accounts["user"]["account"],
+            "login": accounts["user"]["login"],
+            "token": token,
+            "method": "online_score",
+            "arguments": arguments,
+        }
+    ).encode("utf-8")
+
+
+PARITY_CASES = [
+    ("/score", user_request({"phone": "79175002040", "email": "stupnikov@otus.ru"})),
+    ("/score", user_request({"phone": "89175002040"})),
+    ("/score", user_request({"phone": "79175002040"}, token="bad")),
+    ("/interests", user_request({"client_ids": [1, 2]})),
+    ("/interests", user_request({"client_ids": []})),
+    ("/unknown", user_request({})),
+    ("/score", b"{not json"),
+    ("/score", b"{}"),
+    ("/score", json.dumps({"login": "user", "arguments": {}}).encode("utf-8")),
+]
+
+
+class TestTransportParity(unittest.TestCase):
+    """Один и тот же запрос через BaseHTTPRequestHandler, WSGI и ASGI даёт один и тот же ответ."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.store = StoreFake(store_params=store_params_ok)
+        cls.store.set("1", json.dumps(["travel", "sport"]))
+        cls.store.set("2", json.dumps(["books", "cinema"]))
+
+        MainHTTPHandler.log_message = lambda *args: None
+        cls.previous_app = MainHTTPHandler.app
+        MainHTTPHandler.app = Application(cls.store)
+        cls.server = HTTPServer(("localhost", 0), MainHTTPHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        MainHTTPHandler.app = cls.previous_app
+        del MainHTTPHandler.log_message
+        cls.store.r.delete("1", "2")
+
+    def via_http_server(self, path, body):
+        url = "http://localhost:%s%s" % (self.server.server_address[1], path)
+        request = urllib.request.Request(url, data=body, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as resp:
+                return resp.status, resp.headers["Content-Type"], json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers["Content-Type"], json.loads(e.read())
+
+    def via_wsgi(self, path, body):
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": path,
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+        }
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, headers):
+            started["status"] = int(status.split()[0])
+            started["headers"] = dict(headers)
+
+        payload = b"".join(Application(self.store).wsgi(environ, start_response))
+        self.assertEqual(str(len(payload)), started["headers"]["Content-Length"])
+        return started["status"], started["headers"]["Content-Type"], json.loads(payload)
+
+    def via_asgi(self, path, body):
+        async def run():
+            store = AsyncStoreFake(store_params=store_params_ok)
+            app = Application(store, router=ASYNC_ROUTER)
+            scope = {"type": "http", "method": "POST", "path": path, "headers": [(b"content-type", b"application/json")]}
+            incoming = [
+                {"type": "http.request", "body": body[:3], "more_body": True},
+                {"type": "http.request", "body": body[3:], "more_body": False},
+            ]
+            sent = []
+
+            async def receive():
+                return incoming.pop(0)
+
+            async def send(message):
+                sent.append(message)
+
+            await app.asgi(scope, receive, send)
+            await store.close()
+            return sent
+
+        start, body_message = asyncio.run(run())
+        headers = {name.decode(): value.decode() for name, value in start["headers"]}
+        return start["status"], headers["content-type"], json.loads(body_message["body"])
+
+    def reset_score_cache(self):
+        # закэшированный score возвращается строкой, поэтому каждый транспорт считает его заново
+        keys = self.store.r.keys("uid:*")
+        if keys:
+            self.store.r.delete(*keys)
+
+    @cases(PARITY_CASES)
+    def test_parity(self, path, body):
+        self.reset_score_cache()
+        expected = self.via_http_server(path, body)
+
+        self.reset_score_cache()
+        self.assertEqual(expected, self.via_wsgi(path, body))
+        self.reset_score_cache()
+        self.assertEqual(expected, self.via_asgi(path, body))
+
+    def test_bad_request_envelope(self):
+        status, content_type, response = self.via_http_server("/score", b"{not json")
+
+        self.assertEqual(StatusCodes.BAD_REQUEST, status)
+        self.assertEqual("application/json", content_type)
+        self.assertEqual({"error": "Bad Request", "code": StatusCodes.BAD_REQUEST}, response)
+
+    @cases(
+        [
+            ("/batch", b"[]", StatusCodes.INVALID_REQUEST),
+            ("/score", b"{}", StatusCodes.INVALID_REQUEST),
+            ("/unknown", b"{}", StatusCodes.NOT_FOUND),
+        ]
+    )
+    def test_empty_request(self, path, body, code):
+        for via in (self.via_http_server, self.via_wsgi, self.via_asgi):
+            status, _, response = via(path, body)
+
+            self.assertEqual(code, status, via.__name__)
+            self.assertEqual(code, response["code"], via.__name__)
+
+    def test_ping(self):
+        with urllib.request.urlopen("http://localhost:%s/" % self.server.server_address[1], timeout=5) as resp:
+            self.assertEqual(b"Hello, world!", resp.read())
+
+    def test_metrics(self):
+        self.reset_score_cache()
+        for _ in range(2):
+            self.via_http_server("/score", PARITY_CASES[0][1])
+        with urllib.request.urlopen("http://localhost:%s/metrics" % self.server.server_address[1], timeout=5) as resp:
+            content_type = resp.headers["Content-Type"]
+            text = resp.read().decode("utf-8")
+
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+        for line in (
+            'http_request_duration_seconds_count{route="score",code="200"}',
+            'http_requests_in_flight{route="metrics"} 1',
+            'score_cache_requests_total{result="hit"}',
+            'score_cache_requests_total{result="miss"}',
+            'store_call_duration_seconds_count{op="get",breaker="cache"}',
+        ):
+            self.assertIn(line, text)
+
+
+class TestServerTiming(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok)
+        keys = self.store.r.keys("uid:*")
+        if keys:
+            self.store.r.delete(*keys)
+
+    def test_header_and_context(self):
+        app = Application(self.store, server_timing=True)
+        with self.assertLogs(level="INFO") as logs:
+            response = app.handle("POST", "/score", {}, PARITY_CASES[0][1])
+
+        header = dict(response.headers)["Server-Timing"]
+        stages = [part.split(";")[0] for part in header.split(", ")]
+        for stage in ("parse", "validate", "auth", "store", "compute", "serialize", "total"):
+            self.assertIn(stage, stages)
+        self.assertIn("total", logs.records[-1].access["timings"])
+
+    def test_async(self):
+        async def run():
+            store = AsyncStoreFake(store_params=store_params_ok)
+            app = Application(store, router=ASYNC_ROUTER, server_timing=True)
+            try:
+                return await app.handle_async("POST", "/score", {}, PARITY_CASES[0][1])
+            finally:
+                await store.close()
+
+        header = dict(asyncio.run(run()).headers)["Server-Timing"]
+
+        self.assertIn("store;dur=", header)
+        self.assertIn("auth;dur=", header)
+
+    def test_access_record(self):
+        with self.assertLogs(level="INFO") as logs:
+            Application(self.store).handle("POST", "/score", {"X-Request-Id": "42"}, PARITY_CASES[2][1])
+
+        access = logs.records[-1].access
+        self.assertEqual("/score 403", logs.records[-1].getMessage())
+        self.assertEqual({"request_id", "path", "method", "account", "login", "code", "error", "timings"}, set(access))
+        self.assertEqual(("42", "user", StatusCodes.FORBIDDEN), (access["request_id"], access["login"], access["code"]))
+
+    def test_disabled(self):
+        response = Application(self.store).handle("POST", "/score", {}, PARITY_CASES[0][1])
+
+        self.assertNotIn("Server-Timing", dict(response.headers))
+
+
+class TestKeepAlive(unittest.TestCase):
+    max_requests = 3
+    idle_timeout = 0.3
+
+    def setUp(self):
+        self.handler = type(
+            "Handler",
+            (MainHTTPHandler,),
+            {
+                "app": Application(),
+                "timeout": self.idle_timeout,
+                "max_keepalive_requests": self.max_requests,
+                "log_message": lambda *args: None,
+            },
+        )
+        self.server = HTTPServer(("localhost", 0), self.handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("localhost", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, body=None):
+        self.conn.request(method, "/unknown", body=body)
+        resp = self.conn.getresponse()
+        payload = resp.read()
+        self.assertEqual(str(len(payload)), resp.headers["Content-Length"])
+        return resp
+
+    def test_connection_is_reused(self):
+        self.request("GET")
+        sock = self.conn.sock
+        bad_request = self.request("POST", b"{not json")
+        self.assertIs(sock, self.conn.sock)
+        not_found = self.request("POST", user_request({}))
+
+        self.assertEqual(StatusCodes.BAD_REQUEST, bad_request.status)
+        self.assertEqual(StatusCodes.NOT_FOUND, not_found.status)
+
+    def test_request_cap(self):
+        for _ in range(self.max_requests - 1):
+            self.assertIsNone(self.request("GET").headers["Connection"])
+        resp = self.request("GET")
+
+        self.assertEqual("close", resp.headers["Connection"])
+        self.assertIsNone(self.conn.sock)
+
+    def test_idle_timeout(self):
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            time.sleep(self.idle_timeout * 3)
+            received = b""
+            while chunk := sock.recv(4096):
+                received += chunk
+
+        # после ответа сервер сам закрыл простаивающее соединение
+        self.assertTrue(received.startswith(b"HTTP/1.1 200"))
+        self.assertTrue(received.endswith(b"Hello, world!"))
+
+
+class TestCompression(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = StoreFake(store_params=store_params_ok)
+        # ответ на несколько сотен client_ids больше порога сжатия
+        cls.body = user_request({"client_ids": list(range(300))})
+
+    def setUp(self):
+        self.handler = type("Handler", (MainHTTPHandler,), {"app": Application(self.store), "log_message": lambda *args: None})
+        self.server = HTTPServer(("localhost", 0), self.handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("localhost", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, path, body, headers):
+        self.conn.request("POST", path, body=body, headers=headers)
+        resp = self.conn.getresponse()
+        return resp, resp.read()
+
+    def test_large_response(self):
+        plain_resp, plain = self.post("/interests", self.body, {})
+        resp, payload = self.post("/interests", self.body, {"Accept-Encoding": "gzip, deflate"})
+
+        self.assertIsNone(plain_resp.headers["Content-Encoding"])
+        self.assertEqual("gzip", resp.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", resp.headers["Vary"])
+        self.assertEqual(plain, gzip.decompress(payload))
+        self.assertLess(len(payload), len(plain))
+
+    def test_small_response(self):
+        body = user_request({"phone": "79175002040", "email": "stupnikov@otus.ru"})
+        resp, payload = self.post("/score", body, {"Accept-Encoding": "gzip"})
+
+        self.assertEqual(StatusCodes.OK, json.loads(payload)["code"])
+        self.assertIsNone(resp.headers["Content-Encoding"])
+        self.assertIsNone(resp.headers["Vary"])
+
+    def test_disabled(self):
+        response = Application(self.store, compression=False).handle(
+            "POST", "/interests", {"Accept-Encoding": "gzip"}, self.body
+        )
+
+        self.assertNotIn("Content-Encoding", dict(response.headers))
+
+    def test_asgi(self):
+        async def run():
+            store = AsyncStoreFake(store_params=store_params_ok)
+            app = Application(store, router=ASYNC_ROUTER)
+            scope = {"type": "http", "method": "POST", "path": "/interests", "headers": [(b"accept-encoding", b"gzip")]}
+            incoming = [{"type": "http.request", "body": self.body, "more_body": False}]
+            sent = []
+
+            async def receive():
+                return incoming.pop(0)
+
+            async def send(message):
+                sent.append(message)
+
+            await app.asgi(scope, receive, send)
+            await store.close()
+            return sent
+
+        start, body_message = asyncio.run(run())
+        headers = {name.decode(): value.decode() for name, value in start["headers"]}
+
+        self.assertEqual("gzip", headers["content-encoding"])
+        self.assertEqual(StatusCodes.OK, json.loads(gzip.decompress(body_message["body"]))["code"])
+
+
+class TestBodyLimits(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("Handler", (MainHTTPHandler,), {"app": Application(), "log_message": lambda *args: None})
+        self.server = HTTPServer(("localhost", 0), self.handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send(self, head, body=b""):
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            sock.sendall(head.encode("latin-1") + b"\r\n" + body)
+            received = b""
+            while chunk := sock.recv(4096):
+                received += chunk
+        response = http.client.HTTPResponse(FakeSocket(received))
+        response.begin()
+        return response, json.loads(response.read())
+
+    def test_too_large(self):
+        # тело не отправляется: ответ приходит по заголовкам
+        resp, payload = self.send(f"POST /score HTTP/1.1\r\nContent-Length: {MAX_BODY_SIZE + 1}\r\n")
+
+        self.assertEqual(StatusCodes.PAYLOAD_TOO_LARGE, resp.status)
+        self.assertEqual(StatusCodes.PAYLOAD_TOO_LARGE, payload["code"])
+        self.assertEqual("close", resp.headers["Connection"])
+
+    def test_expect_continue_rejected(self):
+        head = f"POST /score HTTP/1.1\r\nContent-Length: {MAX_BODY_SIZE + 1}\r\nExpect: 100-continue\r\n"
+        resp, payload = self.send(head)
+
+        self.assertEqual(StatusCodes.PAYLOAD_TOO_LARGE, resp.status)
+        self.assertEqual("close", resp.headers["Connection"])
+
+    @cases(
+        [
+            ("Transfer-Encoding: gzip\r\n", StatusCodes.NOT_IMPLEMENTED),
+            ("", StatusCodes.LENGTH_REQUIRED),
+            ("Content-Length: x\r\n", StatusCodes.BAD_REQUEST),
+            ("Content-Length: \xb2\r\n", StatusCodes.BAD_REQUEST),
+        ]
+    )
+    def test_rejected(self, header, code):
+        resp, payload = self.send(f"POST /score HTTP/1.1\r\n{header}")
+
+        self.assertEqual(code, resp.status)
+        self.assertEqual(code, payload["code"])
+
+    def test_chunked(self):
+        conn = http.client.HTTPConnection("localhost", self.server.server_address[1], timeout=5)
+        try:
+            statuses = []
+            for body in (b"{not json", user_request({})):
+                conn.request("POST", "/unknown", body=iter([body[:3], body[3:]]), encode_chunked=True)
+                resp = conn.getresponse()
+                resp.read()
+                statuses.append(resp.status)
+        finally:
+            conn.close()
+
+        # тело прочитано целиком: второй запрос в том же соединении разобран
+        self.assertEqual([StatusCodes.BAD_REQUEST, StatusCodes.NOT_FOUND], statuses)
+
+    @cases(
+        [
+            (str(MAX_BODY_SIZE + 1), StatusCodes.PAYLOAD_TOO_LARGE),
+            ("-1", StatusCodes.BAD_REQUEST),
+            ("abc", StatusCodes.BAD_REQUEST),
+        ]
+    )
+    def test_wsgi(self, content_length, code):
+        wsgi_input = io.BytesIO(b"x" * (MAX_BODY_SIZE + 10))
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/score", "CONTENT_LENGTH": content_length, "wsgi.input": wsgi_input}
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, headers):
+            started["status"] = int(status.split()[0])
+
+        payload = b"".join(Application().wsgi(environ, start_response))
+
+        self.assertEqual(code, started["status"])
+        self.assertEqual(code, json.loads(payload)["code"])
+        # тело не читается
+        self.assertEqual(0, wsgi_input.tell())
+
+    def test_wsgi_chunked(self):
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/score",
+            "HTTP_TRANSFER_ENCODING": "chunked",
+            "wsgi.input": io.BytesIO(b"x" * (MAX_BODY_SIZE + 10)),
+            "wsgi.input_terminated": True,
+        }
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, headers):
+            started["status"] = int(status.split()[0])
+
+        b"".join(Application().wsgi(environ, start_response))
+
+        self.assertEqual(StatusCodes.PAYLOAD_TOO_LARGE, started["status"])
+
+
+class FakeSocket:
+    """Принятые байты для разбора ответа http.client.HTTPResponse."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, mode):
+        return io.BytesIO(self.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
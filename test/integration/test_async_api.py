@@ -0,0 +1,185 @@
+import asyncio
+import http.client
+import json
+import unittest
+
+from app import ASYNC_ROUTER, ROUTER, Application
+from async_api import AsyncHTTPServer
+from config import MAX_BODY_SIZE, StatusCodes, accounts, store_params_ok
+from db.store import AsyncStoreFake, StoreFake
+from handlers import (
+    batch_handler_async,
+    interests_handler_async,
+    score_handler,
+    score_handler_async,
+)
+
+
+def user_request(arguments):
+    return {
+        "account": accounts["user"]["account"],
+        "login": accounts["user"]["login"],
+        "token": accounts["user"]["token"],
+        "method": "online_score",
+        "arguments": arguments,
+    }
+
+
+class TestAsyncHandlers(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.store = AsyncStoreFake(store_params=store_params_ok)
+        await self.store.set("1", json.dumps(["travel", "sport"]))
+        await self.store.set("2", json.dumps(["books", "cinema"]))
+
+    async def asyncTearDown(self):
+        await self.store.r.delete("1", "2")
+        await self.store.close()
+
+    async def test_score(self):
+        ctx = {}
+        arguments = {"phone": "79175002040", "email": "stupnikov@otus.ru"}
+        response, code = await score_handler_async({"body": user_request(arguments), "headers": {}}, ctx, self.store)
+
+        self.assertEqual(StatusCodes.OK, code)
+        self.assertEqual(3.0, float(response["score"]))
+        self.assertIn("has", ctx)
+
+    async def test_invalid_score(self):
+        arguments = {"phone": "89175002040"}
+        _, code = await score_handler_async({"body": user_request(arguments), "headers": {}}, {}, self.store)
+        self.assertEqual(StatusCodes.INVALID_REQUEST, code)
+
+    async def test_interests(self):
+        ctx = {}
+        arguments = {"client_ids": [1, 2, 3]}
+        response, code = await interests_handler_async({"body": user_request(arguments), "headers": {}}, ctx, self.store)
+
+        self.assertEqual(StatusCodes.OK, code)
+        self.assertEqual({1: ["travel", "sport"], 2: ["books", "cinema"], 3: []}, response)
+        self.assertEqual(3, ctx["nclients"])
+
+    async def test_forbidden(self):
+        request = dict(user_request({"client_ids": [1]}), token="bad")
+        _, code = await interests_handler_async({"body": request, "headers": {}}, {}, self.store)
+        self.assertEqual(StatusCodes.FORBIDDEN, code)
+
+    async def test_batch_malformed_interests(self):
+        await self.store.set("4", "not json")
+        items = [dict(user_request({"client_ids": ids}), method="clients_interests") for ids in ([1, 4], [2])]
+        try:
+            response, code = await batch_handler_async({"body": items, "headers": {}}, {}, self.store)
+        finally:
+            await self.store.r.delete("4")
+
+        self.assertEqual(StatusCodes.OK, code)
+        self.assertEqual([StatusCodes.INTERNAL_ERROR, StatusCodes.OK], [item["code"] for item in response])
+
+
+class TestAsyncHTTPServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.store = AsyncStoreFake(store_params=store_params_ok)
+        await self.store.set("1", json.dumps(["travel", "sport"]))
+        self.server = AsyncHTTPServer("localhost", 0, Application(self.store, router=ASYNC_ROUTER))
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        await self.store.r.delete("1")
+        await self.store.close()
+
+    def post_many(self, requests):
+        conn = http.client.HTTPConnection("localhost", self.server.port, timeout=5)
+        results = []
+        try:
+            for path, body in requests:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                results.append((resp.status, json.loads(resp.read())))
+        finally:
+            conn.close()
+        return results
+
+    async def test_routes(self):
+        # cases не поддерживает корутины, поэтому перебираем вручную
+        routes = [
+            ("/score", {"phone": "79175002040", "email": "stupnikov@otus.ru"}, StatusCodes.OK),
+            ("/interests", {"client_ids": [1]}, StatusCodes.OK),
+            ("/score", {"phone": "89175002040"}, StatusCodes.INVALID_REQUEST),
+            ("/unknown", {}, StatusCodes.NOT_FOUND),
+        ]
+        for path, arguments, expected_code in routes:
+            body = json.dumps(user_request(arguments))
+            [(status, response)] = await asyncio.to_thread(self.post_many, [(path, body)])
+
+            self.assertEqual(expected_code, status, path)
+            self.assertEqual(expected_code, response["code"], path)
+
+    async def test_bad_json(self):
+        [(status, response)] = await asyncio.to_thread(self.post_many, [("/score", "{")])
+        self.assertEqual(StatusCodes.BAD_REQUEST, status)
+        self.assertEqual({"error": "Bad Request", "code": StatusCodes.BAD_REQUEST}, response)
+
+    async def test_keep_alive(self):
+        body = json.dumps(user_request({"client_ids": [1]}))
+        results = await asyncio.to_thread(self.post_many, [("/interests", body)] * 3)
+
+        self.assertEqual([StatusCodes.OK] * 3, [status for status, _ in results])
+        self.assertEqual({"1": ["travel", "sport"]}, results[-1][1]["response"])
+
+    async def test_chunked(self):
+        body = json.dumps(user_request({"client_ids": [1]})).encode("utf-8")
+
+        def post():
+            conn = http.client.HTTPConnection("localhost", self.server.port, timeout=5)
+            try:
+                conn.request("POST", "/interests", body=iter([body[:10], body[10:]]), encode_chunked=True)
+                resp = conn.getresponse()
+                return resp.status, json.loads(resp.read())
+            finally:
+                conn.close()
+
+        status, response = await asyncio.to_thread(post)
+        self.assertEqual(StatusCodes.OK, status)
+        self.assertEqual({"1": ["travel", "sport"]}, response["response"])
+
+    async def test_too_large(self):
+        reader, writer = await asyncio.open_connection("localhost", self.server.port)
+        writer.write(f"POST /score HTTP/1.1\r\nContent-Length: {MAX_BODY_SIZE + 1}\r\n\r\n".encode("latin-1"))
+        # сервер отвечает, не дожидаясь тела, и закрывает соединение
+        received = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        await writer.wait_closed()
+
+        self.assertTrue(received.startswith(b"HTTP/1.1 413"))
+        self.assertIn(b"Connection: close", received)
+
+
+class TestMixedRouter(unittest.TestCase):
+    def test_async_handler_with_sync_store(self):
+        # синхронный путь (handle) передал бы async-обработчику синхронный Store
+        with self.assertRaises(ValueError):
+            Application(StoreFake(store_params=store_params_ok), router={**ROUTER, "score": score_handler_async})
+
+    def test_sync_handler_with_async_store(self):
+        # async-движок передал бы синхронному обработчику AsyncStore
+        with self.assertRaises(ValueError):
+            Application(AsyncStoreFake(store_params=store_params_ok), router={**ASYNC_ROUTER, "score": score_handler})
+
+    def test_async_handler_real_score(self):
+        async def run():
+            store = AsyncStoreFake(store_params=store_params_ok)
+            await store.connect()
+            app = Application(store, router=ASYNC_ROUTER)
+            body = json.dumps(user_request({"phone": "79175002040", "email": "stupnikov@otus.ru"})).encode()
+            try:
+                return await app.handle_async("POST", "/score", {}, body)
+            finally:
+                await store.close()
+
+        response = asyncio.run(run())
+        self.assertEqual(StatusCodes.OK, response.code)
+        self.assertEqual({"score": 3.0}, json.loads(response.body)["response"])
+
+
+if __name__ == "__main__":
+    unittest.main()
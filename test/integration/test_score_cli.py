@@ -0,0 +1,55 @@
+import io
+import json
+import unittest
+
+from score_cli import Progress, read_csv, read_jsonl, run_pipeline
+from scoring import compute_score
+
+RECORDS = [
+    {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+    {"first_name": "a", "last_name": "b"},
+    {"phone": "89175002040"},
+    {"gender": 1, "birthday": "01.01.2000"},
+    {},
+]
+
+
+class TestScoreCli(unittest.TestCase):
+    def run_records(self, records, **kwargs):
+        results = []
+        stats = run_pipeline(records, results.append, jobs=2, chunk_size=2, window=2, progress=Progress(), **kwargs)
+        return results, stats
+
+    def test_ordered(self):
+        lines = io.StringIO("\n".join(json.dumps(record) for record in RECORDS * 20) + "\n{bad\n")
+        results, stats = self.run_records(read_jsonl(lines))
+
+        self.assertEqual(list(range(len(RECORDS) * 20 + 1)), [result["n"] for result in results])
+        self.assertEqual(3.0, results[0]["score"])
+        self.assertIn("error", results[2])
+        self.assertIn("invalid json", results[-1]["error"])
+        self.assertEqual({"records": 101, "errors": 21}, {k: stats[k] for k in ("records", "errors")})
+
+    def test_unordered(self):
+        records = list(enumerate(RECORDS * 20))
+        results, _ = self.run_records(iter(records), ordered=False)
+
+        self.assertEqual(sorted(n for n, _ in records), sorted(result["n"] for result in results))
+        for result in results:
+            record = records[result["n"]][1]
+            if "score" in result:
+                self.assertEqual(compute_score(**{"phone": None, "email": None, **record}), result["score"])
+
+    def test_read_csv(self):
+        stream = io.StringIO("id,phone,email,gender,birthday\n1,79175002040,,1,01.01.2000\n2,,x@y,,\n")
+        self.assertEqual(
+            [
+                (0, {"id": "1", "phone": "79175002040", "gender": 1, "birthday": "01.01.2000"}),
+                (1, {"id": "2", "email": "x@y"}),
+            ],
+            list(read_csv(stream)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import signal
+import socket
+import threading
+import time
+import unittest
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+from server import PreforkServer, ThreadPoolHTTPServer
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    delay = 0.2
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(self.delay)
+        with cls.lock:
+            cls.active -= 1
+
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestThreadPoolHTTPServer(unittest.TestCase):
+    workers = 2
+
+    def setUp(self):
+        SlowHandler.active = 0
+        SlowHandler.max_active = 0
+        self.server = ThreadPoolHTTPServer(("localhost", 0), SlowHandler, workers=self.workers)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://localhost:%s/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get(self, _):
+        with urllib.request.urlopen(self.url, timeout=5) as resp:
+            return resp.read()
+
+    def test_requests_are_concurrent_and_bounded(self):
+        n_requests = 4
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=n_requests) as ex:
+            results = list(ex.map(self.get, range(n_requests)))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([b"ok"] * n_requests, results)
+        self.assertEqual(self.workers, SlowHandler.max_active)
+        # 4 запроса по 0.2с в 2 потока ~ 0.4с, последовательно было бы 0.8с
+        self.assertLess(elapsed, n_requests * SlowHandler.delay)
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            ThreadPoolHTTPServer(("localhost", 0), SlowHandler, workers=0)
+
+
+class PidHandler(BaseHTTPRequestHandler):
+    # выставляется в init_worker после fork
+    worker_pid = None
+
+    def do_GET(self):
+        body = ("%s:%s" % (os.getpid(), self.worker_pid)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def init_pid_worker():
+    PidHandler.worker_pid = os.getpid()
+
+
+class TestPreforkServer(unittest.TestCase):
+    processes = 2
+
+    def setUp(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            self.port = sock.getsockname()[1]
+        self.url = "http://localhost:%s/" % self.port
+
+        self.master_pid = os.fork()
+        if self.master_pid == 0:
+            code = 0
+            try:
+                server = PreforkServer(("localhost", self.port), PidHandler, self.processes, init_worker=init_pid_worker)
+                server.serve_forever()
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+
+    def tearDown(self):
+        try:
+            os.kill(self.master_pid, signal.SIGTERM)
+            os.waitpid(self.master_pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def get_pid(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(self.url, timeout=1) as resp:
+                    pid, worker_pid = resp.read().decode("utf-8").split(":")
+                    self.assertEqual(pid, worker_pid)
+                    return int(pid)
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def test_workers_share_port_and_restart(self):
+        pids = {self.get_pid() for _ in range(30)}
+        self.assertEqual(self.processes, len(pids))
+        self.assertNotIn(self.master_pid, pids)
+
+        # упавший воркер перезапускается мастером
+        crashed = pids.pop()
+        os.kill(crashed, signal.SIGKILL)
+        deadline = time.monotonic() + 5
+        new_pids = set()
+        while not new_pids - pids - {crashed}:
+            self.assertLess(time.monotonic(), deadline)
+            new_pids.add(self.get_pid())
+        self.assertNotIn(crashed, new_pids)
+
+    def test_graceful_shutdown(self):
+        self.get_pid()
+        os.kill(self.master_pid, signal.SIGTERM)
+        _, status = os.waitpid(self.master_pid, 0)
+        self.assertEqual(0, os.waitstatus_to_exitcode(status))
+        with self.assertRaises(OSError):
+            urllib.request.urlopen(self.url, timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from test.support_functions import cases
+
+from access_log import (
+    LOG_RECORDS_DROPPED,
+    REDACTED,
+    BatchFileHandler,
+    BoundedQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    redact,
+    setup_logging,
+)
+
+
+def make_record(msg="POST /score", level=logging.INFO, access=None, exc_info=None):
+    record = logging.LogRecord("root", level, __file__, 1, msg, (), exc_info)
+    if access is not None:
+        record.access = access
+    return record
+
+
+class LogFileMixin:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "log.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_lines(self):
+        with open(self.filename, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+
+class TestAccessLog(LogFileMixin, unittest.TestCase):
+    def test_redact(self):
+        value = {"token": "secret", "login": "h&f", "items": [{"password": "p", "id": 1}], "nested": {"token": None}}
+
+        self.assertEqual(
+            {"token": REDACTED, "login": "h&f", "items": [{"password": REDACTED, "id": 1}], "nested": {"token": REDACTED}},
+            redact(value),
+        )
+        self.assertEqual("secret", value["token"])
+
+    def test_json_formatter(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            exc_info = sys.exc_info()
+        access = {"request_id": "1", "code": 500, "token": "secret", "error": ValueError("x")}
+        record = make_record(access=access, exc_info=exc_info)
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual("INFO", entry["level"])
+        self.assertEqual("POST /score", entry["msg"])
+        self.assertEqual(REDACTED, entry["token"])
+        self.assertEqual("x", entry["error"])
+        self.assertIn("ZeroDivisionError", entry["exc"])
+
+    @cases(
+        [
+            (make_record(access={"code": 200}), False),
+            (make_record(access={"code": 422}), True),
+            (make_record(access={"code": 500}), True),
+            (make_record(level=logging.WARNING, access={"code": 200}), True),
+            (make_record(), True),
+        ]
+    )
+    def test_sampling(self, record, logged):
+        self.assertEqual(logged, SamplingFilter(0.0).filter(record))
+        self.assertTrue(SamplingFilter(1.0).filter(record))
+
+    def test_sampling_rate(self):
+        values = iter([0.05, 0.5, 0.09, 0.95])
+        sampling = SamplingFilter(0.1, rand=lambda: next(values))
+
+        self.assertEqual([True, False, True, False], [sampling.filter(make_record(access={"code": 200})) for _ in range(4)])
+
+    def test_bounded_queue(self):
+        handler = BoundedQueueHandler(queue.SimpleQueue(), max_size=2)
+        dropped = LOG_RECORDS_DROPPED.collect().get((), 0)
+        for _ in range(3):
+            handler.handle(make_record())
+
+        self.assertEqual(2, handler.queue.qsize())
+        self.assertEqual(1, LOG_RECORDS_DROPPED.collect()[()] - dropped)
+
+    def test_batches(self):
+        handler = BatchFileHandler(self.filename, batch_size=3)
+        handler.setFormatter(JsonFormatter())
+        for _ in range(2):
+            handler.handle(make_record())
+        self.assertEqual(0, os.path.getsize(self.filename))
+
+        handler.handle(make_record())
+        self.assertEqual(3, len(self.read_lines()))
+        handler.handle(make_record())
+        handler.close()
+        self.assertEqual(4, len(self.read_lines()))
+
+
+class TestSetupLogging(LogFileMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = logging.getLogger()
+        self.handlers, self.level = self.root.handlers[:], self.root.level
+
+    def tearDown(self):
+        for handler in self.root.handlers[:]:
+            self.root.removeHandler(handler)
+        for handler in self.handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.level)
+        super().tearDown()
+
+    def test_pipeline(self):
+        listener = setup_logging(self.filename, sample_rate=0.0, params={"batch_size": 100})
+        try:
+            logging.info("%s %s", "/score", 200, extra={"access": {"code": 200}})
+            logging.info("%s %s", "/score", 403, extra={"access": {"code": 403, "token": "secret"}})
+            logging.warning("breaker open")
+        finally:
+            listener.stop()
+
+        lines = self.read_lines()
+        self.assertEqual(["/score 403", "breaker open"], [line["msg"] for line in lines])
+        self.assertEqual(REDACTED, lines[0]["token"])
+
+    def test_idle_flush(self):
+        listener = setup_logging(self.filename, params={"flush_interval": 0.01})
+        try:
+            logging.info("started")
+            deadline = time.monotonic() + 5
+            while not os.path.getsize(self.filename) and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            self.assertEqual("started", self.read_lines()[0]["msg"])
+        finally:
+            listener.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import unittest
+from email.message import Message
+from test.support_functions import cases
+
+from body_reader import MAX_LINE_SIZE, BodyError, BodyReader
+from config import StatusCodes
+
+
+def make_headers(**values):
+    headers = Message()
+    for name, value in values.items():
+        headers[name.replace("_", "-")] = value
+    return headers
+
+
+def chunked(*chunks, trailer=b""):
+    return b"".join(b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks) + b"0\r\n" + trailer + b"\r\n"
+
+
+class TestBodyReader(unittest.TestCase):
+    def setUp(self):
+        self.reader = BodyReader(max_size=100, retain_size=20)
+
+    def read(self, data, required=True, **headers):
+        rfile = io.BufferedReader(io.BytesIO(data + b"NEXT"), buffer_size=7)
+        body = bytes(self.reader.read(rfile, make_headers(**headers), required))
+        # следующий запрос соединения остаётся в потоке
+        self.assertEqual(b"NEXT", rfile.read())
+        return body
+
+    def read_async(self, data, required=True, **headers):
+        async def run():
+            stream = asyncio.StreamReader()
+            stream.feed_data(data)
+            stream.feed_eof()
+            return await self.reader.read_async(stream, make_headers(**headers), required)
+
+        return asyncio.run(run())
+
+    def test_content_length(self):
+        self.assertEqual(b'{"a": 1}', self.read(b'{"a": 1}', Content_Length="8"))
+        self.assertEqual(b"", self.read(b"", required=False))
+
+    def test_chunked(self):
+        data = chunked(b'{"a":', b" 1}", trailer=b"X-Trailer: 1\r\n")
+
+        self.assertEqual(b'{"a": 1}', self.read(data, Transfer_Encoding="chunked"))
+        self.assertEqual(b'{"a": 1}', self.read_async(data, Transfer_Encoding="chunked"))
+
+    def test_chunk_extensions(self):
+        self.assertEqual(b"abc", self.read(b"3;name=value\r\nabc\r\n0\r\n\r\n", Transfer_Encoding="Chunked"))
+        self.assertEqual(b"abc", self.read(b"03 ;name\r\nabc\r\n0\r\n\r\n", Transfer_Encoding="Chunked"))
+        self.assertEqual(b"a" * 10, self.read(b"A\r\n" + b"a" * 10 + b"\r\n0\r\n\r\n", Transfer_Encoding="Chunked"))
+
+    @cases(
+        [
+            ({}, StatusCodes.LENGTH_REQUIRED),
+            ({"Content_Length": "abc"}, StatusCodes.BAD_REQUEST),
+            ({"Content_Length": "-1"}, StatusCodes.BAD_REQUEST),
+            ({"Content_Length": "+1"}, StatusCodes.BAD_REQUEST),
+            ({"Content_Length": "1_0"}, StatusCodes.BAD_REQUEST),
+            # "²" - цифра для str.isdigit(), но не для int()
+            ({"Content_Length": "\xb2"}, StatusCodes.BAD_REQUEST),
+            ({"Content_Length": "101"}, StatusCodes.PAYLOAD_TOO_LARGE),
+            ({"Transfer_Encoding": "gzip"}, StatusCodes.NOT_IMPLEMENTED),
+        ]
+    )
+    def test_headers_rejected(self, headers, code):
+        # тело не читается
+        rfile = io.BytesIO(b"x" * 200)
+        with self.assertRaises(BodyError) as error:
+            self.reader.read(rfile, make_headers(**headers))
+
+        self.assertEqual(code, error.exception.code)
+        self.assertEqual(0, rfile.tell())
+
+    @cases(
+        [
+            (chunked(b"x" * 60, b"y" * 41), StatusCodes.PAYLOAD_TOO_LARGE),
+            (b"zz\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"0x2\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"+2\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"0_2\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b" 2\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"2 \r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b";a=b\r\nab\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"2\r\nabc\r\n0\r\n\r\n", StatusCodes.BAD_REQUEST),
+            (b"2\r\nab\r\n0\r\n", StatusCodes.BAD_REQUEST),
+            (b"1" * (MAX_LINE_SIZE + 1), StatusCodes.BAD_REQUEST),
+        ]
+    )
+    def test_chunked_rejected(self, data, code):
+        with self.assertRaises(BodyError) as error:
+            self.reader.read(io.BytesIO(data), make_headers(Transfer_Encoding="chunked"))
+        self.assertEqual(code, error.exception.code)
+
+        with self.assertRaises(BodyError) as error:
+            self.read_async(data, Transfer_Encoding="chunked")
+        self.assertEqual(code, error.exception.code)
+
+    def test_incomplete_body(self):
+        with self.assertRaises(BodyError) as error:
+            self.reader.read(io.BytesIO(b"5\r\nab"), make_headers(Transfer_Encoding="chunked"))
+        self.assertEqual(StatusCodes.BAD_REQUEST, error.exception.code)
+
+        # клиент закрыл соединение - async сервер просто закрывает его
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.read_async(b"ab", Content_Length="5")
+
+    def test_chunked_stops_early(self):
+        rfile = io.BytesIO(chunked(b"x" * 90, b"y" * 90))
+        with self.assertRaises(BodyError):
+            self.reader.read(rfile, make_headers(Transfer_Encoding="chunked"))
+
+        # вторая часть не прочитана: только строки размеров и первая часть
+        self.assertEqual(100, rfile.tell())
+
+    def test_buffer_reuse(self):
+        self.read(b"x" * 10, Content_Length="10")
+        buffer = self.reader.buffer
+        self.read(b"y" * 8, Content_Length="8")
+        self.assertIs(buffer, self.reader.buffer)
+
+        self.read(chunked(b"a" * 30, b"b" * 30), Transfer_Encoding="chunked")
+        self.assertGreaterEqual(len(self.reader.buffer), 60)
+        # большой буфер не держится для маленьких запросов
+        self.assertEqual(b"z" * 5, self.read(b"z" * 5, Content_Length="5"))
+        self.assertEqual(5, len(self.reader.buffer))
+
+    def test_body_view(self):
+        body = self.reader.read(io.BytesIO(b"abc"), make_headers(Content_Length="3"))
+
+        self.assertIsInstance(body, memoryview)
+        self.assertEqual(b"abc", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
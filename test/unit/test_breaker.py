@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+
+from redis.exceptions import ConnectionError, ResponseError
+
+from config import store_params_fail
+from db.breaker import CircuitBreaker, CircuitOpenError
+from db.store import Store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("cache", failure_threshold=2, reset_timeout=5, clock=self.clock)
+
+    def trip(self):
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.breaker.call(fail)
+
+    def test_opens_after_threshold(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+
+    def test_success_resets_failures(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual("ok", self.breaker.call(lambda: "ok"))
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_open_rejects_without_call(self):
+        self.trip()
+        calls = []
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(calls.append, 1)
+        self.assertEqual([], calls)
+        self.assertEqual(1, self.breaker.stats()["rejected"])
+
+    def test_half_open_success_closes(self):
+        self.trip()
+        self.clock.now = 5
+
+        self.assertEqual("ok", self.breaker.call(lambda: "ok"))
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_late_success_keeps_open(self):
+        # вызов начат до размыкания и завершился успешно уже в OPEN
+        self.breaker.before_call()
+        self.trip()
+        self.breaker.record_success()
+
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "ok")
+
+    def test_half_open_failure_reopens(self):
+        self.trip()
+        self.clock.now = 5
+
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "ok")
+
+    def test_half_open_limits_trial_calls(self):
+        self.trip()
+        self.clock.now = 5
+        self.breaker.before_call()
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "ok")
+
+    def test_other_errors_are_not_failures(self):
+        def bad_command():
+            raise ResponseError("WRONGTYPE")
+
+        for _ in range(3):
+            with self.assertRaises(ResponseError):
+                self.breaker.call(bad_command)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_stats(self):
+        self.trip()
+
+        stats = self.breaker.stats()
+        self.assertEqual({"state": "open", "state_code": 2, "failures": 2, "opened": 1, "rejected": 0}, stats)
+
+
+class TestStoreBreaker(unittest.TestCase):
+    def setUp(self):
+        self.store = Store(
+            store_params=store_params_fail,
+            pool_params={"prewarm": 0},
+            breaker_params={"failure_threshold": 1, "reset_timeout": 60},
+        )
+
+    def test_open_cache_breaker_returns_miss(self):
+        self.assertEqual(None, self.store.get_cache("foo"))
+        self.assertEqual("open", self.store.breaker_stats()["cache"]["state"])
+
+        self.store.r = mock.Mock()
+        self.assertEqual(None, self.store.get_cache("foo"))
+        self.assertEqual([None, None], self.store.get_cache_many(["foo", "bar"]))
+        self.assertEqual(None, self.store.set_cache("foo", 1, 10))
+        # Redis больше не вызывается
+        self.assertEqual([], self.store.r.method_calls)
+
+    def test_breakers_are_separate(self):
+        self.store.get_cache("foo")
+
+        self.assertEqual("closed", self.store.breaker_stats()["persistent"]["state"])
+        with self.assertRaises(ConnectionError):
+            self.store.get("foo")
+        self.assertEqual("open", self.store.breaker_stats()["persistent"]["state"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from db.cache import LocalCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLocalCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LocalCache(max_entries=3, default_ttl=10, clock=self.clock)
+
+    def test_get_set(self):
+        self.cache.set("uid:1", 1.5)
+
+        self.assertEqual(1.5, self.cache.get("uid:1"))
+        self.assertEqual(None, self.cache.get("uid:2"))
+        self.assertEqual({"hits": 1, "misses": 1}, {k: self.cache.stats()[k] for k in ("hits", "misses")})
+
+    def test_ttl(self):
+        self.cache.set("short", "a", ttl=1)
+        self.cache.set("default", "b")
+
+        self.clock.now = 1
+        self.assertEqual(None, self.cache.get("short"))
+        self.assertEqual("b", self.cache.get("default"))
+
+        self.clock.now = 10
+        self.assertEqual(None, self.cache.get("default"))
+        self.assertEqual(2, self.cache.stats()["expirations"])
+        self.assertEqual(0, self.cache.stats()["entries"])
+
+    def test_lru_eviction(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        # "a" становится самым свежим, вытесняется "b"
+        self.cache.get("a")
+        self.cache.set("d", "d")
+
+        self.assertEqual(None, self.cache.get("b"))
+        self.assertEqual(["a", "c", "d"], sorted(self.cache.entries))
+        self.assertEqual(1, self.cache.stats()["evictions"])
+
+    def test_memory_budget(self):
+        entry_size = LocalCache.entry_size("k0", "x" * 100)
+        cache = LocalCache(max_entries=100, max_bytes=entry_size * 2, clock=self.clock)
+        for i in range(3):
+            cache.set(f"k{i}", "x" * 100)
+
+        stats = cache.stats()
+        self.assertEqual(2, stats["entries"])
+        self.assertLessEqual(stats["bytes"], cache.max_bytes)
+        self.assertEqual(None, cache.get("k0"))
+
+        # запись больше бюджета не кэшируется
+        cache.set("huge", "x" * entry_size * 2)
+        self.assertEqual(None, cache.get("huge"))
+
+    def test_overwrite_and_delete(self):
+        self.cache.set("a", "x" * 10)
+        self.cache.set("a", "y")
+        self.assertEqual("y", self.cache.get("a"))
+        self.assertEqual(LocalCache.entry_size("a", "y"), self.cache.stats()["bytes"])
+
+        self.cache.delete("a")
+        self.assertEqual(0, self.cache.stats()["bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
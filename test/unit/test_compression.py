@@ -0,0 +1,96 @@
+import gzip
+import json
+import unittest
+import zlib
+from test.support_functions import cases
+
+import compression
+from app import Response
+from compression import Compressor, parse_accept_encoding
+
+
+def large_body(size=4096):
+    # ответ interests: много client_id с повторяющимися интересами
+    interests = {str(n): ["travel", "sport", "books"] for n in range(size // 30)}
+    return json.dumps({"response": interests, "code": 200}).encode("utf-8")
+
+
+class TestCompressor(unittest.TestCase):
+    def setUp(self):
+        self.compressor = Compressor(min_size=1024, level=6, encodings=("gzip", "deflate"))
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            {"gzip": 1.0, "deflate": 0.5, "br": 0.0, "*": 0.1},
+            parse_accept_encoding("x-gzip, deflate;q=0.5, BR;q=0 ,*;q=0.1, "),
+        )
+
+    @cases(
+        [
+            (None, None),
+            ("", None),
+            ("identity", None),
+            ("br", None),
+            ("gzip", "gzip"),
+            ("deflate", "deflate"),
+            ("deflate, gzip", "gzip"),
+            ("gzip;q=0.5, deflate", "deflate"),
+            ("gzip;q=0, deflate;q=0", None),
+            ("*", "gzip"),
+            ("*, gzip;q=0", "deflate"),
+            ("gzip;q=abc, deflate;q=0.1", "deflate"),
+        ]
+    )
+    def test_negotiate(self, accept_encoding, expected):
+        self.assertEqual(expected, self.compressor.negotiate(accept_encoding))
+
+    @cases([("gzip", gzip.decompress), ("deflate", zlib.decompress)])
+    def test_compress(self, encoding, decompress):
+        body = large_body()
+        response = self.compressor.compress(Response(200, body), encoding)
+
+        self.assertEqual(body, decompress(response.body))
+        self.assertLess(len(response.body), len(body) // 4)
+        headers = dict(response.headers)
+        self.assertEqual(encoding, headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", headers["Vary"])
+        self.assertEqual(str(len(response.body)), headers["Content-Length"])
+
+    def test_small_response(self):
+        body = json.dumps({"response": {"score": 5.0}, "code": 200}).encode("utf-8")
+        response = self.compressor.compress(Response(200, body), "gzip")
+
+        self.assertEqual(body, response.body)
+        self.assertEqual([], response.extra_headers)
+
+    def test_not_accepted(self):
+        body = large_body()
+        response = self.compressor.compress(Response(200, body), "identity")
+
+        self.assertEqual(body, response.body)
+        self.assertEqual([("Vary", "Accept-Encoding")], response.extra_headers)
+
+    def test_incompressible(self):
+        body = bytes(range(256)) * 2 + gzip.compress(large_body())
+        response = self.compressor.compress(Response(200, body), "gzip")
+
+        self.assertEqual(body, response.body)
+        self.assertNotIn("Content-Encoding", dict(response.headers))
+
+    def test_metrics(self):
+        saved = compression.COMPRESSION_SAVED.collect().get(("deflate",), 0)
+        size = compression.COMPRESSION_INPUT.collect().get(("deflate",), 0)
+        body = large_body()
+        response = self.compressor.compress(Response(200, body), "deflate")
+
+        self.assertEqual(len(body) - len(response.body), compression.COMPRESSION_SAVED.collect()[("deflate",)] - saved)
+        self.assertEqual(len(body), compression.COMPRESSION_INPUT.collect()[("deflate",)] - size)
+        self.assertIn(("deflate",), compression.COMPRESSION_CPU.collect())
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            Compressor(encodings=("br",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from test.support_functions import cases
+
+import json_codec
+from json_codec import BACKENDS, get_backend
+
+BACKEND_NAMES = sorted(BACKENDS)
+
+
+class TestJSONCodec(unittest.TestCase):
+    @cases(BACKEND_NAMES)
+    def test_round_trip(self, name):
+        backend = get_backend(name)
+        value = {"account": "horns&hoofs", "arguments": {"gender": 1, "score": 4.5, "ids": [1, 2]}, "ok": True, "none": None}
+
+        self.assertEqual(value, backend.loads(backend.dumps(value)))
+        self.assertEqual(value, backend.loads(backend.dumps_bytes(value)))
+        self.assertEqual(value, backend.loads(memoryview(backend.dumps_bytes(value))))
+
+    @cases(BACKEND_NAMES)
+    def test_same_output(self, name):
+        # компактный вывод, UTF-8 без экранирования, int ключи -> строки
+        value = {"response": {1: ["книги"], 2: []}, "code": 200}
+
+        self.assertEqual('{"response":{"1":["книги"],"2":[]},"code":200}', get_backend(name).dumps(value))
+        self.assertEqual(get_backend("json").dumps_bytes(value), get_backend(name).dumps_bytes(value))
+
+    @cases([(name, data) for name in BACKEND_NAMES for data in ("", "{", "{'a': 1}", b"\xff")])
+    def test_bad_json(self, name, data):
+        with self.assertRaises(ValueError):
+            get_backend(name).loads(data)
+
+    @cases(BACKEND_NAMES)
+    def test_not_serializable(self, name):
+        with self.assertRaises(TypeError):
+            get_backend(name).dumps({"value": object()})
+
+    @cases([(name, value) for name in BACKEND_NAMES for value in (2**70, -(2**70), 2**64 - 1)])
+    def test_big_int(self, name, value):
+        self.assertEqual(f'{{"a":{value}}}', get_backend(name).dumps({"a": value}))
+        self.assertEqual(f'{{"a":{value}}}'.encode(), get_backend(name).dumps_bytes({"a": value}))
+
+    def test_auto(self):
+        self.assertIs(BACKENDS.get("orjson", BACKENDS.get("ujson", BACKENDS["json"])), get_backend("auto"))
+        self.assertIs(json_codec.backend.loads, json_codec.loads)
+
+    @cases(["simplejson", "rapidjson", ""])
+    def test_unknown_backend(self, name):
+        with self.assertRaises(ValueError):
+            get_backend(name)
+
+
+@unittest.skipIf("orjson" not in BACKENDS, "orjson не установлен")
+class TestOrjsonDifferences(unittest.TestCase):
+    """Отличия orjson от json, описанные в json_codec."""
+
+    def setUp(self):
+        self.orjson = get_backend("orjson")
+        self.json = get_backend("json")
+
+    def test_big_int_loads_as_float(self):
+        data = '{"a":123456789012345678901234567890}'
+
+        self.assertEqual({"a": 123456789012345678901234567890}, self.json.loads(data))
+        self.assertIsInstance(self.orjson.loads(data)["a"], float)
+
+    @cases(["nan", "inf", "-inf"])
+    def test_non_finite_dumps_null(self, value):
+        self.assertEqual('{"a":null}', self.orjson.dumps({"a": float(value)}))
+
+    @cases(['{"a":NaN}', '{"a":Infinity}'])
+    def test_non_finite_not_loaded(self, data):
+        self.json.loads(data)
+        with self.assertRaises(ValueError):
+            self.orjson.loads(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from test.support_functions import cases
+
+from config import store_params_ok
+from db.codecs import EntryCodec, FloatCodec, JSONCodec
+from db.keys import HASHERS, KeyBuilder
+from db.store import StoreFake
+from scoring import get_score_key
+
+
+class TestKeyBuilder(unittest.TestCase):
+    def setUp(self):
+        self.keys = KeyBuilder("uid:", 1)
+
+    def test_format(self):
+        key = self.keys.build("79175002040", "a@b.ru")
+
+        self.assertTrue(key.startswith("uid:v1:"))
+        self.assertEqual(32, len(key) - len("uid:v1:"))
+
+    @cases([(("1", "23"), ("12", "3")), (("ab", ""), ("", "ab")), (("a:1", "b"), ("a", "1:b"))])
+    def test_part_boundaries(self, first, second):
+        self.assertNotEqual(self.keys.build(*first), self.keys.build(*second))
+
+    def test_normalization(self):
+        self.assertEqual(self.keys.build(79175002040, None), self.keys.build("79175002040", ""))
+        self.assertEqual(self.keys.build(" a ", 1), self.keys.build("a", "1"))
+        self.assertNotEqual(self.keys.build(0), self.keys.build(None))
+
+    def test_version(self):
+        other = KeyBuilder("uid:", 2)
+
+        self.assertNotEqual(self.keys.build("a"), other.build("a"))
+        self.assertEqual("uid:v2:*", other.pattern)
+
+    @cases(sorted(HASHERS))
+    def test_hashers(self, hasher):
+        keys = KeyBuilder("uid:", 1, hasher)
+
+        self.assertEqual(keys.build("a", "b"), keys.build("a", "b"))
+        self.assertNotEqual(keys.build("a", "b"), keys.build("b", "a"))
+
+    def test_score_key(self):
+        self.assertEqual(get_score_key(79175002040, "A@Otus.ru"), get_score_key("79175002040", "a@otus.ru"))
+        self.assertNotEqual(get_score_key("79175002040", "a@otus.ru"), get_score_key("7917500204", "0a@otus.ru"))
+
+
+class TestCodecs(unittest.TestCase):
+    @cases([3.0, 4.5, 0.1 + 0.2, 0])
+    def test_float(self, value):
+        self.assertEqual(float(value), FloatCodec.decode(FloatCodec.encode(value)))
+
+    def test_json(self):
+        value = {"1": ["books", "hi-tech"]}
+
+        self.assertEqual(value, JSONCodec.decode(JSONCodec.encode(value)))
+
+    def test_entry(self):
+        codec = EntryCodec(FloatCodec)
+        raw = codec.encode(4.5, 0.002, 1030.0)
+
+        self.assertEqual("e1|1030.000|0.002|4.5", raw)
+        self.assertEqual((4.5, 0.002, 1030.0), codec.decode(raw))
+        # микросекунды не округляются до 0
+        self.assertEqual(1.25e-06, codec.decode(codec.encode(4.5, 1.25e-06, 1030.0))[1])
+
+    def test_entry_plain_value(self):
+        codec = EntryCodec(FloatCodec)
+
+        self.assertEqual((3.0, 0.0, None), codec.decode("3"))
+        self.assertEqual((3.0, 0.0, None), codec.decode(b"3.0"))
+        self.assertEqual(None, codec.decode(None))
+
+    def test_entry_value_with_delimiter(self):
+        codec = EntryCodec(JSONCodec)
+
+        self.assertEqual(["a|b"], codec.decode(codec.encode(["a|b"], 0, 1.0))[0])
+
+
+class TestDeleteMatching(unittest.TestCase):
+    def test_delete_old_version(self):
+        store = StoreFake(store_params=store_params_ok)
+        old, new = KeyBuilder("test:", 1), KeyBuilder("test:", 2)
+        old_keys = [old.build(i) for i in range(3)]
+        for key in old_keys + [new.build(0)]:
+            store.set(key, 1)
+
+        self.assertEqual(3, store.delete_matching(old.pattern))
+        self.assertEqual([None] * 3, store.get_many(old_keys))
+        self.assertEqual("1", store.get(new.build(0)))
+        store.delete(new.build(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
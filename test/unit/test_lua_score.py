@@ -0,0 +1,179 @@
+import unittest
+from test.support_functions import cases
+from unittest import mock
+
+from redis.exceptions import NoScriptError, ResponseError
+
+import scoring
+from config import store_params_ok
+from db.cache import LocalCache
+from db.revalidate import is_stale
+from db.store import AsyncStoreFake, NullStore, StoreFake
+from scoring import (
+    SCORE_CODEC,
+    SCORE_POLICY,
+    SCORE_SCRIPT,
+    compute_score,
+    get_score,
+    get_score_async,
+    get_score_key,
+    get_score_script_args,
+    needs_refresh,
+)
+
+try:
+    # FakeRedis выполняет Lua только с lupa
+    import lupa
+except ImportError:
+    lupa = None
+
+ARGUMENTS = {"phone": "79175002040", "email": "stupnikov@otus.ru", "birthday": "01.01.2000", "gender": 1}
+
+
+class TestScoreScript(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok, scripts=(SCORE_SCRIPT,))
+        self.key = get_score_key(**ARGUMENTS)
+        self.store.r.delete(self.key)
+
+    def tearDown(self):
+        self.store.r.delete(self.key)
+
+    def test_script_args(self):
+        with mock.patch.object(scoring, "script_delta", 0.002):
+            args = get_score_script_args(**ARGUMENTS, now=1000.0)
+
+        self.assertEqual((60, "1", "1", "1", "0", 1.5, 1.5, 1.5, 0.5, "e1|1030.000|0.002|"), args)
+
+    def test_fallback_without_scripting(self):
+        # сервер без Lua (например, FakeRedis без lupa); скрипт загружается заново
+        self.store.scripts[SCORE_SCRIPT] = None
+        with mock.patch.object(self.store.r, "script_load", side_effect=ResponseError("unknown command")):
+            self.assertEqual(compute_score(**ARGUMENTS), get_score(self.store, **ARGUMENTS))
+        self.assertEqual(4.5, SCORE_CODEC.decode(self.store.r.get(self.key))[0])
+        # скрипт больше не вызывается
+        self.assertEqual(False, self.store.scripts[SCORE_SCRIPT])
+
+    def test_not_registered(self):
+        store = StoreFake(store_params=store_params_ok)
+
+        with mock.patch.object(store, "get_or_eval_cache") as get_or_eval_cache:
+            get_score(store, **ARGUMENTS)
+        get_or_eval_cache.assert_not_called()
+
+    def test_null_store(self):
+        self.assertEqual(4.5, get_score(NullStore(), **ARGUMENTS))
+
+    def test_evalsha(self):
+        self.store.scripts[SCORE_SCRIPT] = None
+        with mock.patch.object(self.store.r, "script_load", return_value="sha") as script_load, mock.patch.object(
+            self.store.r, "evalsha", return_value="4.5"
+        ) as evalsha:
+            self.assertEqual(4.5, get_score(self.store, **ARGUMENTS))
+            self.assertEqual(4.5, get_score(self.store, **ARGUMENTS))
+
+        script_load.assert_called_once_with(SCORE_SCRIPT)
+        self.assertEqual(("sha", 1, self.key), evalsha.call_args.args[:3])
+        self.assertEqual(get_score_script_args(**ARGUMENTS)[:-1], evalsha.call_args.args[3:-1])
+        self.assertEqual(2, evalsha.call_count)
+
+    def test_l1(self):
+        self.store.init_l1(LocalCache(), ("uid:",))
+        self.store.scripts[SCORE_SCRIPT] = "sha"
+        with mock.patch.object(self.store.r, "evalsha", return_value="4.5") as evalsha:
+            get_score(self.store, **ARGUMENTS)
+            get_score(self.store, **ARGUMENTS)
+
+        self.assertEqual(1, evalsha.call_count)
+
+    def test_reload_after_script_flush(self):
+        self.store.scripts[SCORE_SCRIPT] = "sha"
+        with mock.patch.object(self.store.r, "evalsha", side_effect=NoScriptError("NOSCRIPT")):
+            self.assertEqual(4.5, get_score(self.store, **ARGUMENTS))
+
+        self.assertEqual(None, self.store.scripts[SCORE_SCRIPT])
+
+
+@unittest.skipIf(lupa is None, "lupa не установлена: FakeRedis не выполняет Lua")
+class TestScoreScriptLua(unittest.TestCase):
+    """SCORE_SCRIPT выполняется в FakeRedis, без подмены evalsha."""
+
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok, scripts=(SCORE_SCRIPT,))
+        self.keys = []
+
+    def tearDown(self):
+        if self.keys:
+            self.store.r.delete(*self.keys)
+
+    @cases(
+        [
+            ARGUMENTS,
+            {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+            {"phone": "79175002040", "email": "stupnikov@otus.ru", "first_name": "a", "last_name": "b"},
+            {"phone": None, "email": None, "birthday": "01.01.2000", "gender": 0, "first_name": "a", "last_name": "b"},
+            {"phone": "79175002040", "email": None, "birthday": "01.01.2000"},
+        ]
+    )
+    def test_same_as_python(self, arguments):
+        key = get_score_key(**arguments)
+        self.keys.append(key)
+        self.store.r.delete(key)
+
+        self.assertEqual(compute_score(**arguments), float(get_score(self.store, **arguments)))
+        self.assertTrue(self.store.scripts[SCORE_SCRIPT])
+        self.assertEqual(compute_score(**arguments), SCORE_CODEC.decode(self.store.r.get(key))[0])
+        self.assertEqual(SCORE_POLICY.hard_ttl, self.store.r.ttl(key))
+
+    def test_needs_refresh_after_ttl(self):
+        # запись скрипта после мягкого TTL отдаётся устаревшей и перевычисляется, как запись из Python
+        key = get_score_key(**ARGUMENTS)
+        self.keys.append(key)
+        self.store.r.delete(key)
+        now = scoring.time.time()
+        get_score(self.store, **ARGUMENTS)
+
+        entry = SCORE_CODEC.decode(self.store.r.get(key))
+        self.assertEqual(4.5, entry[0])
+        self.assertAlmostEqual(now + SCORE_POLICY.ttl, entry[2], delta=1)
+        self.assertFalse(is_stale(entry[2], now=now))
+        self.assertTrue(needs_refresh(entry, SCORE_POLICY, now=entry[2] + 1))
+
+    def test_cached_value(self):
+        key = get_score_key(**ARGUMENTS)
+        self.keys.append(key)
+        self.store.r.set(key, "1.0")
+
+        # значение в кэше скрипт возвращает без пересчёта
+        self.assertEqual(1.0, float(get_score(self.store, **ARGUMENTS)))
+        self.assertEqual("1.0", self.store.r.get(key))
+
+
+class TestScoreScriptAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_fallback_without_scripting(self):
+        store = AsyncStoreFake(store_params=store_params_ok, scripts=(SCORE_SCRIPT,))
+        await store.connect()
+        store.scripts[SCORE_SCRIPT] = None
+
+        with mock.patch.object(store.r, "script_load", side_effect=ResponseError("unknown command")):
+            self.assertEqual(4.5, float(await get_score_async(store, **ARGUMENTS)))
+        self.assertEqual(False, store.scripts[SCORE_SCRIPT])
+        await store.r.delete(get_score_key(**ARGUMENTS))
+        await store.close()
+
+    @unittest.skipIf(lupa is None, "lupa не установлена: FakeRedis не выполняет Lua")
+    async def test_script(self):
+        store = AsyncStoreFake(store_params=store_params_ok, scripts=(SCORE_SCRIPT,))
+        await store.connect()
+        key = get_score_key(**ARGUMENTS)
+        await store.r.delete(key)
+
+        self.assertEqual(4.5, float(await get_score_async(store, **ARGUMENTS)))
+        self.assertTrue(store.scripts[SCORE_SCRIPT])
+        self.assertEqual(4.5, SCORE_CODEC.decode(await store.r.get(key))[0])
+        await store.r.delete(key)
+        await store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
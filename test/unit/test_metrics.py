@@ -0,0 +1,174 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from test.support_functions import cases
+
+from metrics import Registry, escape, format_labels, format_value
+
+
+def sample(text, line):
+    """значение строки метрики из текста /metrics"""
+    match = re.search("^" + re.escape(line) + r" (\S+)$", text, re.M)
+    return match and float(match.group(1))
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_threads(self):
+        counter = self.registry.counter("requests_total", "Requests", ("route",))
+
+        def work():
+            for _ in range(1000):
+                counter.inc("score")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc("batch", amount=5)
+
+        self.assertEqual({("score",): 8000, ("batch",): 5}, counter.collect())
+        self.assertEqual(8, len(counter.shards) - 1)
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, "get")
+
+        text = self.registry.render().decode()
+
+        self.assertEqual(2, sample(text, 'latency_seconds_bucket{op="get",le="0.1"}'))
+        self.assertEqual(3, sample(text, 'latency_seconds_bucket{op="get",le="1.0"}'))
+        self.assertEqual(4, sample(text, 'latency_seconds_bucket{op="get",le="+Inf"}'))
+        self.assertEqual(4, sample(text, 'latency_seconds_count{op="get"}'))
+        self.assertAlmostEqual(2.65, sample(text, 'latency_seconds_sum{op="get"}'))
+        self.assertIn("# TYPE latency_seconds histogram", text)
+
+    def test_gauge(self):
+        gauge = self.registry.gauge("in_flight", "In flight", ("route",))
+        gauge.inc("score")
+        # dec из другого потока - в его шард
+        thread = threading.Thread(target=gauge.dec, args=("score",))
+        thread.start()
+        thread.join()
+        gauge.inc("score")
+        gauge.set(7, "batch")
+
+        self.assertEqual({("score",): 1, ("batch",): 7}, gauge.collect())
+
+    def test_collectors(self):
+        gauge = self.registry.gauge("stats", "Stats", ("stat",))
+        stats = {"hits": 1}
+        self.registry.add_collector(lambda: gauge.set(stats["hits"], "hits"))
+        self.registry.add_collector(lambda: 1 / 0)
+        stats["hits"] = 3
+
+        self.assertEqual({("hits",): 3}, self.registry.snapshot()["stats"])
+
+    def test_duplicate(self):
+        self.registry.counter("requests_total", "Requests")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("requests_total", "Requests")
+
+    @cases([(1, "1"), (0.5, "0.5"), (float("inf"), "+Inf"), (True, "1")])
+    def test_format_value(self, value, expected):
+        self.assertEqual(expected, format_value(value))
+
+    def test_format_labels(self):
+        self.assertEqual("", format_labels((), ()))
+        self.assertEqual('{path="a\\"b\\\\c\\n"}', format_labels(("path",), ('a"b\\c\n',)))
+        self.assertEqual("a\\nb", escape("a\nb"))
+
+
+class TestMultiprocess(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = Registry()
+        self.counter = self.registry.counter("requests_total", "Requests", ("route",))
+        self.gauge = self.registry.gauge("in_flight", "In flight")
+        self.state = self.registry.gauge("state", "State", aggregate="max")
+        self.histogram = self.registry.histogram("latency_seconds", "Latency", buckets=(1.0,))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_worker(self, state):
+        # снимок завершившегося процесса-воркера
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.counter.inc("score", amount=2)
+                self.gauge.inc(amount=10)
+                self.state.set(state)
+                self.histogram.observe(0.5)
+                self.registry.stop_flusher()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        return pid
+
+    def test_set_directory_clears(self):
+        with open(os.path.join(self.directory, "1-1.json"), "w") as f:
+            f.write("{}")
+        self.registry.set_directory(self.directory)
+
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_merge(self):
+        self.registry.set_directory(self.directory)
+        dead_pid = self.run_worker(state=2)
+        self.counter.inc("score")
+        self.gauge.inc()
+        self.state.set(1)
+        self.histogram.observe(2.0)
+
+        merged = self.registry.collect()
+
+        self.assertEqual(1, sum(name.startswith(f"{dead_pid}-") for name in os.listdir(self.directory)))
+        # счётчики умершего воркера сохраняются, gauge - нет
+        self.assertEqual({("score",): 3}, merged["requests_total"])
+        self.assertEqual({(): [1, 1, 2.5]}, merged["latency_seconds"])
+        self.assertEqual({(): 1}, merged["in_flight"])
+        self.assertEqual({(): 1}, merged["state"])
+
+    def test_reused_pid(self):
+        # снимок умершего процесса с тем же pid не перезаписывается и считается умершим
+        self.registry.set_directory(self.directory)
+        with open(os.path.join(self.directory, f"{os.getpid()}-1.json"), "w") as f:
+            f.write('{"requests_total": [[["score"], 5]], "in_flight": [[[], 7]]}')
+        self.counter.inc("score")
+        self.gauge.inc()
+
+        merged = self.registry.collect()
+
+        self.assertEqual(2, len(os.listdir(self.directory)))
+        self.assertEqual({("score",): 6}, merged["requests_total"])
+        self.assertEqual({(): 1}, merged["in_flight"])
+
+    def test_max_aggregate(self):
+        self.registry.set_directory(self.directory)
+        self.state.set(1)
+        snapshot = self.registry.snapshot()
+        other = {"state": {(): 2}}
+
+        merged = self.registry.merge_snapshots([(os.getpid(), True, snapshot), (1, True, other)])
+
+        self.assertEqual({(): 2}, merged["state"])
+
+    def test_broken_snapshot(self):
+        self.registry.set_directory(self.directory)
+        with open(os.path.join(self.directory, "123-1.json"), "w") as f:
+            f.write("{broken")
+        self.counter.inc("score")
+
+        self.assertEqual({("score",): 1}, self.registry.collect()["requests_total"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from config import store_params_ok
+from db.revalidate import (
+    AsyncRevalidator,
+    CachePolicy,
+    Revalidator,
+    get_policy,
+    is_stale,
+    needs_refresh,
+    xfetch,
+)
+from db.store import AsyncStoreFake, StoreFake
+from scoring import (
+    SCORE_CODEC,
+    SCORE_POLICY,
+    get_score,
+    get_score_async,
+    get_score_key,
+    get_scores,
+    revalidate_score,
+)
+
+ARGUMENTS = {"phone": "79175002040", "email": "swr@otus.ru"}
+
+
+class TestCachePolicy(unittest.TestCase):
+    POLICIES = {
+        "": {"ttl": 10},
+        "uid:": {"ttl": 30, "grace": 30, "beta": 1.0},
+        "uid:vip:": {"ttl": 300, "grace": 60, "beta": 0},
+    }
+
+    @staticmethod
+    def describe(policy):
+        return policy.ttl, policy.grace, policy.beta, policy.hard_ttl
+
+    def test_longest_prefix(self):
+        self.assertEqual((300, 60, 0, 360), self.describe(get_policy("uid:vip:1", self.POLICIES)))
+        self.assertEqual((30, 30, 1.0, 60), self.describe(get_policy("uid:1", self.POLICIES)))
+        self.assertEqual((10, 0, 1.0, 10), self.describe(get_policy("i:1", self.POLICIES)))
+
+    def test_default_policy(self):
+        self.assertEqual(30, get_policy("unknown", {}).ttl)
+
+
+class TestIsStale(unittest.TestCase):
+    def test_is_stale(self):
+        self.assertFalse(is_stale(1030, now=1029))
+        self.assertTrue(is_stale(1030, now=1030))
+        self.assertFalse(is_stale(None, now=10**10))
+
+
+class TestXFetch(unittest.TestCase):
+    def test_early_refresh_probability(self):
+        # delta=1, beta=1: при rand=0.9 пересчёт начинается за ~2.3 с до истечения
+        self.assertTrue(xfetch(1.0, 1002, 1.0, now=1000, rand=lambda: 0.9))
+        self.assertFalse(xfetch(1.0, 1002, 1.0, now=1000, rand=lambda: 0.5))
+
+    def test_realistic_delta(self):
+        # пересчёт с round trip в Redis ~2 мс: за 1 мс до истечения XFetch срабатывает в ~60% случаев (1 - e^-0.5)
+        rand = iter(i / 1000 for i in range(1000)).__next__
+        fired = sum(xfetch(0.002, 1000.0, beta=1.0, now=999.999, rand=rand) for _ in range(1000))
+
+        self.assertTrue(550 < fired < 650, fired)
+
+    def test_disabled(self):
+        self.assertFalse(xfetch(1.0, 1001, 0, now=1000, rand=lambda: 0.99))
+        self.assertFalse(xfetch(1.0, None, 1.0, now=1000, rand=lambda: 0.99))
+
+    def test_needs_refresh(self):
+        policy = CachePolicy(ttl=30, grace=30, beta=0)
+
+        self.assertTrue(needs_refresh((1.5, 0, 1000), policy, now=1000))
+        self.assertFalse(needs_refresh((1.5, 0, 1000), policy, now=999))
+
+
+class TestRevalidator(unittest.TestCase):
+    def test_one_refresh_per_key(self):
+        revalidator = Revalidator()
+        release = threading.Event()
+        calls = []
+
+        def refresh(value):
+            release.wait(5)
+            calls.append(value)
+
+        self.assertTrue(revalidator.submit("uid:1", refresh, 1))
+        self.assertFalse(revalidator.submit("uid:1", refresh, 2))
+        release.set()
+        revalidator.close()
+
+        self.assertEqual([1], calls)
+        self.assertEqual({"refreshed": 1, "skipped": 1, "errors": 0, "pending": 0}, revalidator.stats())
+
+    def test_errors_counted(self):
+        revalidator = Revalidator()
+
+        def refresh():
+            raise ValueError("boom")
+
+        revalidator.submit("uid:1", refresh)
+        revalidator.close()
+
+        self.assertEqual(1, revalidator.errors)
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok)
+        self.key = get_score_key(**ARGUMENTS)
+
+    def tearDown(self):
+        self.store.r.delete(self.key)
+
+    def test_stale_value_served_and_refreshed(self):
+        self.store.set_cache(self.key, SCORE_CODEC.encode(5.0, 0, expires_at=0), SCORE_POLICY.hard_ttl)
+
+        self.assertEqual(5.0, get_score(self.store, **ARGUMENTS))
+        self.store.revalidator.close()
+
+        value, _, expires_at = SCORE_CODEC.decode(self.store.r.get(self.key))
+        self.assertEqual(3.0, value)
+        self.assertFalse(is_stale(expires_at))
+        self.assertEqual(1, self.store.revalidator.refreshed)
+
+    def test_fresh_value_not_refreshed(self):
+        self.store.set_cache(self.key, SCORE_CODEC.encode(5.0, 0, expires_at=time.time() + 30), SCORE_POLICY.hard_ttl)
+
+        self.assertEqual(5.0, get_score(self.store, **ARGUMENTS))
+        self.assertEqual(0, len(self.store.revalidator.pending) + self.store.revalidator.refreshed)
+
+    def test_delta_includes_store_round_trip(self):
+        get_cache = self.store.get_cache
+
+        def slow_get_cache(key, local=True):
+            time.sleep(0.005)
+            return get_cache(key, local)
+
+        self.store.get_cache = slow_get_cache
+        get_score(self.store, **ARGUMENTS)
+        _, delta, expires_at = SCORE_CODEC.decode(self.store.r.get(self.key))
+
+        self.assertGreaterEqual(delta, 0.005)
+        # за 10 мс до истечения такая запись может быть пересчитана заранее
+        self.assertTrue(xfetch(delta, expires_at, SCORE_POLICY.beta, now=expires_at - 0.01, rand=lambda: 0.9))
+
+    def test_revalidation_skipped_if_refreshed(self):
+        fresh = SCORE_CODEC.encode(4.0, 0.001, expires_at=time.time() + 30)
+        self.store.r.set(self.key, fresh)
+        # запись, которую видел запрос, истекала в 0; другой процесс её уже обновил
+        self.assertEqual(4.0, revalidate_score(self.store, self.key, 0.0, *ARGUMENTS.values()))
+        self.assertEqual(fresh, self.store.r.get(self.key))
+
+        self.store.r.set(self.key, SCORE_CODEC.encode(5.0, 0, expires_at=0))
+        self.assertEqual(3.0, revalidate_score(self.store, self.key, 0.0, *ARGUMENTS.values()))
+        self.assertFalse(is_stale(SCORE_CODEC.decode(self.store.r.get(self.key))[2]))
+
+    def test_batch_delta(self):
+        get_scores(self.store, [ARGUMENTS])
+
+        self.assertGreater(SCORE_CODEC.decode(self.store.r.get(self.key))[1], 0)
+
+    def test_entry_ttl(self):
+        get_score(self.store, **ARGUMENTS)
+
+        self.assertTrue(SCORE_POLICY.ttl < self.store.r.ttl(self.key) <= SCORE_POLICY.hard_ttl)
+
+
+class TestStaleWhileRevalidateAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_stale_value_served_and_refreshed(self):
+        store = AsyncStoreFake(store_params=store_params_ok)
+        key = get_score_key(**ARGUMENTS)
+        await store.set_cache(key, SCORE_CODEC.encode(5.0, 0, expires_at=0), SCORE_POLICY.hard_ttl)
+
+        self.assertEqual(5.0, await get_score_async(store, **ARGUMENTS))
+        await store.revalidator.close()
+
+        self.assertEqual(3.0, SCORE_CODEC.decode(await store.r.get(key))[0])
+        await store.r.delete(key)
+        await store.close()
+
+    async def test_one_refresh_per_key(self):
+        revalidator = AsyncRevalidator()
+
+        async def refresh():
+            await asyncio.sleep(0.01)
+
+        self.assertTrue(revalidator.submit("uid:1", refresh))
+        self.assertFalse(revalidator.submit("uid:1", refresh))
+        await revalidator.close()
+
+        self.assertEqual(1, revalidator.refreshed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from config import store_params_ok
+from db.singleflight import AsyncSingleFlight, SingleFlight
+from db.store import AsyncStoreFake, StoreFake
+from scoring import get_score, get_score_async, get_score_key
+
+ARGUMENTS = {"phone": "79175002040", "email": "flight@otus.ru"}
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def slow(self, value):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return value
+
+    def run_concurrently(self, n, fn):
+        with ThreadPoolExecutor(n) as executor:
+            first = executor.submit(self.flight.do, "key", fn, 42)
+            self.started.wait(5)
+            others = [executor.submit(self.flight.do, "key", fn, 42) for _ in range(n - 1)]
+            # ожидающие потоки зарегистрированы, когда их стало n - 1
+            while self.flight.coalesced < n - 1:
+                threading.Event().wait(0.001)
+            self.release.set()
+            return [first] + others
+
+    def test_coalesce(self):
+        futures = self.run_concurrently(5, self.slow)
+
+        self.assertEqual([42] * 5, [future.result() for future in futures])
+        self.assertEqual(1, self.calls)
+        self.assertEqual({"leaders": 1, "coalesced": 4, "in_flight": 0}, self.flight.stats())
+
+    def test_error_shared(self):
+        def fail(value):
+            self.slow(value)
+            raise ValueError("boom")
+
+        futures = self.run_concurrently(3, fail)
+
+        errors = [future.exception() for future in futures]
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+        self.assertEqual(1, self.calls)
+        # у ожидающих - свои экземпляры исключения первого вызова
+        self.assertEqual(3, len(set(map(id, errors))))
+        self.assertTrue(all(error.__cause__ is errors[0] for error in errors[1:]))
+
+    def test_not_cached(self):
+        self.release.set()
+        self.flight.do("key", self.slow, 1)
+        self.flight.do("key", self.slow, 2)
+
+        self.assertEqual(2, self.calls)
+        self.assertEqual(0, self.flight.coalesced)
+
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesce(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(*(flight.do("key", slow, 42) for _ in range(5)))
+
+        self.assertEqual([42] * 5, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual({"leaders": 1, "coalesced": 4, "in_flight": 0}, flight.stats())
+
+    async def test_error_shared(self):
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(3, len(set(map(id, results))))
+        self.assertTrue(all(result.__cause__ is results[0] for result in results[1:]))
+        self.assertEqual(2, flight.coalesced)
+
+    async def test_leader_cancelled(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value
+
+        leader = asyncio.create_task(flight.do("key", slow, 42))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flight.do("key", slow, 42)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        # ожидающие получают результат повторного вызова, а не CancelledError
+        self.assertEqual([42] * 3, await asyncio.gather(*waiters))
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(2, len(calls))
+        self.assertEqual(2, flight.leaders)
+        # каждый ожидающий считается один раз, новый первый вызов - не ожидающий
+        self.assertEqual(2, flight.coalesced)
+
+
+class TestScoreSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok)
+        self.key = get_score_key(**ARGUMENTS)
+        self.store.r.delete(self.key)
+
+    def tearDown(self):
+        self.store.r.delete(self.key)
+
+    def test_concurrent_misses_compute_once(self):
+        release = threading.Event()
+
+        def compute_score(*args):
+            release.wait(5)
+            return 3.0
+
+        with mock.patch("scoring.compute_score", side_effect=compute_score) as compute, ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(get_score, self.store, **ARGUMENTS) for _ in range(8)]
+            while self.store.flight.coalesced < 7:
+                threading.Event().wait(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual([3.0] * 8, results)
+        self.assertEqual(1, compute.call_count)
+
+
+class TestScoreSingleFlightAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_misses_compute_once(self):
+        store = AsyncStoreFake(store_params=store_params_ok)
+        key = get_score_key(**ARGUMENTS)
+        await store.r.delete(key)
+
+        with mock.patch("scoring.compute_score", return_value=3.0) as compute:
+            results = await asyncio.gather(*(get_score_async(store, **ARGUMENTS) for _ in range(5)))
+
+        self.assertEqual([3.0] * 5, results)
+        self.assertEqual(1, compute.call_count)
+        self.assertEqual(4, store.flight.coalesced)
+        await store.r.delete(key)
+        await store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,12 @@ import time
 import unittest
 from test.support_functions import start_test_redis, stop_test_redis
 
+from redis.backoff import ConstantBackoff
 from redis.exceptions import ConnectionError
 
 from config import store_params_fail, store_params_ok
-from db.store import Store, StoreFake
+from db.cache import LocalCache
+from db.store import DeadlineRetry, Store, StoreFake
 
 
 class TestStoreOK(unittest.TestCase):
@@ -78,6 +80,58 @@ class TestStoreOK(unittest.TestCase):
 
         self.assertEqual(None, val_get)
 
+    def test_get_many_ok(self):
+        self.store.r.set("1", "a")
+        self.store.r.set("3", "c")
+        keys = [1, 2, 3, 1]
+
+        self.assertEqual(["a", None, "c", "a"], self.store.get_many(keys))
+        self.assertEqual([], self.store.get_many([]))
+
+    def test_get_many_chunked(self):
+        keys = [str(i) for i in range(self.store.mget_chunk_size * 2 + 1)]
+        for key in keys:
+            self.store.r.set(key, key)
+
+        self.assertEqual(keys, self.store.get_many(keys))
+
+
+class TestStoreL1(unittest.TestCase):
+    def setUp(self):
+        self.l1 = LocalCache()
+        self.store = StoreFake(store_params=store_params_ok, l1_cache=self.l1, l1_prefixes=("uid:",))
+
+    def tearDown(self):
+        self.store.r.delete("uid:1", "uid:2", "other")
+
+    def test_cache_served_from_l1(self):
+        self.store.set_cache("uid:1", 1.5, 30)
+        # значение пропало из Redis, но ещё есть в L1
+        self.store.r.delete("uid:1")
+
+        self.assertEqual(1.5, self.store.get_cache("uid:1"))
+        self.assertEqual(1, self.l1.stats()["hits"])
+
+    def test_read_through(self):
+        self.store.r.set("uid:2", "3.0")
+        self.assertEqual("3.0", self.store.get_cache("uid:2"))
+        self.store.r.delete("uid:2")
+
+        self.assertEqual(["3.0", None], self.store.get_many(["uid:2", "uid:1"]))
+
+    def test_other_prefix_not_cached(self):
+        self.store.set_cache("other", "a", 30)
+        self.store.r.delete("other")
+
+        self.assertEqual(None, self.store.get_cache("other"))
+        self.assertEqual(0, self.l1.stats()["entries"])
+
+    def test_delete_invalidates(self):
+        self.store.set_cache("uid:1", 1.5, 30)
+        self.store.delete("uid:1")
+
+        self.assertEqual(None, self.store.get_cache("uid:1"))
+
 
 class TestStoreFail(unittest.TestCase):
     # execute before all tests
@@ -106,8 +160,76 @@ class TestStoreFail(unittest.TestCase):
         with self.assertRaises(ConnectionError):
             self.store.get(key_set)
 
+    def test_get_many_fail(self):
+        with self.assertRaises(ConnectionError):
+            self.store.get_many(["foo", "bar"])
+
     def test_get_cache_fail(self):
         key_set = "foo"
 
         val_get = self.store.get_cache(key_set)
         self.assertEqual(None, val_get)
+
+    def test_fails_fast(self):
+        started = time.monotonic()
+        self.assertEqual(None, self.store.get_cache("foo"))
+        self.assertEqual([None, None], self.store.get_cache_many(["foo", "bar"]))
+
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class TestStorePool(unittest.TestCase):
+    def test_pool_params_override(self):
+        store = StoreFake(store_params=store_params_ok, pool_params={"pool_size": 3, "prewarm": 0})
+
+        self.assertEqual(3, store.pool_params["pool_size"])
+        self.assertEqual(3, store.r.connection_pool.max_connections)
+
+    def test_prewarm(self):
+        store = StoreFake(store_params=store_params_ok, pool_params={"prewarm": 0})
+
+        self.assertEqual(2, store.prewarm(2))
+        self.assertEqual(2, len(store.r.connection_pool._available_connections))
+
+    def test_real_pool_is_bounded(self):
+        store = Store(store_params=store_params_fail, pool_params={"pool_size": 5, "pool_timeout": 0.01})
+
+        self.assertEqual(5, store.r.connection_pool.max_connections)
+        self.assertEqual(0.01, store.r.connection_pool.timeout)
+
+
+class TestDeadlineRetry(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def fail(self):
+        self.calls += 1
+        raise ConnectionError("down")
+
+    def test_retry_budget(self):
+        retry = DeadlineRetry(ConstantBackoff(0), retries=2, deadline=10)
+
+        with self.assertRaises(ConnectionError):
+            retry.call_with_retry(self.fail, lambda error: None)
+        self.assertEqual(3, self.calls)
+
+    def test_deadline(self):
+        retry = DeadlineRetry(ConstantBackoff(0.2), retries=100, deadline=0.5)
+
+        started = time.monotonic()
+        with self.assertRaises(ConnectionError):
+            retry.call_with_retry(self.fail, lambda error: None)
+        self.assertEqual(3, self.calls)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_success_after_retry(self):
+        results = iter([ConnectionError("down"), "ok"])
+
+        def do():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        retry = DeadlineRetry(ConstantBackoff(0), retries=2, deadline=1)
+        self.assertEqual("ok", retry.call_with_retry(do, lambda error: None))
@@ -0,0 +1,92 @@
+import asyncio
+import re
+import threading
+import unittest
+
+import timing
+
+
+class TestTiming(unittest.TestCase):
+    def tearDown(self):
+        self.assertIsNone(timing.current())
+
+    def test_no_timer(self):
+        @timing.timed("compute")
+        def compute():
+            return 42
+
+        with timing.stage("parse"):
+            timing.add("store", 1.0)
+        self.assertEqual(42, compute())
+
+    def test_stages(self):
+        @timing.timed("compute")
+        def compute(value):
+            return value * 2
+
+        timer, token = timing.start()
+        try:
+            with timing.stage("parse"):
+                pass
+            self.assertEqual(4, compute(2))
+            compute(3)
+            timing.add("store", 0.002)
+            timing.add("store", 0.003)
+        finally:
+            timing.finish(token)
+
+        self.assertEqual({"parse", "compute", "store"}, set(timer.stages))
+        self.assertAlmostEqual(0.005, timer.stages["store"])
+        self.assertEqual(5.0, timer.as_dict()["store"])
+        self.assertIn("total", timer.as_dict())
+
+    def test_error_is_timed(self):
+        timer, token = timing.start()
+        try:
+            with self.assertRaises(ValueError), timing.stage("parse"):
+                raise ValueError
+        finally:
+            timing.finish(token)
+
+        self.assertIn("parse", timer.stages)
+
+    def test_server_timing(self):
+        timer = timing.RequestTimer()
+        timer.add("parse", 0.0015)
+
+        header = timer.server_timing()
+
+        self.assertTrue(header.startswith("parse;dur=1.5, total;dur="))
+        self.assertRegex(header, re.compile(r"^(\w+;dur=[\d.]+)(, \w+;dur=[\d.]+)*$"))
+
+    def test_threads_are_isolated(self):
+        timer, token = timing.start()
+        try:
+            thread = threading.Thread(target=timing.add, args=("store", 1.0))
+            thread.start()
+            thread.join()
+        finally:
+            timing.finish(token)
+
+        # новый поток не наследует контекст запроса
+        self.assertEqual({}, timer.stages)
+
+    def test_tasks_are_isolated(self):
+        async def request(stage):
+            timer, token = timing.start()
+            try:
+                await asyncio.sleep(0)
+                timing.add(stage, 0.001)
+                await asyncio.sleep(0)
+                return timer.stages
+            finally:
+                timing.finish(token)
+
+        async def run():
+            return await asyncio.gather(request("parse"), request("store"))
+
+        self.assertEqual([{"parse": 0.001}, {"store": 0.001}], asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import datetime
+import hashlib
+import unittest
+from test.support_functions import cases
+
+from config import ADMIN_LOGIN, ADMIN_SALT, ClientStatus, accounts
+from fields.custom_errors import NoneError, ValidationError
+from validators import (
+    ClientsInterestsRequest,
+    MethodRequest,
+    OnlineScoreRequest,
+    admin_digest,
+    check_auth,
+    get_request_validator,
+    get_user_digest,
+)
+
+
+def make_request(account, login, token):
+    return get_request_validator(
+        {"account": account, "login": login, "token": token, "method": "online_score", "arguments": {}}
+    )
+
+
+class TestCheckAuth(unittest.TestCase):
+    def test_user_ok(self):
+        user = accounts["user"]
+        get_user_digest.cache_clear()
+
+        for _ in range(3):
+            self.assertEqual(ClientStatus.user, check_auth(make_request(user["account"], user["login"], user["token"])))
+        # sha512 посчитан один раз
+        self.assertEqual(1, get_user_digest.cache_info().misses)
+        self.assertEqual(2, get_user_digest.cache_info().hits)
+
+    def test_admin_ok(self):
+        info_for_hash_bytes = (datetime.datetime.now().strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
+        token = hashlib.sha512(info_for_hash_bytes).hexdigest()
+
+        self.assertEqual(ClientStatus.admin, check_auth(make_request("admin", ADMIN_LOGIN, token)))
+
+    def test_admin_digest_expires(self):
+        admin_digest.expires_at = 0
+        admin_digest.digest = b"stale"
+
+        self.assertNotEqual(b"stale", admin_digest.get())
+        self.assertGreater(admin_digest.expires_at, datetime.datetime.now().timestamp())
+
+    @cases(
+        [
+            ("user", "user", ""),
+            ("user", "user", accounts["user"]["token"][:-1]),
+            ("user", "user", "я" * 128),
+            ("other", "user", accounts["user"]["token"]),
+            ("admin", ADMIN_LOGIN, accounts["user"]["token"]),
+        ]
+    )
+    def test_forbidden(self, account, login, token):
+        self.assertEqual(ClientStatus.forbidden, check_auth(make_request(account, login, token)))
+
+
+class TestSchema(unittest.TestCase):
+    def test_fields_in_declaration_order(self):
+        self.assertEqual(
+            ["first_name", "last_name", "email", "phone", "birthday", "gender"],
+            [field.key for field in OnlineScoreRequest.fields],
+        )
+
+    def test_validate_ok(self):
+        values, errors = OnlineScoreRequest.validate({"phone": "79175002040", "birthday": "01.01.2000", "gender": 1})
+
+        self.assertEqual({}, errors)
+        self.assertEqual(
+            {
+                "first_name": None,
+                "last_name": None,
+                "email": None,
+                "phone": "79175002040",
+                "birthday": "2000-01-01",
+                "gender": 1,
+            },
+            values,
+        )
+
+    def test_validate_collects_all_errors(self):
+        values, errors = OnlineScoreRequest.validate(
+            {"first_name": 1, "email": "no-at", "phone": "89175002040", "birthday": "01.01.1890", "gender": 5}
+        )
+
+        self.assertEqual(["first_name", "email", "phone", "birthday", "gender"], list(errors))
+        self.assertIsInstance(errors["first_name"], TypeError)
+        self.assertIsInstance(errors["phone"], ValidationError)
+        self.assertRegex(str(errors["birthday"]), "age more then")
+        self.assertEqual({"last_name": None}, values)
+
+    @cases(
+        [
+            {"client_ids": [1, 2], "date": "19.07.2017"},
+            {"client_ids": [1]},
+            {"client_ids": [], "date": "19.07.2017"},
+            {"client_ids": [1], "date": "XXX"},
+        ]
+    )
+    def test_load_matches_descriptors(self, arguments):
+        loaded, errors = ClientsInterestsRequest.load(arguments)
+
+        assigned = ClientsInterestsRequest()
+        try:
+            assigned.client_ids = arguments.get("client_ids")
+            assigned.date = arguments.get("date")
+        except Exception as e:
+            self.assertEqual(type(e), type(MethodRequest.first_error(errors)))
+        else:
+            self.assertEqual({}, errors)
+            self.assertEqual(vars(assigned), vars(loaded))
+
+    def test_request_validator_raises_first_error(self):
+        with self.assertRaises(NoneError):
+            get_request_validator({"account": "user", "arguments": {}})
+
+        request = make_request("user", "user", "token")
+        self.assertEqual(["_account", "_login", "_token", "_arguments", "_method"], list(vars(request)))
+        self.assertFalse(request.is_admin)
+
+
+if __name__ == "__main__":
+    unittest.main()
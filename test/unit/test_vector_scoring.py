@@ -0,0 +1,97 @@
+import unittest
+from test.support_functions import cases
+
+import numpy as np
+
+from config import store_params_ok
+from db.store import NullStore, StoreFake
+from scoring import SCORE_CODEC, compute_score, get_score_key
+from vector_scoring import compute_scores, get_scores_columnar, presence
+
+ROWS = [
+    ("79175002040", "stupnikov@otus.ru", None, None, None, None),
+    ("79175002040", "stupnikov@otus.ru", "01.01.2000", 1, "a", "b"),
+    (None, None, "01.01.2000", 0, "a", "b"),
+    ("79175002040", None, "01.01.2000", 2, None, "b"),
+    (None, "stupnikov@otus.ru", None, 1, "a", None),
+]
+
+
+def columns(rows):
+    return [list(column) for column in zip(*rows)]
+
+
+class TestVectorScoring(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok)
+        self.keys = [get_score_key(*row) for row in ROWS]
+        self.store.r.delete(*self.keys)
+
+    def tearDown(self):
+        self.store.r.delete(*self.keys)
+
+    @cases([[True, False, True], [1, 0, 1], ["a", "", "b"], np.array([True, False, True])])
+    def test_presence(self, column):
+        np.testing.assert_array_equal([True, False, True], presence(column))
+
+    def test_presence_missing_column(self):
+        np.testing.assert_array_equal([False, False], presence(None, 2))
+
+    def test_compute_scores_matches_compute_score(self):
+        has = [presence(column) for column in columns(ROWS)]
+        expected = [compute_score(*row) for row in ROWS]
+
+        np.testing.assert_array_equal(expected, compute_scores(*has))
+
+    def test_without_store(self):
+        scores = get_scores_columnar(None, *columns(ROWS))
+
+        np.testing.assert_array_equal([compute_score(*row) for row in ROWS], scores)
+
+    def test_null_store(self):
+        scores = get_scores_columnar(NullStore(), *columns(ROWS))
+
+        np.testing.assert_array_equal([compute_score(*row) for row in ROWS], scores)
+
+    def test_cache_written_in_bulk(self):
+        scores = get_scores_columnar(self.store, *columns(ROWS))
+
+        cached = self.store.get_cache_many(self.keys)
+        expected = [compute_score(*row) for row in ROWS]
+        self.assertEqual(expected, [SCORE_CODEC.decode(raw)[0] for raw in cached])
+        np.testing.assert_array_equal(expected, scores)
+
+    def test_stale_entries_recomputed(self):
+        self.store.set_cache(self.keys[0], SCORE_CODEC.encode(5.0, 0, expires_at=0), 30)
+
+        scores = get_scores_columnar(self.store, *columns(ROWS))
+
+        self.assertEqual(compute_score(*ROWS[0]), scores[0])
+
+    def test_cache_hits_used(self):
+        self.store.set_cache(self.keys[0], 5.0, 30)
+
+        scores = get_scores_columnar(self.store, *columns(ROWS))
+
+        self.assertEqual(5.0, scores[0])
+        self.assertEqual(compute_score(*ROWS[1]), scores[1])
+
+    def test_optional_columns(self):
+        phone = ["79175002040", None]
+        email = [None, "stupnikov@otus.ru"]
+
+        scores = get_scores_columnar(None, phone, email)
+
+        np.testing.assert_array_equal([1.5, 1.5], scores)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            get_scores_columnar(None, ["1", "2"], ["a"])
+
+    def test_no_columns(self):
+        with self.assertRaisesRegex(ValueError, "at least one column"):
+            get_scores_columnar(None, None, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import threading
+import time
+import unittest
+
+from config import store_params_ok
+from db.store import AsyncStoreFake, StoreFake
+from db.write_behind import AsyncWriteBehindQueue, WriteBehindQueue, coalesce
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+
+    def test_flush_in_batches(self):
+        wb = WriteBehindQueue(self.batches.append, batch_size=2)
+        for i in range(5):
+            wb.put(f"uid:{i}", i, 30)
+        wb.close()
+
+        self.assertEqual([(f"uid:{i}", i, 30) for i in range(5)], [item for batch in self.batches for item in batch])
+        self.assertTrue(all(len(batch) <= 2 for batch in self.batches))
+        self.assertEqual({"queued": 5, "written": 5, "dropped": 0, "pending": 0}, self.counters(wb))
+
+    def test_drop_when_full(self):
+        release = threading.Event()
+        wb = WriteBehindQueue(lambda items: release.wait(), max_size=2, batch_size=1)
+        wb.put("uid:0", 0, 30)
+        # флашер забрал первую запись и ждёт, в очереди есть место на две
+        while wb.queue.qsize():
+            time.sleep(0.001)
+        results = [wb.put(f"uid:{i}", i, 30) for i in range(1, 4)]
+        release.set()
+        wb.close()
+
+        self.assertEqual([True, True, False], results)
+        self.assertEqual(1, wb.dropped)
+
+    def test_flush_errors_counted(self):
+        def flush(items):
+            raise ConnectionError("down")
+
+        wb = WriteBehindQueue(flush)
+        wb.put("uid:0", 0, 30)
+        wb.close()
+
+        self.assertEqual(1, wb.errors)
+        self.assertEqual(0, wb.written)
+
+    def test_batch_window(self):
+        wb = WriteBehindQueue(self.batches.append, flush_interval=0.2)
+        wb.put("uid:0", 0, 30)
+        time.sleep(0.05)
+        wb.put("uid:1", 1, 30)
+        wb.close()
+
+        # вторая запись пришла в окне пачки первой
+        self.assertEqual([[("uid:0", 0, 30), ("uid:1", 1, 30)]], self.batches)
+
+    def test_concurrent_counters(self):
+        wb = WriteBehindQueue(self.batches.append, max_size=100)
+        threads = [threading.Thread(target=lambda: [wb.put("uid:0", i, 30) for i in range(1000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wb.close()
+
+        self.assertEqual(8000, wb.queued + wb.dropped)
+        self.assertEqual(wb.queued, wb.written)
+
+    def test_put_after_close(self):
+        wb = WriteBehindQueue(self.batches.append)
+        wb.close()
+
+        self.assertFalse(wb.put("uid:0", 0, 30))
+        self.assertEqual(1, wb.dropped)
+        self.assertFalse(wb.thread.is_alive())
+
+    def test_put_during_close(self):
+        # close() во время put() ждёт её: принятая запись не встаёт в очередь за маркером остановки
+        wb = WriteBehindQueue(self.batches.append)
+        entered, release = threading.Event(), threading.Event()
+        put_nowait = wb.queue.put_nowait
+
+        def slow_put_nowait(item):
+            entered.set()
+            release.wait()
+            put_nowait(item)
+
+        wb.queue.put_nowait = slow_put_nowait
+        putter = threading.Thread(target=wb.put, args=("uid:0", 0, 30))
+        putter.start()
+        entered.wait()
+        closer = threading.Thread(target=wb.close)
+        closer.start()
+        closer.join(0.05)
+        release.set()
+        putter.join()
+        closer.join()
+
+        self.assertEqual([[("uid:0", 0, 30)]], self.batches)
+        self.assertEqual({"queued": 1, "written": 1, "dropped": 0, "pending": 0}, self.counters(wb))
+
+    def test_coalesce(self):
+        items = [("a", 1, 30), ("b", 2, 30), ("a", 3, 30)]
+
+        self.assertEqual([("a", 3, 30), ("b", 2, 30)], coalesce(items))
+
+    @staticmethod
+    def counters(wb):
+        return {key: wb.stats()[key] for key in ("queued", "written", "dropped", "pending")}
+
+
+class TestStoreWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.store = StoreFake(store_params=store_params_ok, write_behind_params={})
+        self.keys = ["uid:wb1", "uid:wb2", "uid:wb3"]
+
+    def tearDown(self):
+        self.store.r.delete(*self.keys)
+
+    def test_set_cache(self):
+        self.assertEqual(None, self.store.set_cache("uid:wb1", 1.5, 30))
+        self.store.set_cache_many([("uid:wb2", 3.0), ("uid:wb3", 4.5)], 30)
+        self.store.close()
+
+        self.assertEqual(["1.5", "3.0", "4.5"], self.store.r.mget(self.keys))
+        self.assertTrue(0 < self.store.r.ttl("uid:wb2") <= 30)
+        self.assertEqual(3, self.store.write_behind.written)
+
+
+class TestAsyncStoreWriteBehind(unittest.IsolatedAsyncioTestCase):
+    async def test_set_cache(self):
+        store = AsyncStoreFake(store_params=store_params_ok, write_behind_params={})
+        await store.set_cache("uid:wb1", 1.5, 30)
+        await store.set_cache_many([("uid:wb2", 3.0)], 30)
+        await store.close()
+
+        self.assertEqual(2, store.write_behind.written)
+        self.assertEqual(["1.5", "3.0"], await store.r.mget("uid:wb1", "uid:wb2"))
+        await store.r.delete("uid:wb1", "uid:wb2")
+
+    async def test_queue_drains_on_close(self):
+        batches = []
+
+        async def flush(items):
+            batches.append(items)
+
+        wb = AsyncWriteBehindQueue(flush, batch_size=10)
+        for i in range(25):
+            wb.put(f"uid:{i}", i, 30)
+        await wb.close()
+
+        self.assertEqual(25, sum(map(len, batches)))
+        self.assertEqual(25, wb.written)
+
+
+if __name__ == "__main__":
+    unittest.main()
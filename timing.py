@@ -0,0 +1,106 @@
+"""Время этапов обработки запроса.
+
+Application.handle заводит RequestTimer на запрос и кладёт его в contextvar, а
+код этапов добавляет в него длительности (time.perf_counter) без передачи
+таймера через аргументы:
+
+    parse     - разбор JSON тела (Application.decode_request)
+    auth      - проверка авторизации (validators.check_auth)
+    validate  - валидация запроса и аргументов
+    store     - вызовы Redis (Store.call)
+    compute   - расчёт score
+    serialize - сериализация ответа
+    compress  - сжатие ответа (compression.Compressor)
+
+Вне запроса (фоновый пересчёт, write-behind, score_cli) таймера нет и
+замеры не выполняются.
+"""
+
+import contextvars
+import functools
+import time
+
+STAGES = ("parse", "auth", "validate", "store", "compute", "serialize", "compress")
+
+_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, duration):
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """-> {этап: мс} для контекста запроса"""
+        timings = {stage: round(duration * 1000, 3) for stage, duration in self.stages.items()}
+        timings["total"] = round(self.elapsed() * 1000, 3)
+        return timings
+
+    def server_timing(self):
+        """-> значение заголовка Server-Timing"""
+        return ", ".join(f"{stage};dur={duration}" for stage, duration in self.as_dict().items())
+
+
+def start():
+    """Заводит таймер запроса -> (таймер, token для finish)."""
+    timer = RequestTimer()
+    return timer, _timer.set(timer)
+
+
+def finish(token):
+    _timer.reset(token)
+
+
+def current():
+    return _timer.get()
+
+
+def add(stage, duration):
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(stage, duration)
+
+
+class stage:
+    """with stage("parse"): ... - добавляет время блока к этапу текущего запроса."""
+
+    __slots__ = ("name", "timer", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timer = _timer.get()
+        if self.timer is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.started)
+
+
+def timed(name):
+    """Декоратор: время вызова функции добавляется к этапу name."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timer = _timer.get()
+            if timer is None:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.add(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
@@ -1,7 +1,11 @@
 import datetime
+import functools
 import hashlib
+import hmac
+import threading
+import time
 
-from config import ADMIN_LOGIN, ADMIN_SALT, SALT, ClientStatus
+from config import ADMIN_LOGIN, ADMIN_SALT, AUTH_CACHE_SIZE, SALT, ClientStatus
 from fields.fields import (
     ArgumentsField,
     BirthDayField,
@@ -12,14 +16,16 @@ from fields.fields import (
     GenderField,
     PhoneField,
 )
+from fields.schema import Schema
+from timing import timed
 
 
-class ClientsInterestsRequest:
+class ClientsInterestsRequest(Schema):
     client_ids = ClientIDsField("client_ids", required=True)
     date = DateField("date", required=False, nullable=True)
 
 
-class OnlineScoreRequest:
+class OnlineScoreRequest(Schema):
     first_name = CharField("first_name", required=False, nullable=True)
     last_name = CharField("last_name", required=False, nullable=True)
     email = EmailField("email", required=False, nullable=True)
@@ -29,7 +35,7 @@ class OnlineScoreRequest:
 
 
 # Структура запроса
-class MethodRequest:
+class MethodRequest(Schema):
     account = CharField("account", required=False, nullable=True)
     login = CharField("login", required=True, nullable=True)
     token = CharField("token", required=True, nullable=True)
@@ -41,28 +47,61 @@ class MethodRequest:
         return self.login == ADMIN_LOGIN
 
 
+@timed("validate")
 def get_request_validator(request_body):
-    request_validator = MethodRequest()
-    request_validator.account = request_body.get("account")
-    request_validator.login = request_body.get("login")
-    request_validator.token = request_body.get("token")
-    request_validator.arguments = request_body.get("arguments")
-    request_validator.method = request_body.get("method")
+    request_validator, errors = MethodRequest.load(request_body)
+    if errors:
+        raise MethodRequest.first_error(errors)
     return request_validator
 
 
+class AdminDigest:
+    """Токен администратора, пересчитываемый один раз за час, а не на каждый запрос."""
+
+    def __init__(self):
+        self.digest = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        now = time.time()
+        if now >= self.expires_at:
+            with self.lock:
+                if now >= self.expires_at:
+                    dt = datetime.datetime.fromtimestamp(now)
+                    info_for_hash_bytes = (dt.strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
+                    self.digest = hashlib.sha512(info_for_hash_bytes).hexdigest().encode("utf-8")
+                    next_hour = dt.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+                    self.expires_at = next_hour.timestamp()
+        return self.digest
+
+
+admin_digest = AdminDigest()
+
+
+@functools.lru_cache(maxsize=AUTH_CACHE_SIZE)
+def get_user_digest(account, login):
+    # ожидаемый токен пользователя - кэшируется по (account, login), сам токен в ключ не входит
+    info_for_hash_bytes = (account + login + SALT).encode("utf-8")
+    return hashlib.sha512(info_for_hash_bytes).hexdigest().encode("utf-8")
+
+
+def is_valid_token(digest, token):
+    # сравнение за постоянное время, чтобы не раскрывать совпадающий префикс токена
+    if not isinstance(token, str):
+        return False
+    return hmac.compare_digest(digest, token.encode("utf-8"))
+
+
+@timed("auth")
 def check_auth(request):
     if request.is_admin:
         # check token for admin
-        info_for_hash_bytes = (datetime.datetime.now().strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
-        digest = hashlib.sha512(info_for_hash_bytes).hexdigest()
-        if digest == request.token:
+        if is_valid_token(admin_digest.get(), request.token):
             return ClientStatus.admin
     else:
         # check token for user
-        info_for_hash_bytes = (request.account + request.login + SALT).encode("utf-8")
-        digest = hashlib.sha512(info_for_hash_bytes).hexdigest()
-        if digest == request.token:
+        if is_valid_token(get_user_digest(request.account, request.login), request.token):
             return ClientStatus.user
 
     return ClientStatus.forbidden